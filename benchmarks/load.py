@@ -0,0 +1,487 @@
+"""
+Load test of the running app through its websocket event protocol.
+
+Every simulated client is one browser session: it loads the chat page, creates
+a chat, asks questions, switches chats and submits a document on the documents
+page, sending the events the frontend sends and following the events the server
+queues back. The test runs once per client count and reports the events' round
+trips, the size of the streamed deltas and the server's CPU and memory.
+
+    python -m benchmarks.load --clients 1 10 50
+    python -m benchmarks.load --url http://localhost:8000 --server-pid <pid>
+
+Without --url it starts the backend (`reflex run --backend-only`) with the fake
+LLM and embeddings, the in-memory graph store and the NumPy vector store, and
+keeps its chats, jobs and stores in a temporary directory. The clients need
+python-socketio's asyncio client (aiohttp) and psutil.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterator
+
+import psutil
+import socketio
+
+from benchmarks.run import (
+    RESULTS_DIR,
+    add_settings_arguments,
+    compare,
+    latest_result,
+    settings_from_arguments,
+)
+from benchmarks.scenarios import SAMPLES, Corpus
+from benchmarks.settings import LoadSettings
+from reflex_study.fakes import FAKE_EMBEDDING_MODEL, FAKE_MODEL
+from reflex_study.graph_store import MEMORY_GRAPH_BACKEND
+from reflex_study.jobs import DONE, FINISHED_STATUSES
+from reflex_study.tracing import RollingHistogram
+from reflex_study.vector_store import NUMPY_VECTOR_BACKEND
+
+LOAD_RESULTS_DIR = RESULTS_DIR / "load"
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# The socket.io namespace and path of the Reflex event endpoint.
+EVENT_NAMESPACE = "/_event"
+# Full names of the app's states, as the compiled frontend sends them.
+STATE = "state.state"
+HYDRATE = "state.hydrate"
+ON_LOAD = "state.on_load_internal_state.on_load_internal"
+# Events the frontend handles itself; "_alert" reports a failed event handler.
+CLIENT_EVENT_PREFIX = "_"
+ALERT = "_alert"
+
+INDEX_PAGE = "/"
+DOCUMENTS_PAGE = "/documents"
+
+# The server's stores, under the load test's temporary directory.
+STORE_PATHS = {
+    "CHAT_STORE_PATH": "chats.sqlite3",
+    "INGESTION_JOBS_DIR": "jobs",
+    "INGESTION_CHECKPOINT_DIR": "ingestion",
+    "GRAPH_STORE_PATH": "graph_store",
+    "VECTOR_STORE_PATH": "vector_store",
+    "EMBEDDING_CACHE_PATH": "embeddings",
+    "SEMANTIC_CACHE_PATH": "semantic_cache",
+}
+SERVER_START_TIMEOUT = 120.0
+# Seconds between samples of the server's CPU and memory.
+SAMPLE_INTERVAL = 0.5
+
+
+class LoadStats:
+    """Round trips and update sizes across all clients of one run."""
+
+    def __init__(self, clients: int):
+        self.clients = clients
+        self.started = time.perf_counter()
+        # handler name -> seconds from sending the event to its final update
+        self.round_trip: dict[str, RollingHistogram] = defaultdict(
+            lambda: RollingHistogram(SAMPLES)
+        )
+        self.time_to_first_answer = RollingHistogram(SAMPLES)
+        # Bytes of the updates streaming an answer, and updates per answer.
+        self.stream_update_bytes = RollingHistogram(SAMPLES)
+        self.stream_updates = RollingHistogram(SAMPLES)
+        self.update_bytes = RollingHistogram(SAMPLES)
+        self.ingestion_seconds = RollingHistogram(SAMPLES)
+        self.events = 0
+        self.sessions = 0
+        self.errors: Counter[str] = Counter()
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "clients": self.clients,
+            "sessions_completed": self.sessions,
+            "errors": dict(self.errors),
+            "elapsed_seconds": elapsed,
+            "events_per_second": self.events / elapsed,
+            "round_trip": {
+                name: histogram.snapshot()
+                for name, histogram in sorted(self.round_trip.items())
+            },
+            "time_to_first_answer": self.time_to_first_answer.snapshot(),
+            "stream_update_bytes": self.stream_update_bytes.snapshot(),
+            "stream_updates": self.stream_updates.snapshot(),
+            "update_bytes": self.update_bytes.snapshot(),
+            "ingestion_seconds": self.ingestion_seconds.snapshot(),
+        }
+
+
+class Client:
+    """
+    One browser session: a socket, a client token and the vars the server sent.
+
+    Events are sent one at a time, each once the previous one's final update
+    arrived, as the frontend's event queue does.
+    """
+
+    def __init__(self, url: str, settings: LoadSettings, stats: LoadStats):
+        self.url = url
+        self.settings = settings
+        self.stats = stats
+        self.token = str(uuid.uuid4())
+        self.page = INDEX_PAGE
+        self.hydrated = False
+        # substate -> the latest values of its vars
+        self.state: dict[str, dict] = defaultdict(dict)
+        self.updates: asyncio.Queue[tuple[float, int, dict]] = asyncio.Queue()
+        self.socket = socketio.AsyncClient(reconnection=False)
+        self.socket.on("event", self._on_update, namespace=EVENT_NAMESPACE)
+
+    def _on_update(self, message: str):
+        update = json.loads(message)
+        for substate, values in update["delta"].items():
+            self.state[substate].update(values)
+        self.updates.put_nowait((time.perf_counter(), len(message.encode()), update))
+
+    async def connect(self):
+        await self.socket.connect(
+            self.url,
+            socketio_path=EVENT_NAMESPACE,
+            transports=["websocket"],
+            namespaces=[EVENT_NAMESPACE],
+        )
+
+    async def close(self):
+        await self.socket.disconnect()
+
+    async def _next_update(self, timeout: float) -> tuple[float, int, dict]:
+        received, size, update = await asyncio.wait_for(self.updates.get(), timeout)
+        self.stats.update_bytes.add(size)
+        return received, size, update
+
+    async def send(self, name: str, payload: dict | None = None):
+        """Send an event, then the events the server queues back in response."""
+        queue = [(name, payload or {})]
+        while queue:
+            name, payload = queue.pop(0)
+            if name.startswith(CLIENT_EVENT_PREFIX):
+                if name == ALERT:
+                    self.stats.errors[ALERT] += 1
+                continue
+            events = await self._send_one(name, payload)
+            queue.extend((event["name"], event["payload"]) for event in events)
+
+    async def _send_one(self, name: str, payload: dict) -> list[dict]:
+        # Updates pushed by background tasks since the last event.
+        while not self.updates.empty():
+            self.stats.update_bytes.add(self.updates.get_nowait()[1])
+
+        event = {
+            "token": self.token,
+            "name": name,
+            "router_data": {"pathname": self.page, "query": {}, "asPath": self.page},
+            "payload": payload,
+        }
+        started = time.perf_counter()
+        await self.socket.emit("event", json.dumps(event), namespace=EVENT_NAMESPACE)
+        self.stats.events += 1
+
+        handler = name.rpartition(".")[2]
+        answering = handler == "process_question"
+        first_answer = None
+        stream_updates = 0
+        events = []
+        while True:
+            received, size, update = await self._next_update(self.settings.timeout)
+            events.extend(update["events"])
+            if answering and update["delta"].get(STATE, {}).get("streaming_answer"):
+                stream_updates += 1
+                self.stats.stream_update_bytes.add(size)
+                if first_answer is None:
+                    first_answer = received - started
+            if update["final"]:
+                break
+        self.stats.round_trip[handler].add(received - started)
+        if first_answer is not None:
+            self.stats.time_to_first_answer.add(first_answer)
+            self.stats.stream_updates.add(stream_updates)
+        return events
+
+    async def load_page(self, page: str):
+        """Open a page: hydrate on the first one, then its on_load events."""
+        self.page = page
+        if not self.hydrated:
+            await self.send(HYDRATE)
+            self.hydrated = True
+        await self.send(ON_LOAD)
+
+    async def wait_for_ingestion(self, started: float):
+        """Follow the job's progress the server pushes until the job finishes."""
+        deadline = started + self.settings.timeout
+        while True:
+            values = self.state[STATE]
+            status = values.get("ingestion_status")
+            if not values.get("ingesting") and status in FINISHED_STATUSES:
+                break
+            await self._next_update(deadline - time.perf_counter())
+        self.stats.ingestion_seconds.add(time.perf_counter() - started)
+        if status != DONE:
+            self.stats.errors[f"ingestion_{status}"] += 1
+
+    async def think(self, rng: random.Random):
+        await asyncio.sleep(self.settings.think_time * rng.uniform(0.5, 1.5))
+
+    async def session(self, number: int):
+        rng = random.Random(self.settings.seed + number)
+        corpus = Corpus(self.settings.seed + number)
+        await self.connect()
+        try:
+            await self.load_page(INDEX_PAGE)
+            chat_name = f"load-{number}"
+            await self.think(rng)
+            await self.send(f"{STATE}.set_new_chat_name", {"value": chat_name})
+            await self.send(f"{STATE}.create_chat")
+            for _ in range(self.settings.questions):
+                await self.think(rng)
+                await self.send(
+                    f"{STATE}.process_question",
+                    {"form_data": {"question": corpus.question()}},
+                )
+
+            # Back to the first chat and again to the new one.
+            for name in (self.state[STATE]["chat_titles"][0], chat_name):
+                await self.think(rng)
+                await self.send(f"{STATE}.set_chat", {"chat_name": name})
+
+            if self.settings.document_sentences:
+                await self.load_page(DOCUMENTS_PAGE)
+                await self.think(rng)
+                started = time.perf_counter()
+                document = corpus.document(self.settings.document_sentences)
+                await self.send(
+                    f"{STATE}.process_documents", {"form_data": {"documents": document}}
+                )
+                await self.wait_for_ingestion(started)
+            self.stats.sessions += 1
+        finally:
+            await self.close()
+
+
+class ServerMonitor:
+    """Samples the CPU and memory of the server process and its children."""
+
+    def __init__(self, pid: int, interval: float = SAMPLE_INTERVAL):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu_percent = RollingHistogram(SAMPLES)
+        self.rss_mb = RollingHistogram(SAMPLES)
+        # The Process objects keep the previous CPU times cpu_percent needs.
+        self._processes: dict[int, psutil.Process] = {}
+
+    def sample(self):
+        cpu_percent = 0.0
+        rss = 0
+        for process in [self.process, *self.process.children(recursive=True)]:
+            try:
+                if process.pid not in self._processes:
+                    self._processes[process.pid] = process
+                    process.cpu_percent(None)
+                    continue
+                cpu_percent += self._processes[process.pid].cpu_percent(None)
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                self._processes.pop(process.pid, None)
+        self.cpu_percent.add(cpu_percent)
+        self.rss_mb.add(rss / 2**20)
+
+    async def run(self):
+        self.sample()
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sample()
+
+    def summary(self) -> dict:
+        return {
+            "cpu_percent": self.cpu_percent.snapshot(),
+            "rss_mb": self.rss_mb.snapshot(),
+        }
+
+
+async def run_clients(
+    url: str, settings: LoadSettings, clients: int, server_pid: int | None
+) -> dict:
+    """Run `clients` sessions at the same time and summarize them."""
+    stats = LoadStats(clients)
+    monitor = ServerMonitor(server_pid) if server_pid else None
+    monitor_task = asyncio.create_task(monitor.run()) if monitor else None
+    try:
+        sessions = [
+            Client(url, settings, stats).session(number) for number in range(clients)
+        ]
+        for result in await asyncio.gather(*sessions, return_exceptions=True):
+            if isinstance(result, BaseException):
+                stats.errors[type(result).__name__] += 1
+    finally:
+        if monitor_task is not None:
+            monitor_task.cancel()
+            await asyncio.gather(monitor_task, return_exceptions=True)
+    summary = stats.summary()
+    if monitor is not None:
+        summary["server"] = monitor.summary()
+    return summary
+
+
+def server_environment(workdir: Path, settings: LoadSettings) -> dict[str, str]:
+    """The app's environment: fake LLM and embeddings, in-process stores."""
+    settings_path = workdir / "config.json"
+    settings_path.write_text(json.dumps({"model": FAKE_MODEL}))
+    return {
+        **os.environ,
+        # state.py refuses to start without one; the fake LLM never uses it.
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "load-test"),
+        "SETTINGS_FILE_PATH": str(settings_path),
+        "EMBEDDING_MODEL": FAKE_EMBEDDING_MODEL,
+        "GRAPH_BACKEND": MEMORY_GRAPH_BACKEND,
+        "VECTOR_BACKEND": NUMPY_VECTOR_BACKEND,
+        "FAKE_LLM_LATENCY": str(settings.latency),
+        "FAKE_LLM_TOKENS_PER_SECOND": str(settings.tokens_per_second),
+        "FAKE_LLM_ANSWER_TOKENS": str(settings.answer_tokens),
+        **{name: str(workdir / path) for name, path in STORE_PATHS.items()},
+    }
+
+
+def wait_until_up(url: str, process: subprocess.Popen):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The app exited with {process.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/ping", timeout=1):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"The app did not answer on {url} in time")
+
+
+@contextlib.contextmanager
+def started_server(
+    port: int, workdir: Path, settings: LoadSettings, log_path: Path
+) -> Iterator[subprocess.Popen]:
+    """Run the app's backend until the load test is done."""
+    command = (
+        f"reflex run --env prod --backend-only --backend-port {port} "
+        "--loglevel warning"
+    ).split()
+    with log_path.open("w") as log:
+        process = subprocess.Popen(
+            command,
+            cwd=PROJECT_DIR,
+            env=server_environment(workdir, settings),
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+    try:
+        wait_until_up(f"http://localhost:{port}", process)
+        yield process
+    finally:
+        # reflex starts the server in child processes of its own.
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+
+
+async def run_load(
+    url: str, settings: LoadSettings, client_counts: list[int], server_pid: int | None
+) -> dict[str, dict]:
+    results = {}
+    for clients in client_counts:
+        summary = await run_clients(url, settings, clients, server_pid)
+        results[f"clients_{clients}"] = summary
+        question = summary["round_trip"].get("process_question", {})
+        cpu = summary.get("server", {}).get("cpu_percent", {})
+        print(
+            f"{clients} clients: {summary['sessions_completed']} sessions, "
+            f"process_question p50 {question.get('p50', 0):.2f}s "
+            f"p95 {question.get('p95', 0):.2f}s, "
+            f"server CPU max {cpu.get('max', 0):.0f}%, "
+            f"errors {sum(summary['errors'].values())}",
+            file=sys.stderr,
+        )
+    return results
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--clients", type=int, nargs="+", default=[1, 5, 10, 25], help="client counts"
+    )
+    parser.add_argument("--url", help="a running app's backend (default: start one)")
+    parser.add_argument(
+        "--server-pid", type=int, help="process of the app at --url to sample"
+    )
+    parser.add_argument("--port", type=int, default=8001, help="of the started app")
+    parser.add_argument(
+        "--compare", type=Path, help="earlier results (default: the latest saved)"
+    )
+    parser.add_argument("--results-dir", type=Path, default=LOAD_RESULTS_DIR)
+    parser.add_argument("--no-save", action="store_true")
+    add_settings_arguments(parser, LoadSettings)
+    args = parser.parse_args(argv)
+    settings = settings_from_arguments(args, LoadSettings)
+
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "url": args.url,
+        "settings": asdict(settings),
+    }
+    if args.url:
+        results["scenarios"] = asyncio.run(
+            run_load(args.url.rstrip("/"), settings, args.clients, args.server_pid)
+        )
+    else:
+        workdir = Path(tempfile.mkdtemp(prefix="reflex_study_load_"))
+        log_path = Path(tempfile.gettempdir()) / f"{workdir.name}.log"
+        print(f"Starting the app, logging to {log_path}", file=sys.stderr)
+        try:
+            with started_server(args.port, workdir, settings, log_path) as server:
+                results["scenarios"] = asyncio.run(
+                    run_load(
+                        f"http://localhost:{args.port}",
+                        settings,
+                        args.clients,
+                        server.pid,
+                    )
+                )
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+    previous = args.compare or latest_result(args.results_dir)
+    if previous is not None:
+        with previous.open() as file:
+            print(f"\nCompared with {previous.name}:", file=sys.stderr)
+            for line in compare(json.load(file), results):
+                print(f"  {line}", file=sys.stderr)
+    if not args.no_save:
+        args.results_dir.mkdir(parents=True, exist_ok=True)
+        path = args.results_dir / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+        path.write_text(json.dumps(results, indent=2))
+        print(f"\nSaved {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Offline benchmarks of question answering and ingestion.
+
+Runs the scenarios against a fake streaming LLM, fake embeddings and the
+in-process graph and vector stores, so nothing calls OpenAI or Neo4j, and
+saves the results as JSON next to the earlier runs for comparison.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenarios single_question concurrent_sessions
+    python -m benchmarks.run --compare benchmarks/results/<earlier run>.json
+
+The token splitter and tokenizer need the tiktoken encodings, so the first run
+on a machine downloads them (or point TIKTOKEN_CACHE_DIR at a copy).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+from dataclasses import asdict, fields
+from pathlib import Path
+
+from benchmarks.settings import BenchmarkSettings
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# Numbers compared between runs, by the last part of their key path.
+COMPARED_KEYS = {
+    "p50",
+    "p95",
+    "elapsed_seconds",
+    "answers_per_second",
+    "events_per_second",
+    "chunks_per_second",
+    "max_rss_mb",
+}
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(previous: dict, current: dict) -> list[str]:
+    """One line per compared number present in both runs."""
+    before = flatten(previous["scenarios"])
+    lines = []
+    for path, value in flatten(current["scenarios"]).items():
+        if path.rsplit(".", 1)[-1] not in COMPARED_KEYS or path not in before:
+            continue
+        old = before[path]
+        change = f"{(value - old) / old:+.1%}" if old else "n/a"
+        lines.append(f"{path}: {old:.4g} -> {value:.4g} ({change})")
+    return lines
+
+
+def latest_result(directory: Path) -> Path | None:
+    results = sorted(directory.glob("*.json"))
+    return results[-1] if results else None
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser, settings_class: type):
+    """Every field of the settings dataclass is an option, e.g. --tokens-per-second."""
+    group = parser.add_argument_group("workload")
+    for setting in fields(settings_class):
+        flag = "--" + setting.name.replace("_", "-")
+        if setting.type in (bool, "bool"):
+            group.add_argument(flag, action="store_true")
+        else:
+            group.add_argument(
+                flag, type=type(setting.default), default=setting.default
+            )
+
+
+def settings_from_arguments(args: argparse.Namespace, settings_class: type):
+    return settings_class(
+        **{
+            setting.name: getattr(args, setting.name)
+            for setting in fields(settings_class)
+        }
+    )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", help="scenarios to run (all)")
+    parser.add_argument(
+        "--compare", type=Path, help="earlier results (default: the latest saved)"
+    )
+    parser.add_argument("--results-dir", type=Path, default=RESULTS_DIR)
+    parser.add_argument(
+        "--trace", action="store_true", help="include per-stage QA latencies"
+    )
+    parser.add_argument("--no-save", action="store_true")
+    add_settings_arguments(parser, BenchmarkSettings)
+    args = parser.parse_args(argv)
+    settings = settings_from_arguments(args, BenchmarkSettings)
+    results_dir = args.results_dir.resolve()
+    compare_path = args.compare.resolve() if args.compare else None
+
+    workdir = Path(tempfile.mkdtemp(prefix="reflex_study_benchmark_"))
+    os.chdir(workdir)
+    if args.trace:
+        os.environ["QA_TRACING"] = "1"
+
+    # Imported only now: the stores resolve their paths against the working
+    # directory when imported, and the benchmark must not touch the app's.
+    from benchmarks.scenarios import SCENARIOS, Benchmark, run_scenarios
+    from reflex_study.tracing import qa_metrics
+
+    # The per-question trace lines would drown the report.
+    logging.getLogger("reflex_study.tracing").setLevel(logging.WARNING)
+    scenarios = args.scenarios or SCENARIOS
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    try:
+        benchmark = Benchmark(settings, workdir)
+        results = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "settings": asdict(settings),
+            "scenarios": asyncio.run(run_scenarios(benchmark, scenarios)),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if args.trace:
+        results["qa_stages"] = qa_metrics()["stages"]
+    print(json.dumps(results, indent=2))
+
+    previous = compare_path or latest_result(results_dir)
+    if previous is not None:
+        with previous.open() as file:
+            print(f"\nCompared with {previous.name}:", file=sys.stderr)
+            for line in compare(json.load(file), results):
+                print(f"  {line}", file=sys.stderr)
+    if not args.no_save:
+        results_dir.mkdir(parents=True, exist_ok=True)
+        path = results_dir / f"{time.strftime('%Y%m%d-%H%M%S')}.json"
+        path.write_text(json.dumps(results, indent=2))
+        print(f"\nSaved {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
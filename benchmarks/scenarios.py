@@ -0,0 +1,296 @@
+"""
+Benchmark scenarios. They drive the same code paths as the app's event
+handlers, against the fake LLM and embeddings and the in-process graph and
+vector stores.
+"""
+
+import asyncio
+import random
+import resource
+import time
+from pathlib import Path
+
+from benchmarks.settings import BenchmarkSettings
+from reflex_study.chat_store import ChatStore
+from reflex_study.fakes import FAKE_EMBEDDING_MODEL, FAKE_MODEL, FakeChatModel
+from reflex_study.graph_store import MEMORY_GRAPH_BACKEND
+from reflex_study.history import HistoryManager
+from reflex_study.ingestion import IngestionPipeline
+from reflex_study.langchain_api import LangChainAPI
+from reflex_study.retrieval import RetrievalBackend, RetrievalConfig
+from reflex_study.tracing import RollingHistogram, start_trace
+from reflex_study.vector_store import NUMPY_VECTOR_BACKEND
+
+SYSTEM_CONTENT = "You are a friendly chatbot named Reflex. Respond in markdown."
+OWNER = "benchmark"
+# Samples kept per latency histogram; the scenarios stay well below it.
+SAMPLES = 100_000
+
+FIRST_NAMES = (
+    "Alice Bruno Chiara Daniel Emma Felix Greta Hiro Ines Jonas Kenji Lena Marco "
+    "Nadia Oskar Paula Quentin Rosa Stefan Tara Umar Vera Wim Yuki Zoe"
+).split()
+LAST_NAMES = (
+    "Moreau Tanaka Rossi Schmidt Novak Silva Berg Kowalski Dubois Sato Larsen "
+    "Costa Weber Okafor Petrov Haddad Lindqvist Ortega Fischer Nakamura"
+).split()
+ORGANIZATIONS = [
+    f"{name} {suffix}"
+    for name in (
+        "Acme Northwind Globex Initech Umbrella Hooli Vandelay Stark Wayne Tyrell"
+    ).split()
+    for suffix in ("Corp", "Labs", "Group")
+]
+CITIES = "Lisbon Osaka Berlin Toronto Nairobi Lyon Porto Seoul Oslo Quito".split()
+SENTENCES = [
+    "{person} works at {organization} in {city}.",
+    "{person} met {other} at a conference organized by {organization}.",
+    "{organization} hired {person} to lead its office in {city}.",
+    "{person} and {other} founded a project together with {organization}.",
+    "Before joining {organization}, {person} studied with {other} in {city}.",
+]
+
+
+class Corpus:
+    """Deterministic documents about people and organizations, and questions."""
+
+    def __init__(self, seed: int = 0):
+        self.random = random.Random(seed)
+        self.people = [
+            f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES
+        ]
+
+    def _person(self) -> str:
+        return self.random.choice(self.people)
+
+    def document(self, sentences: int = 40) -> str:
+        lines = []
+        for _ in range(sentences):
+            lines.append(
+                self.random.choice(SENTENCES).format(
+                    person=self._person(),
+                    other=self._person(),
+                    organization=self.random.choice(ORGANIZATIONS),
+                    city=self.random.choice(CITIES),
+                )
+            )
+        return " ".join(lines)
+
+    def question(self) -> str:
+        return (
+            f"How is {self._person()} related to "
+            f"{self.random.choice(ORGANIZATIONS)}?"
+        )
+
+
+def rss_mb() -> float:
+    """Resident set size of the process now, in MiB."""
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        return max_rss_mb()
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class AnswerStats:
+    """Time to first token, answer time and streaming rate of the answers."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.time_to_first_token = RollingHistogram(SAMPLES)
+        self.answer_seconds = RollingHistogram(SAMPLES)
+        self.tokens_per_second = RollingHistogram(SAMPLES)
+        self.build_messages_seconds = RollingHistogram(SAMPLES)
+        self.tokens = 0
+        # Answers that streamed no tokens have no time to first token.
+        self.empty_answers = 0
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        return {
+            "answers": self.answer_seconds.count,
+            "elapsed_seconds": elapsed,
+            "answers_per_second": self.answer_seconds.count / elapsed,
+            "empty_answers": self.empty_answers,
+            "time_to_first_token": self.time_to_first_token.snapshot(),
+            "answer_seconds": self.answer_seconds.snapshot(),
+            "tokens_per_second": self.tokens_per_second.snapshot(),
+            "build_messages_seconds": self.build_messages_seconds.snapshot(),
+            "rss_mb": rss_mb(),
+            "max_rss_mb": max_rss_mb(),
+        }
+
+
+class Benchmark:
+    """One isolated backend, chat store and fake LLM shared by the scenarios."""
+
+    def __init__(self, settings: BenchmarkSettings, workdir: Path):
+        self.settings = settings
+        self.corpus = Corpus(settings.seed)
+        self.backend = RetrievalBackend(
+            RetrievalConfig(
+                embedding_model=FAKE_EMBEDDING_MODEL,
+                vector_backend=NUMPY_VECTOR_BACKEND,
+                graph_backend=MEMORY_GRAPH_BACKEND,
+                materialize_neighborhoods=settings.materialize_neighborhoods,
+            )
+        )
+        self.history = HistoryManager(ChatStore(workdir / "chats.sqlite3"))
+        self.llm = FakeChatModel(
+            latency=settings.latency,
+            tokens_per_second=settings.tokens_per_second,
+            answer_tokens=settings.answer_tokens,
+        )
+        self.checkpoint_dir = workdir / "ingestion"
+
+    def api(self) -> LangChainAPI:
+        # Built per question, as State.openai_process_question does.
+        return LangChainAPI(
+            llm=self.llm,
+            backend=self.backend,
+            entity_extractor=self.settings.entity_extractor,
+        )
+
+    async def answer(self, stats: AnswerStats, chat_name: str, question: str):
+        """Answer like the app: build the history, stream, store the turn."""
+        trace = start_trace()
+        try:
+            started = time.perf_counter()
+            with trace.stage("history"):
+                messages = await asyncio.to_thread(
+                    self.history.build_messages, OWNER, chat_name, FAKE_MODEL
+                )
+            stats.build_messages_seconds.add(time.perf_counter() - started)
+
+            first_token = None
+            chunks = []
+            async for chunk in self.api().aquestion(
+                system_content=SYSTEM_CONTENT, messages=messages, question=question
+            ):
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    trace.mark("first_token")
+                trace.count("answer_chunks", 1)
+                chunks.append(chunk)
+            finished = time.perf_counter()
+            trace.mark("last_token")
+        finally:
+            trace.finish()
+
+        stats.answer_seconds.add(finished - started)
+        if first_token is None:
+            stats.empty_answers += 1
+        else:
+            stats.time_to_first_token.add(first_token - started)
+            if finished > first_token:
+                stats.tokens_per_second.add(len(chunks) / (finished - first_token))
+        stats.tokens += len(chunks)
+        await asyncio.to_thread(
+            self.history.store.append, OWNER, chat_name, question, "".join(chunks)
+        )
+
+    async def bulk_ingestion(self) -> dict:
+        """Ingest the corpus through the pipeline the ingestion jobs use."""
+        llm = FakeChatModel(
+            latency=self.settings.extraction_latency,
+            tokens_per_second=self.settings.tokens_per_second,
+        )
+        pipeline = IngestionPipeline(
+            llm=llm, backend=self.backend, checkpoint_dir=self.checkpoint_dir
+        )
+        rss_before = rss_mb()
+        started = time.perf_counter()
+        chunks = 0
+        progress = None
+        for _ in range(self.settings.documents):
+            async for progress in pipeline.run(self.corpus.document()):
+                pass
+            chunks += progress.total
+        return {
+            "documents": self.settings.documents,
+            "chunks": chunks,
+            "elapsed_seconds": time.perf_counter() - started,
+            "last_document": progress.metrics.summary(),
+            "entities": len(self.backend.graph_store.entity_ids()),
+            "rss_growth_mb": rss_mb() - rss_before,
+            "max_rss_mb": max_rss_mb(),
+        }
+
+    async def single_question(self) -> dict:
+        """Sequential questions in one fresh chat."""
+        stats = AnswerStats()
+        for _ in range(self.settings.questions):
+            await self.answer(stats, "single", self.corpus.question())
+        return stats.summary()
+
+    async def concurrent_sessions(self) -> dict:
+        """Every session asks its questions one after another, all at once."""
+        stats = AnswerStats()
+
+        async def session(i: int):
+            for _ in range(self.settings.questions):
+                await self.answer(stats, f"session-{i}", self.corpus.question())
+
+        await asyncio.gather(*[session(i) for i in range(self.settings.sessions)])
+        return {"sessions": self.settings.sessions, **stats.summary()}
+
+    async def long_history(self) -> dict:
+        """Questions in a chat that already has `history_turns` turns."""
+        chat_name = "long-history"
+        store = self.history.store
+        for _ in range(self.settings.history_turns):
+            store.append(
+                OWNER, chat_name, self.corpus.question(), self.corpus.document(5)
+            )
+        stats = AnswerStats()
+        for _ in range(self.settings.questions):
+            await self.answer(stats, chat_name, self.corpus.question())
+
+        # The background summarization the app runs after answers.
+        started = time.perf_counter()
+        await self.history.update_summary(OWNER, chat_name, self.llm)
+        return {
+            "history_turns": self.settings.history_turns,
+            **stats.summary(),
+            "summary_update_seconds": time.perf_counter() - started,
+        }
+
+    def structured_retriever(self) -> dict:
+        """The synchronous structured retrieval on its own."""
+        latency = RollingHistogram(SAMPLES)
+        api = self.api()
+        for _ in range(self.settings.questions):
+            started = time.perf_counter()
+            api.structured_retriever(self.corpus.question())
+            latency.add(time.perf_counter() - started)
+        return {"seconds": latency.snapshot(), "max_rss_mb": max_rss_mb()}
+
+
+# Ingestion runs first so the question scenarios have a graph to search.
+SCENARIOS = [
+    "bulk_ingestion",
+    "single_question",
+    "structured_retriever",
+    "concurrent_sessions",
+    "long_history",
+]
+
+
+async def run_scenarios(
+    benchmark: Benchmark, scenarios: list[str]
+) -> dict[str, dict]:
+    results = {}
+    for name in SCENARIOS:
+        if name not in scenarios:
+            continue
+        scenario = getattr(benchmark, name)
+        if asyncio.iscoroutinefunction(scenario):
+            results[name] = await scenario()
+        else:
+            results[name] = await asyncio.to_thread(scenario)
+    return results
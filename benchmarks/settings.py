@@ -0,0 +1,42 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class BenchmarkSettings:
+    """The workload and the behavior of the fake LLM, one CLI option each."""
+
+    # Seconds before the fake LLM answers, and its streaming rate.
+    latency: float = 0.3
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 200
+    # Seconds per chunk extraction during ingestion.
+    extraction_latency: float = 0.5
+    # Documents ingested, questions per session, concurrent sessions and
+    # turns already in the long history chat.
+    documents: int = 50
+    questions: int = 20
+    sessions: int = 16
+    history_turns: int = 500
+    # "llm" or "gazetteer", as in the app settings.
+    entity_extractor: str = "llm"
+    materialize_neighborhoods: bool = False
+    seed: int = 0
+
+
+@dataclass
+class LoadSettings:
+    """What each simulated browser does, and the fake LLM of the started app."""
+
+    # Questions asked in the session's new chat, and sentences of the
+    # document it submits on the documents page (0 skips the documents page).
+    questions: int = 5
+    document_sentences: int = 20
+    # Seconds between a client's events, as a user would pause.
+    think_time: float = 0.5
+    # Seconds a client waits for an event's updates or its ingestion job.
+    timeout: float = 120.0
+    # The fake LLM of the app started by the load test (ignored with --url).
+    latency: float = 0.3
+    tokens_per_second: float = 50.0
+    answer_tokens: int = 200
+    seed: int = 0
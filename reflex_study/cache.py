@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+_MISSING = object()
+
+
+class TTLCache:
+    """A thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, name: str, maxsize: int = 1024, ttl: float = 600.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is not _MISSING and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not _MISSING:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+_caches: dict[str, TTLCache] = {}
+_stats_providers: dict[str, Callable[[], dict]] = {}
+
+
+def register_cache(name: str, maxsize: int = 1024, ttl: float = 600.0) -> TTLCache:
+    cache = _caches[name] = TTLCache(name, maxsize=maxsize, ttl=ttl)
+    register_stats(name, cache.stats)
+    return cache
+
+
+def register_stats(name: str, provider: Callable[[], dict]):
+    _stats_providers[name] = provider
+
+
+def cache_stats() -> dict[str, dict]:
+    return {name: provider() for name, provider in _stats_providers.items()}
+
+
+# Bumped after every ingestion so cache keys that include it stop matching
+# as soon as the knowledge graph changes.
+_generation = 0
+_generation_lock = threading.Lock()
+_bump_callbacks: list[Callable[[int], None]] = []
+
+
+def knowledge_generation() -> int:
+    return _generation
+
+
+def bump_knowledge_generation() -> int:
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        generation = _generation
+        for cache in _caches.values():
+            cache.clear()
+    for callback in _bump_callbacks:
+        callback(generation)
+    return generation
+
+
+def on_knowledge_generation_bump(callback: Callable[[int], None]):
+    """Registers a callback called with the new generation after each bump."""
+    _bump_callbacks.append(callback)
@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import cache
+from pathlib import Path
+from typing import NamedTuple
+
+CHAT_STORE_PATH = Path(os.getcwd()) / os.environ.get(
+    "CHAT_STORE_PATH", ".chats.sqlite3"
+)
+# How many messages are loaded at once when opening or scrolling a chat.
+HISTORY_PAGE_SIZE = 50
+# Deleted chats are removed from disk in the background at this interval.
+COMPACTION_INTERVAL = 600
+# Messages deleted per transaction while compacting, so the store lock is only
+# held briefly and other chats keep being served.
+COMPACTION_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS chats_owner_name
+    ON chats (owner, name) WHERE deleted = 0;
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    chat_id INTEGER NOT NULL REFERENCES chats (id),
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS messages_chat_id ON messages (chat_id, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    chat_id INTEGER PRIMARY KEY REFERENCES chats (id),
+    summary TEXT NOT NULL,
+    last_message_id INTEGER NOT NULL
+);
+"""
+
+
+class StoredQA(NamedTuple):
+    id: int
+    question: str
+    answer: str
+
+
+class ChatStore:
+    """
+    Chats and their questions and answers persisted in SQLite.
+
+    A chat is only marked as deleted by `delete_chat`; its rows are removed
+    later by `compact`, off the request path.
+    """
+
+    def __init__(self, path: Path | str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._connection.executescript(SCHEMA)
+
+    def _execute(self, sql: str, parameters: tuple = ()) -> int:
+        with self._lock:
+            return self._connection.execute(sql, parameters).lastrowid
+
+    def _fetchall(self, sql: str, parameters: tuple = ()) -> list[tuple]:
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _chat_id(self, owner: str, name: str) -> int | None:
+        rows = self._fetchall(
+            "SELECT id FROM chats WHERE owner = ? AND name = ? AND deleted = 0",
+            (owner, name),
+        )
+        return rows[0][0] if rows else None
+
+    def list_chats(self, owner: str) -> list[str]:
+        rows = self._fetchall(
+            "SELECT name FROM chats WHERE owner = ? AND deleted = 0 ORDER BY id",
+            (owner,),
+        )
+        return [row[0] for row in rows]
+
+    def create_chat(self, owner: str, name: str):
+        """Create an empty chat, replacing any chat with the same name."""
+        self.delete_chat(owner, name)
+        self._execute(
+            "INSERT INTO chats (owner, name, created_at) VALUES (?, ?, ?)",
+            (owner, name, time.time()),
+        )
+
+    def delete_chat(self, owner: str, name: str):
+        self._execute(
+            "UPDATE chats SET deleted = 1 WHERE owner = ? AND name = ? AND deleted = 0",
+            (owner, name),
+        )
+
+    def append(self, owner: str, name: str, question: str, answer: str) -> int:
+        chat_id = self._chat_id(owner, name)
+        if chat_id is None:
+            self.create_chat(owner, name)
+            chat_id = self._chat_id(owner, name)
+        return self._execute(
+            "INSERT INTO messages (chat_id, question, answer, created_at) "
+            "VALUES (?, ?, ?, ?)",
+            (chat_id, question, answer, time.time()),
+        )
+
+    def load_messages(
+        self,
+        owner: str,
+        name: str,
+        limit: int | None = HISTORY_PAGE_SIZE,
+        before_id: int | None = None,
+        after_id: int | None = None,
+    ) -> list[StoredQA]:
+        """
+        Returns the latest `limit` messages of the chat (older than `before_id`
+        and newer than `after_id` if given) in chronological order.
+        `limit=None` loads the whole chat.
+        """
+        chat_id = self._chat_id(owner, name)
+        if chat_id is None:
+            return []
+        sql = "SELECT id, question, answer FROM messages WHERE chat_id = ?"
+        parameters: tuple = (chat_id,)
+        if before_id is not None:
+            sql += " AND id < ?"
+            parameters += (before_id,)
+        if after_id is not None:
+            sql += " AND id > ?"
+            parameters += (after_id,)
+        # LIMIT -1 means no limit in SQLite.
+        sql += " ORDER BY id DESC LIMIT ?"
+        parameters += (limit if limit is not None else -1,)
+        rows = self._fetchall(sql, parameters)
+        return [StoredQA(*row) for row in reversed(rows)]
+
+    def get_summary(self, owner: str, name: str) -> tuple[str, int | None]:
+        """Returns the chat's summary and the id of the last message it covers."""
+        rows = self._fetchall(
+            "SELECT summary, last_message_id FROM summaries "
+            "JOIN chats ON chats.id = summaries.chat_id "
+            "WHERE owner = ? AND name = ? AND deleted = 0",
+            (owner, name),
+        )
+        return rows[0] if rows else ("", None)
+
+    def set_summary(self, owner: str, name: str, summary: str, last_message_id: int):
+        chat_id = self._chat_id(owner, name)
+        if chat_id is None:
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO summaries (chat_id, summary, last_message_id) "
+            "VALUES (?, ?, ?)",
+            (chat_id, summary, last_message_id),
+        )
+
+    def compact(self):
+        """Remove deleted chats and their messages and give the space back."""
+        while True:
+            with self._lock:
+                deleted = self._connection.execute(
+                    "DELETE FROM messages WHERE id IN (SELECT messages.id "
+                    "FROM messages JOIN chats ON chats.id = messages.chat_id "
+                    "WHERE deleted = 1 LIMIT ?)",
+                    (COMPACTION_BATCH_SIZE,),
+                ).rowcount
+            if deleted < COMPACTION_BATCH_SIZE:
+                break
+        with self._lock:
+            self._connection.execute("BEGIN")
+            self._connection.execute(
+                "DELETE FROM messages WHERE chat_id IN "
+                "(SELECT id FROM chats WHERE deleted = 1)"
+            )
+            self._connection.execute(
+                "DELETE FROM summaries WHERE chat_id IN "
+                "(SELECT id FROM chats WHERE deleted = 1)"
+            )
+            self._connection.execute("DELETE FROM chats WHERE deleted = 1")
+            self._connection.execute("COMMIT")
+        # A separate connection, so the store lock is not held during the vacuum.
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        try:
+            connection.execute("PRAGMA incremental_vacuum")
+        finally:
+            connection.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+@cache
+def get_chat_store() -> ChatStore:
+    return ChatStore(CHAT_STORE_PATH)
+
+
+async def _compact_periodically():
+    while True:
+        await asyncio.sleep(COMPACTION_INTERVAL)
+        try:
+            await asyncio.to_thread(get_chat_store().compact)
+        except Exception:
+            # A failed pass (e.g. a locked or full disk) is retried next time.
+            logger.exception("Compacting the chat store failed")
+
+
+@contextlib.asynccontextmanager
+async def chat_store_lifespan():
+    """Compact deleted chats in the background while the app is running."""
+    task = asyncio.create_task(_compact_periodically())
+    try:
+        yield
+    finally:
+        task.cancel()
+        if get_chat_store.cache_info().currsize:
+            get_chat_store().close()
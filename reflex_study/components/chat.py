@@ -16,10 +16,22 @@ def message(qa: QA) -> rx.Component:
     Returns:
         A component displaying the question/answer pair.
     """
+    return question_answer(qa.question, qa.answer)
+
+
+def streaming_message() -> rx.Component:
+    """The question being answered and the answer streamed so far."""
+    return rx.cond(
+        State.processing,
+        question_answer(State.streaming_question, State.streaming_answer),
+    )
+
+
+def question_answer(question: rx.Var, answer: rx.Var) -> rx.Component:
     return rx.box(
         rx.box(
             rx.markdown(
-                qa.question,
+                question,
                 background_color=rx.color("mauve", 4),
                 color=rx.color("mauve", 12),
                 **message_style,
@@ -29,7 +41,7 @@ def message(qa: QA) -> rx.Component:
         ),
         rx.box(
             rx.markdown(
-                qa.answer,
+                answer,
                 background_color=rx.color("accent", 4),
                 color=rx.color("accent", 12),
                 **message_style,
@@ -44,7 +56,21 @@ def message(qa: QA) -> rx.Component:
 def chat() -> rx.Component:
     """List all the messages in a single conversation."""
     return rx.vstack(
-        rx.box(rx.foreach(State.chats[State.current_chat], message), width="100%"),
+        rx.box(
+            rx.cond(
+                State.has_older_messages,
+                rx.center(
+                    rx.button(
+                        "Load older messages",
+                        on_click=State.load_older_messages,
+                        variant="ghost",
+                    ),
+                ),
+            ),
+            rx.foreach(State.messages, message),
+            streaming_message(),
+            width="100%",
+        ),
         py="8",
         flex="1",
         width="100%",
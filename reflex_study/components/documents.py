@@ -1,6 +1,7 @@
 import reflex as rx
 
 from reflex_study.components import loading_icon
+from reflex_study.jobs import FAILED
 from reflex_study.state import State
 
 
@@ -22,7 +23,7 @@ def action_bar() -> rx.Component:
                         ),
                         rx.button(
                             rx.cond(
-                                State.processing,
+                                State.ingesting,
                                 loading_icon(height="1em"),
                                 rx.text("Send"),
                             ),
@@ -30,11 +31,53 @@ def action_bar() -> rx.Component:
                         ),
                         align_items="center",
                     ),
-                    is_disabled=State.processing,
+                    is_disabled=State.ingesting,
                 ),
                 on_submit=State.process_documents,
                 reset_on_submit=True,
             ),
+            rx.cond(
+                State.ingestion_job_id != "",
+                rx.vstack(
+                    rx.progress(
+                        value=State.ingestion_written,
+                        max=State.ingestion_total,
+                        width="100%",
+                    ),
+                    rx.hstack(
+                        rx.text(
+                            State.ingestion_status,
+                            ": ",
+                            State.ingestion_written,
+                            " / ",
+                            State.ingestion_total,
+                            " chunks",
+                            font_size=".75em",
+                            color=rx.color("mauve", 10),
+                        ),
+                        rx.cond(
+                            State.ingesting,
+                            rx.button(
+                                "Cancel",
+                                size="1",
+                                variant="soft",
+                                on_click=State.cancel_ingestion,
+                            ),
+                        ),
+                        rx.cond(
+                            State.ingestion_status == FAILED,
+                            rx.button(
+                                "Retry",
+                                size="1",
+                                variant="soft",
+                                on_click=State.retry_ingestion,
+                            ),
+                        ),
+                        align_items="center",
+                    ),
+                    width="100%",
+                ),
+            ),
         ),
         position="sticky",
         bottom="0",
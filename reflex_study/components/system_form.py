@@ -4,6 +4,8 @@ import reflex as rx
 from pydantic.v1 import ConfigDict
 
 from reflex_study.config_state import ConfigState, MODEL_CHOICES
+from reflex_study.context_builder import DEFAULT_CONTEXT_TOKEN_BUDGET
+from reflex_study.langchain_api import ENTITY_EXTRACTOR_CHOICES
 
 from . import style_attribtues
 
@@ -54,6 +56,19 @@ class Model(ConfigBase):
         return True, ""
 
 
+class EntityExtractor(ConfigBase):
+    value: str = ""
+
+    def _validate(self) -> tuple[bool, str]:
+        if self.value not in ENTITY_EXTRACTOR_CHOICES:
+            return (
+                False,
+                f"{self.value} is not a valid entity extractor. "
+                f"Choose from {ENTITY_EXTRACTOR_CHOICES}.",
+            )
+        return True, ""
+
+
 class Temperature(ConfigBase):
     enable: bool
     value: float
@@ -160,12 +175,33 @@ class TopP(ConfigBase):
         return self.value
 
 
+class ContextTokenBudget(ConfigBase):
+    value: int
+
+    MIN_VALUE: ClassVar[int] = 100
+    MAX_VALUE: ClassVar[int] = 100_000
+
+    def _validate(self) -> tuple[bool, str]:
+        if self.value < self.MIN_VALUE or self.MAX_VALUE < self.value:
+            return (
+                False,
+                f"Context token budget must be between {self.MIN_VALUE} "
+                f"and {self.MAX_VALUE}.",
+            )
+        return True, ""
+
+
 class SystemFormState(rx.State):
     input_content: Content = Content(value="")
     input_model: Model = Model(value="")
     input_temperature: Temperature = Temperature(temperature=0.0)
     input_seed: Seed = Seed(seed=0)
     input_top_p: TopP = TopP(top_p=0.0)
+    input_entity_extractor: EntityExtractor = EntityExtractor(value="")
+    input_semantic_cache: bool = False
+    input_context_token_budget: ContextTokenBudget = ContextTokenBudget(
+        value=DEFAULT_CONTEXT_TOKEN_BUDGET
+    )
 
     @rx.var
     def is_valid(self) -> bool:
@@ -176,6 +212,8 @@ class SystemFormState(rx.State):
                 self.input_model.is_valid,
                 self.input_seed.is_valid,
                 self.input_top_p.is_valid,
+                self.input_entity_extractor.is_valid,
+                self.input_context_token_budget.is_valid,
             ]
         )
 
@@ -185,6 +223,17 @@ class SystemFormState(rx.State):
     def set_input_model(self, model: str):
         self.input_model.value = model
 
+    def set_input_entity_extractor(self, entity_extractor: str):
+        self.input_entity_extractor.value = entity_extractor
+
+    def enable_semantic_cache(self, enable: bool):
+        self.input_semantic_cache = enable
+
+    def set_context_token_budget(self, context_token_budget: str):
+        self.input_context_token_budget.value = (
+            int(context_token_budget) if context_token_budget.isnumeric() else 0
+        )
+
     def set_temperature(self, temperature_values: list[float]):
         assert len(temperature_values) == 1
         self.input_temperature.value = float(temperature_values[0])
@@ -214,6 +263,11 @@ class SystemFormState(rx.State):
         )
         self.input_seed = Seed(seed=config.seed)
         self.input_top_p = TopP(top_p=config.top_p)
+        self.input_entity_extractor = EntityExtractor(value=config.entity_extractor)
+        self.input_semantic_cache = config.semantic_cache
+        self.input_context_token_budget = ContextTokenBudget(
+            value=config.context_token_budget
+        )
 
     async def save(self):
         config = await self.get_state(ConfigState)
@@ -223,6 +277,9 @@ class SystemFormState(rx.State):
             temperature=self.input_temperature.get_value(),
             seed=self.input_seed.get_value(),
             top_p=self.input_top_p.get_value(),
+            entity_extractor=self.input_entity_extractor.value,
+            semantic_cache=self.input_semantic_cache,
+            context_token_budget=self.input_context_token_budget.value,
         )
 
 
@@ -248,6 +305,34 @@ def system_content_form():
                     is_invalid=~SystemFormState.input_model.is_valid,
                     width="100%",
                 ),
+                rx.select(
+                    ENTITY_EXTRACTOR_CHOICES,
+                    value=SystemFormState.input_entity_extractor.value,
+                    on_change=lambda value: SystemFormState.set_input_entity_extractor(
+                        value
+                    ),
+                    label="Entity Extractor",
+                    is_invalid=~SystemFormState.input_entity_extractor.is_valid,
+                    width="100%",
+                ),
+                rx.vstack(
+                    rx.text("Context Token Budget"),
+                    rx.chakra.number_input(
+                        value=SystemFormState.input_context_token_budget.value,
+                        on_change=SystemFormState.set_context_token_budget,
+                        min_=ContextTokenBudget.MIN_VALUE,
+                        max_=ContextTokenBudget.MAX_VALUE,
+                        is_invalid=~SystemFormState.input_context_token_budget.is_valid,
+                    ),
+                    width="100%",
+                    margin_bottom="1em",
+                ),
+                rx.checkbox(
+                    checked=SystemFormState.input_semantic_cache,
+                    on_change=SystemFormState.enable_semantic_cache,
+                    text="Reuse answers to similar questions",
+                    margin_bottom="1em",
+                ),
                 rx.vstack(
                     rx.checkbox(
                         checked=SystemFormState.input_temperature.enable,
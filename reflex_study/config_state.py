@@ -4,6 +4,9 @@ from functools import cache
 
 import reflex as rx
 
+from reflex_study.context_builder import DEFAULT_CONTEXT_TOKEN_BUDGET
+from reflex_study.fakes import FAKE_MODEL
+from reflex_study.langchain_api import ENTITY_EXTRACTOR_CHOICES, LLM_ENTITY_EXTRACTOR
 from rxconfig import CONFIG_FILE_PATH
 
 SYSTEM_CONTENT_KEY = "system_content"
@@ -11,6 +14,9 @@ MODEL_KEY = "model"
 TEMPERATURE_KEY = "temperature"
 SEED_KEY = "seed"
 TOP_P_KEY = "top_p"
+ENTITY_EXTRACTOR_KEY = "entity_extractor"
+SEMANTIC_CACHE_KEY = "semantic_cache"
+CONTEXT_TOKEN_BUDGET_KEY = "context_token_budget"
 
 MODEL_CHOICES = ["gpt-4o", "gpt-4-turbo", "gpt-4", "gpt-3.5-turbo"]
 
@@ -34,6 +40,9 @@ class ConfigState(rx.State):
     _default_seed = None
     _default_temperature = None
     _default_top_p = None
+    _default_entity_extractor = LLM_ENTITY_EXTRACTOR
+    _default_semantic_cache = False
+    _default_context_token_budget = DEFAULT_CONTEXT_TOKEN_BUDGET
 
     @rx.var
     def config(self) -> dict:
@@ -47,6 +56,9 @@ class ConfigState(rx.State):
         temperature: float | None,
         seed: int | None,
         top_p: float | None,
+        entity_extractor: str,
+        semantic_cache: bool,
+        context_token_budget: int,
     ):
         config_values = {
             SYSTEM_CONTENT_KEY: content,
@@ -54,6 +66,9 @@ class ConfigState(rx.State):
             TEMPERATURE_KEY: temperature,
             SEED_KEY: seed,
             TOP_P_KEY: top_p,
+            ENTITY_EXTRACTOR_KEY: entity_extractor,
+            SEMANTIC_CACHE_KEY: semantic_cache,
+            CONTEXT_TOKEN_BUDGET_KEY: context_token_budget,
         }
         with CONFIG_FILE_PATH.open("w+") as file:
             json.dump(config_values, file, indent=2, ensure_ascii=False)
@@ -69,7 +84,8 @@ class ConfigState(rx.State):
     @rx.var
     def model(self) -> str:
         if model := self.config.get(MODEL_KEY):
-            if model in MODEL_CHOICES:
+            # The fake model is not offered in the form, only set for load tests.
+            if model in MODEL_CHOICES or model == FAKE_MODEL:
                 return model
             warnings.warn(f"Invalid model choice: {model}")
 
@@ -86,3 +102,22 @@ class ConfigState(rx.State):
     @rx.var
     def top_p(self) -> float | None:
         return self.config.get("top_p", self._default_top_p)
+
+    @rx.var
+    def entity_extractor(self) -> str:
+        if entity_extractor := self.config.get(ENTITY_EXTRACTOR_KEY):
+            if entity_extractor in ENTITY_EXTRACTOR_CHOICES:
+                return entity_extractor
+            warnings.warn(f"Invalid entity extractor choice: {entity_extractor}")
+
+        return self._default_entity_extractor
+
+    @rx.var
+    def semantic_cache(self) -> bool:
+        return self.config.get(SEMANTIC_CACHE_KEY, self._default_semantic_cache)
+
+    @rx.var
+    def context_token_budget(self) -> int:
+        return self.config.get(
+            CONTEXT_TOKEN_BUDGET_KEY, self._default_context_token_budget
+        )
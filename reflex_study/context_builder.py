@@ -0,0 +1,99 @@
+import re
+from typing import NamedTuple, TypedDict
+
+from reflex_study.tokens import count_tokens
+
+DEFAULT_CONTEXT_TOKEN_BUDGET = 2000
+
+STRUCTURED_HEADER = "Structured data:\n"
+UNSTRUCTURED_HEADER = "\nUnstructured data:\n"
+DOCUMENT_SEPARATOR = "#Document "
+
+
+class Triple(TypedDict):
+    source: str
+    type: str
+    target: str
+    score: float
+
+
+class Chunk(TypedDict):
+    text: str
+    score: float
+
+
+def format_triple(triple: Triple) -> str:
+    return f"{triple['source']} - {triple['type']} -> {triple['target']}"
+
+
+class Candidate(NamedTuple):
+    score: float
+    text: str
+    structured: bool
+
+
+class ContextBuilder:
+    """
+    Assembles the retrieved context for the system prompt within a token budget.
+
+    Triples and chunks are deduplicated and ranked within their own source
+    (full-text scores are normalized by the best one, vector similarities are
+    already in [0, 1]). The two rankings are then interleaved, the n-th triple
+    next to the n-th chunk, so that dozens of well-matched triples cannot push
+    every chunk out. Items are added in that order until the budget measured
+    with the model's tokenizer is used up.
+    """
+
+    def __init__(self, model: str, token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET):
+        self.model = model
+        self.token_budget = token_budget
+        # Tokens of the last built context.
+        self.tokens = 0
+
+    def rank(self, triples: list[Triple], chunks: list[Chunk]) -> list[Candidate]:
+        candidates: dict[str, Candidate] = {}
+        best_triple_score = max((triple["score"] for triple in triples), default=0)
+        for triple in triples:
+            text = format_triple(triple)
+            score = triple["score"] / best_triple_score if best_triple_score else 0
+            if text not in candidates or candidates[text].score < score:
+                candidates[text] = Candidate(score, text, True)
+        for chunk in chunks:
+            text = re.sub(r"\s+", " ", chunk["text"]).strip()
+            if text not in candidates or candidates[text].score < chunk["score"]:
+                candidates[text] = Candidate(chunk["score"], text, False)
+        ranked = sorted(candidates.values(), key=lambda candidate: -candidate.score)
+        structured = [candidate for candidate in ranked if candidate.structured]
+        unstructured = [candidate for candidate in ranked if not candidate.structured]
+        interleaved = []
+        for rank in range(max(len(structured), len(unstructured))):
+            pair = structured[rank : rank + 1] + unstructured[rank : rank + 1]
+            interleaved += sorted(pair, key=lambda candidate: -candidate.score)
+        return interleaved
+
+    def build(self, triples: list[Triple], chunks: list[Chunk]) -> str:
+        budget = self.token_budget - count_tokens(
+            STRUCTURED_HEADER + UNSTRUCTURED_HEADER, self.model
+        )
+        structured: list[str] = []
+        unstructured: list[str] = []
+        for candidate in self.rank(triples, chunks):
+            text = (
+                candidate.text
+                if candidate.structured
+                else DOCUMENT_SEPARATOR + candidate.text
+            )
+            tokens = count_tokens(text, self.model) + 1
+            if tokens > budget:
+                # A smaller item further down the ranking may still fit.
+                continue
+            budget -= tokens
+            (structured if candidate.structured else unstructured).append(text)
+
+        self.tokens = self.token_budget - budget
+        return (
+            STRUCTURED_HEADER
+            + "\n".join(structured)
+            + UNSTRUCTURED_HEADER
+            + "\n".join(unstructured)
+        )
@@ -0,0 +1,224 @@
+import contextlib
+import fcntl
+import hashlib
+import os
+import re
+import threading
+import warnings
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from reflex_study.cache import register_stats
+
+EMBEDDING_CACHE_PATH = Path(os.getcwd()) / os.environ.get(
+    "EMBEDDING_CACHE_PATH", ".embeddings"
+)
+# Number of texts sent to the embeddings API per request.
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", "512"))
+INITIAL_CAPACITY = 1024
+
+
+def embedding_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}:{text}".encode()).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embeddings persisted on disk.
+
+    Vectors are rows of a memory-mapped float32 `.npy` matrix that doubles in
+    size when full, and `.keys` lists the key of each row in order. A row is
+    only appended to `.keys` after its vector is flushed, so an interrupted
+    write leaves at most an unused row behind. Each embedding model has its own
+    files; vectors of another width than the matrix start the files over.
+
+    Several processes (the app and ingest_cli) may share the files. Writers
+    take an exclusive `flock` on `.lock` and first catch up with the rows the
+    others appended, so they never hand out the same row twice.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._matrix: np.ndarray | None = None
+        self._matrix_inode: int | None = None
+        self._rows: dict[str, int] = {}
+        # Rows listed in `.keys`, and how many bytes of it were read.
+        self._used = 0
+        self._keys_offset = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def _matrix_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".npy")
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".keys")
+
+    @property
+    def _lock_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".lock")
+
+    @contextlib.contextmanager
+    def _file_lock(self):
+        """Exclusive across processes; released when the file is closed."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock_path.open("a") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            yield
+
+    def load(self):
+        with self._lock:
+            self._refresh()
+
+    def _forget_rows(self):
+        self._rows = {}
+        self._used = 0
+        self._keys_offset = 0
+
+    def _refresh(self):
+        """Catch up with the files, which other processes may have changed."""
+        try:
+            inode = self._matrix_path.stat().st_ino
+        except FileNotFoundError:
+            return
+        if inode != self._matrix_inode:
+            # Grown, or started over with another width, by another process.
+            matrix = np.load(self._matrix_path, mmap_mode="r+")
+            if self._matrix is not None and matrix.shape[1] != self._matrix.shape[1]:
+                self._forget_rows()
+            self._matrix, self._matrix_inode = matrix, inode
+        try:
+            with self._keys_path.open("rb") as file:
+                if file.seek(0, os.SEEK_END) < self._keys_offset:
+                    self._forget_rows()
+                file.seek(self._keys_offset)
+                for line in file:
+                    # A torn last line, or a key whose row was never flushed.
+                    if not line.endswith(b"\n") or self._used >= len(self._matrix):
+                        break
+                    self._rows[line.decode().strip()] = self._used
+                    self._used += 1
+                    self._keys_offset += len(line)
+        except FileNotFoundError:
+            self._forget_rows()
+
+    def _reserve(self, rows: int, dimensions: int):
+        """Make room for `rows` more vectors, growing the file if needed."""
+        if self._matrix is not None and self._matrix.shape[1] != dimensions:
+            warnings.warn(
+                f"Starting {self._matrix_path} over: it holds vectors of "
+                f"{self._matrix.shape[1]} dimensions, not {dimensions}."
+            )
+            self._matrix = None
+            self._forget_rows()
+            self._keys_path.unlink(missing_ok=True)
+        used = self._used
+        if self._matrix is not None and used + rows <= len(self._matrix):
+            return
+        capacity = max(INITIAL_CAPACITY, used + rows)
+        if self._matrix is not None:
+            capacity = max(capacity, 2 * len(self._matrix))
+        tmp_path = self._matrix_path.with_suffix(".tmp.npy")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        matrix = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.float32, shape=(capacity, dimensions)
+        )
+        if self._matrix is not None:
+            matrix[:used] = self._matrix[:used]
+        matrix.flush()
+        del matrix
+        os.replace(tmp_path, self._matrix_path)
+        self._matrix = np.load(self._matrix_path, mmap_mode="r+")
+        self._matrix_inode = self._matrix_path.stat().st_ino
+
+    def get_many(self, keys: list[str]) -> list[np.ndarray | None]:
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            vectors = [
+                None if row is None else np.array(self._matrix[row]) for row in rows
+            ]
+            misses = rows.count(None)
+            self.hits += len(rows) - misses
+            self.misses += misses
+            return vectors
+
+    def add_many(self, keys: list[str], vectors: list[list[float]]):
+        with self._lock, self._file_lock():
+            self._refresh()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self._rows:
+                    new[key] = vector
+            if not new:
+                return
+            dimensions = len(next(iter(new.values())))
+            self._reserve(len(new), dimensions)
+            first = self._used
+            self._matrix[first : first + len(new)] = np.asarray(
+                list(new.values()), dtype=np.float32
+            )
+            self._matrix.flush()
+            lines = "".join(f"{key}\n" for key in new).encode()
+            with self._keys_path.open("ab") as file:
+                # Drops a torn line left by a crash, so the keys stay aligned.
+                file.truncate(self._keys_offset)
+                file.write(lines)
+            for row, key in enumerate(new, start=first):
+                self._rows[key] = row
+            self._used += len(new)
+            self._keys_offset += len(lines)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._rows),
+                "maxsize": None if self._matrix is None else len(self._matrix),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class CachedEmbedder:
+    """Embeds texts in large batches, computing only the ones not cached yet."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        model: str,
+        embedding_cache: EmbeddingCache,
+        batch_size: int = EMBEDDING_BATCH_SIZE,
+    ):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = embedding_cache
+        self.batch_size = batch_size
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        keys = [embedding_key(self.model, text) for text in texts]
+        vectors = self.cache.get_many(keys)
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start : start + self.batch_size]
+            computed = self.embeddings.embed_documents([texts[i] for i in batch])
+            self.cache.add_many([keys[i] for i in batch], computed)
+            for i, vector in zip(batch, computed):
+                vectors[i] = vector
+        return [np.asarray(vector, dtype=np.float32).tolist() for vector in vectors]
+
+
+@cache
+def get_embedding_cache(model: str) -> EmbeddingCache:
+    """One cache (matrix and keys file) per embedding model."""
+    name = re.sub(r"[^\w-]+", "_", model)
+    embedding_cache = EmbeddingCache(
+        EMBEDDING_CACHE_PATH.with_name(f"{EMBEDDING_CACHE_PATH.name}-{name}")
+    )
+    embedding_cache.load()
+    register_stats(f"embeddings:{model}", embedding_cache.stats)
+    return embedding_cache
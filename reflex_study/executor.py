@@ -0,0 +1,16 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+# Blocking Neo4j / embedding calls run here so they never stall the event loop.
+RETRIEVAL_WORKERS = int(os.environ.get("RETRIEVAL_WORKERS", "16"))
+_executor = ThreadPoolExecutor(
+    max_workers=RETRIEVAL_WORKERS, thread_name_prefix="retrieval"
+)
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any) -> Any:
+    """Run a synchronous call on the bounded retrieval thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
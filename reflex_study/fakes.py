@@ -0,0 +1,225 @@
+"""
+Deterministic local stand-ins for ChatOpenAI and OpenAIEmbeddings, used by the
+benchmarks and by load tests against an app that must not call OpenAI.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, Sequence
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+FAKE_MODEL = "fake"
+FAKE_EMBEDDING_MODEL = "fake"
+FAKE_EMBEDDING_DIMENSIONS = 256
+# Defaults of the fake chat model the app gets for the model "fake", so a load
+# test can set them on the server it starts.
+FAKE_LLM_LATENCY = float(os.environ.get("FAKE_LLM_LATENCY", "0.3"))
+FAKE_LLM_TOKENS_PER_SECOND = float(os.environ.get("FAKE_LLM_TOKENS_PER_SECOND", "50"))
+FAKE_LLM_ANSWER_TOKENS = int(os.environ.get("FAKE_LLM_ANSWER_TOKENS", "200"))
+
+# Capitalized words and runs of them ("Acme Corp"), the fake's entities.
+ENTITY_PATTERN = re.compile(r"\b[A-Z][a-z]+(?: [A-Z][a-z]+)*\b")
+MAX_ENTITIES = 8
+# Capitalized only because they start a sentence.
+NOT_ENTITIES = set(
+    "The A An What Who Whom Where When Which How Why Is Are Does Do Did Can "
+    "Tell Please And".split()
+)
+# The structured output prompts end with "...from the following input: ...".
+INPUT_MARKER = "following input:"
+NODE_TYPES = ["Person", "Organization"]
+
+# The fake answer cycles through these words.
+ANSWER_WORDS = (
+    "The context mentions several people and organizations that are related "
+    "to each other and this answer summarizes what it says about them"
+).split()
+
+
+def fake_entities(text: str) -> list[str]:
+    text = text.rpartition(INPUT_MARKER)[2] or text
+    entities = [
+        entity for entity in ENTITY_PATTERN.findall(text) if entity not in NOT_ENTITIES
+    ]
+    return list(dict.fromkeys(entities))[:MAX_ENTITIES]
+
+
+def _digest(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "big")
+
+
+def _message_text(message: BaseMessage) -> str:
+    return message.content if isinstance(message.content, str) else str(message)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Streams a deterministic answer after `latency` seconds, at
+    `tokens_per_second`, taking `prompt_tokens_per_second` to read the prompt
+    (so long histories cost time as they do with the real model).
+
+    Tool calls answer the two structured outputs the app asks for: the entity
+    names of a question (a `names` field) and the graph of a chunk (`nodes`
+    and `relationships`), both from the capitalized words of the input.
+    """
+
+    model_name: str = FAKE_MODEL
+    latency: float = FAKE_LLM_LATENCY
+    tokens_per_second: float = FAKE_LLM_TOKENS_PER_SECOND
+    prompt_tokens_per_second: float = 20000.0
+    answer_tokens: int = FAKE_LLM_ANSWER_TOKENS
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        return self.bind(tools=[convert_to_openai_tool(tool) for tool in tools])
+
+    def _prompt_delay(self, messages: list[BaseMessage]) -> float:
+        prompt_tokens = sum(len(_message_text(message)) for message in messages) / 4
+        return self.latency + prompt_tokens / self.prompt_tokens_per_second
+
+    def _answer(self, messages: list[BaseMessage]) -> list[str]:
+        start = _digest(_message_text(messages[-1])) % len(ANSWER_WORDS)
+        return [
+            " " + ANSWER_WORDS[(start + i) % len(ANSWER_WORDS)]
+            for i in range(self.answer_tokens)
+        ]
+
+    def _tool_message(self, messages: list[BaseMessage], tool: dict) -> AIMessage:
+        function = tool["function"]
+        properties = function["parameters"].get("properties", {})
+        entities = fake_entities(_message_text(messages[-1]))
+        if "names" in properties:
+            args: dict[str, Any] = {"names": entities}
+        else:
+            types = {
+                entity: NODE_TYPES[_digest(entity) % len(NODE_TYPES)]
+                for entity in entities
+            }
+            args = {
+                "nodes": [{"id": entity, "type": types[entity]} for entity in entities],
+                "relationships": [
+                    {
+                        "source_node_id": source,
+                        "source_node_type": types[source],
+                        "target_node_id": target,
+                        "target_node_type": types[target],
+                        "type": "RELATED_TO",
+                    }
+                    for source, target in zip(entities, entities[1:])
+                ],
+            }
+        return AIMessage(
+            content="",
+            tool_calls=[
+                {
+                    "name": function["name"],
+                    "args": args,
+                    "id": f"call_{_digest(json.dumps(args)) % 10**12}",
+                }
+            ],
+        )
+
+    def _result(self, messages: list[BaseMessage], **kwargs: Any) -> ChatResult:
+        if tools := kwargs.get("tools"):
+            message = self._tool_message(messages, tools[0])
+        else:
+            message = AIMessage(content="".join(self._answer(messages)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generation_time(self, result: ChatResult) -> float:
+        message = result.generations[0].message
+        tokens = len(str(message.content) + json.dumps(message.tool_calls)) / 4
+        return tokens / self.tokens_per_second
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        result = self._result(messages, **kwargs)
+        time.sleep(self._prompt_delay(messages) + self._generation_time(result))
+        return result
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        result = self._result(messages, **kwargs)
+        await asyncio.sleep(
+            self._prompt_delay(messages) + self._generation_time(result)
+        )
+        return result
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._prompt_delay(messages))
+        for token in self._answer(messages):
+            time.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._prompt_delay(messages))
+        for token in self._answer(messages):
+            await asyncio.sleep(1 / self.tokens_per_second)
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Hashed bag-of-words vectors: texts sharing words are similar, the same
+    text always gets the same vector, and nothing leaves the process.
+    """
+
+    def __init__(self, dimensions: int = FAKE_EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text: str) -> list[float]:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = _digest(word)
+            vector[digest % self.dimensions] += 1.0 if digest & 1 << 32 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed(text)
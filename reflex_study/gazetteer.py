@@ -0,0 +1,195 @@
+import re
+import threading
+from collections import defaultdict, deque
+from typing import Iterable
+
+# Same tolerance as the `~2` fuzzy operator used by the full-text queries.
+MAX_EDIT_DISTANCE = 2
+# Fuzzy matching very short words matches almost anything.
+MIN_FUZZY_WORD_LENGTH = 4
+# Single-word entities shorter than this, or that are stopwords, only match
+# with the same case ("IS" the company, not "is" the verb).
+MIN_CASELESS_WORD_LENGTH = 4
+STOPWORDS = frozenset(
+    "a about after all also an and any are as at be been but by can could did do "
+    "does for from had has have he her his how i if in into is it its me my no "
+    "not of on or our she so than that the their them then there these they "
+    "this to up us was we were what when where which who whom why will with "
+    "would you your".split()
+)
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [token.lower() for token in _TOKEN_PATTERN.findall(text)]
+
+
+def is_ambiguous_word(word: str) -> bool:
+    """Whether a lowercased word is too short or too common to match caselessly."""
+    return len(word) < MIN_CASELESS_WORD_LENGTH or word in STOPWORDS
+
+
+def deletes(word: str, max_distance: int = MAX_EDIT_DISTANCE) -> set[str]:
+    """The word and every variant of it with up to `max_distance` letters removed."""
+    variants = frontier = {word}
+    for _ in range(max_distance):
+        frontier = {
+            variant[:i] + variant[i + 1 :]
+            for variant in frontier
+            for i in range(len(variant))
+        }
+        variants = variants | frontier
+    return variants
+
+
+def within_distance(a: str, b: str, max_distance: int = MAX_EDIT_DISTANCE) -> bool:
+    """Levenshtein distance check that gives up as soon as the bound is exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
+
+
+class EntityGazetteer:
+    """
+    In-memory index of the graph's entity ids.
+
+    Exact mentions are found with an Aho-Corasick automaton over word tokens,
+    so a question is scanned once regardless of the number of entities. Words
+    that do not match exactly fall back to an edit distance search (<= 2,
+    like `generate_full_text_query`) through a symmetric delete index: two
+    words within the distance share a variant with up to two letters removed,
+    so only the first tokens sharing one with the word are compared. Single-word
+    entities that are short or stopwords must also match in case.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # entity key (tuple of tokens) -> original id
+        self._entities: dict[tuple[str, ...], str] = {}
+        # first token -> entity keys starting with it
+        self._by_first_token: dict[str, set[tuple[str, ...]]] = defaultdict(set)
+        # deletes() variant -> first tokens it was derived from
+        self._first_tokens_by_delete: dict[str, set[str]] = defaultdict(set)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[tuple[str, ...]]] = [[]]
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+    def add(self, names: Iterable[str]):
+        """Add entity ids. The automaton is rebuilt lazily on the next lookup."""
+        with self._lock:
+            for name in names:
+                key = tuple(tokenize(str(name)))
+                if not key or key in self._entities:
+                    continue
+                self._entities[key] = str(name)
+                if key[0] not in self._by_first_token:
+                    for variant in deletes(key[0]):
+                        self._first_tokens_by_delete[variant].add(key[0])
+                self._by_first_token[key[0]].add(key)
+                self._dirty = True
+
+    def _build(self):
+        goto: list[dict[str, int]] = [{}]
+        output: list[list[tuple[str, ...]]] = [[]]
+        for key in self._entities:
+            state = 0
+            for token in key:
+                if token not in goto[state]:
+                    goto.append({})
+                    output.append([])
+                    goto[state][token] = len(goto) - 1
+                state = goto[state][token]
+            output[state].append(key)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and token not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(token, 0)
+                output[child] = output[child] + output[fail[child]]
+
+        self._goto, self._fail, self._output = goto, fail, output
+        self._dirty = False
+
+    def _accepts(self, key: tuple[str, ...], word: str) -> bool:
+        """Whether the mention `word` of a one-word entity counts as a match."""
+        if len(key) > 1 or not is_ambiguous_word(key[0]):
+            return True
+        return _TOKEN_PATTERN.findall(self._entities[key])[0] == word
+
+    def extract(self, text: str) -> list[str]:
+        """Returns the ids of the entities mentioned in the text."""
+        words = _TOKEN_PATTERN.findall(text)
+        tokens = [word.lower() for word in words]
+        with self._lock:
+            if self._dirty:
+                self._build()
+            found: dict[tuple[str, ...], None] = {}
+            matched = [False] * len(tokens)
+
+            state = 0
+            for i, token in enumerate(tokens):
+                while state and token not in self._goto[state]:
+                    state = self._fail[state]
+                state = self._goto[state].get(token, 0)
+                for key in self._output[state]:
+                    if not self._accepts(key, words[i]):
+                        continue
+                    found[key] = None
+                    for j in range(i - len(key) + 1, i + 1):
+                        matched[j] = True
+
+            for i, token in enumerate(tokens):
+                if (
+                    matched[i]
+                    or len(token) < MIN_FUZZY_WORD_LENGTH
+                    or token in STOPWORDS
+                ):
+                    continue
+                for key in self._fuzzy_candidates(token):
+                    if self._fuzzy_match(key, tokens[i:]):
+                        found[key] = None
+
+            return [self._entities[key] for key in found]
+
+    def _fuzzy_candidates(self, token: str) -> Iterable[tuple[str, ...]]:
+        first_tokens: set[str] = set()
+        for variant in deletes(token):
+            first_tokens.update(self._first_tokens_by_delete.get(variant, ()))
+        for first_token in first_tokens:
+            if within_distance(token, first_token):
+                yield from self._by_first_token[first_token]
+
+    @staticmethod
+    def _fuzzy_match(key: tuple[str, ...], tokens: list[str]) -> bool:
+        if len(key) > len(tokens):
+            return False
+        return all(
+            word == token
+            or (len(word) >= MIN_FUZZY_WORD_LENGTH and within_distance(word, token))
+            for word, token in zip(key, tokens)
+        )
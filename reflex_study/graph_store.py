@@ -0,0 +1,505 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from pathlib import Path
+from typing import Protocol, TypedDict
+
+import numpy as np
+from langchain_community.graphs import Neo4jGraph
+from langchain_community.graphs.graph_document import GraphDocument
+from langchain_community.vectorstores.neo4j_vector import remove_lucene_chars
+
+from reflex_study.context_builder import Triple
+from reflex_study.executor import run_blocking
+from reflex_study.gazetteer import (
+    MIN_FUZZY_WORD_LENGTH,
+    deletes,
+    tokenize,
+    within_distance,
+)
+from reflex_study.graph_writer import GraphWriter, relationship_type
+from reflex_study.neo4j_async import AsyncNeo4jClient
+
+NEO4J_GRAPH_BACKEND = "neo4j"
+MEMORY_GRAPH_BACKEND = "memory"
+GRAPH_BACKEND_CHOICES = [NEO4J_GRAPH_BACKEND, MEMORY_GRAPH_BACKEND]
+
+GRAPH_STORE_PATH = Path(os.getcwd()) / os.environ.get(
+    "GRAPH_STORE_PATH", ".graph_store"
+)
+# Entities matched per name, like the `{limit:20}` of the full-text query.
+ENTITY_MATCH_LIMIT = 20
+
+# All entities in one round-trip. Triples reached from several entities are
+# merged by the implicit grouping and keep their best full-text score.
+BATCHED_ENTITY_NEIGHBORHOOD_QUERY = """UNWIND $queries AS query
+CALL db.index.fulltext.queryNodes('entity', query, {limit:20})
+YIELD node,score
+CALL {
+  WITH node
+  MATCH (node)-[r:!MENTIONS]->(neighbor)
+  RETURN node.id AS source, type(r) AS type, neighbor.id AS target
+  UNION ALL
+  WITH node
+  MATCH (node)<-[r:!MENTIONS]-(neighbor)
+  RETURN neighbor.id AS source, type(r) AS type, node.id AS target
+}
+WITH source, type, target, max(score) AS score, collect(DISTINCT query) AS queries
+RETURN source, type, target, score, queries
+ORDER BY score DESC
+LIMIT $limit
+"""
+
+# The neighborhoods of exact entity ids, best connected neighbors first.
+ENTITY_NEIGHBORHOODS_QUERY = """UNWIND $ids AS id
+MATCH (node:__Entity__ {id: id})
+CALL {
+  WITH node
+  MATCH (node)-[r:!MENTIONS]->(neighbor)
+  RETURN node.id AS source, type(r) AS type, neighbor.id AS target,
+         COUNT { (neighbor)--() } AS degree
+  UNION ALL
+  WITH node
+  MATCH (node)<-[r:!MENTIONS]-(neighbor)
+  RETURN neighbor.id AS source, type(r) AS type, node.id AS target,
+         COUNT { (neighbor)--() } AS degree
+}
+WITH id, source, type, target, degree
+ORDER BY degree DESC, type, source, target
+RETURN id, collect({source: source, type: type, target: target})[..$limit] AS triples
+"""
+
+ENTITY_IDS_QUERY = """MATCH (e:__Entity__) WHERE e.id IS NOT NULL
+RETURN DISTINCT toString(e.id) AS id
+"""
+
+EXISTING_HASHES_QUERY = """
+UNWIND $hashes AS hash
+MATCH (d:Document {content_hash: hash})
+RETURN DISTINCT hash
+"""
+
+
+class NeighborhoodRow(TypedDict):
+    source: str
+    type: str
+    target: str
+    score: float
+    # The requested entity names whose matches reach this triple.
+    entities: list[str]
+
+
+def rank_score(rank: int, count: int) -> float:
+    """
+    Keeps a precomputed ranking when the triples are merged by score: the
+    best of an entity's triples scores 1, like its best full-text match.
+    """
+    return 1.0 - rank / (2 * count)
+
+
+class GraphStore(Protocol):
+    """
+    What the retrieval and the ingestion need from the knowledge graph.
+
+    The `a`-prefixed methods are what the question answering and ingestion
+    coroutines await; the synchronous ones serve warm-up, the gazetteer and
+    the materialized neighborhoods, which run in threads.
+    """
+
+    def neighborhoods(self, entities: list[str], limit: int) -> list[NeighborhoodRow]:
+        """1-hop triples around the entities matching the names, best first."""
+
+    def entity_neighborhoods(
+        self, ids: list[str], limit: int
+    ) -> dict[str, list[Triple]]:
+        """1-hop triples of each existing entity id, best connected neighbors first."""
+
+    def entity_ids(self) -> list[str]: ...
+
+    def existing_hashes(self, hashes: list[str]) -> set[str]: ...
+
+    def write(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ): ...
+
+    def save(self): ...
+
+    async def aneighborhoods(
+        self, entities: list[str], limit: int
+    ) -> list[NeighborhoodRow]: ...
+
+    async def aexisting_hashes(self, hashes: list[str]) -> set[str]: ...
+
+    async def awrite(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ) -> int:
+        """Write the documents, returning the number of retried transactions."""
+
+
+def generate_full_text_query(entity_name: str) -> str:
+    """
+    Generate a full-text search query for a given input string.
+
+    This function constructs a query string suitable for a full-text search.
+    It processes the input string by splitting it into words and appending a
+    similarity threshold (~2 changed characters) to each word, then combines
+    them using the AND operator. Useful for mapping entities from user questions
+    to database values, and allows for some misspelings.
+    """
+    full_text_query = ""
+    words = [el for el in remove_lucene_chars(entity_name).split() if el]
+    for word in words[:-1]:
+        full_text_query += f" {word}~2 AND"
+    full_text_query += f" {words[-1]}~2"
+    return full_text_query.strip()
+
+
+class Neo4jGraphStore:
+    """The knowledge graph in Neo4j, searched with the `entity` full-text index."""
+
+    def __init__(self, graph: Neo4jGraph, client: AsyncNeo4jClient):
+        self.graph = graph
+        self.client = client
+        self.writer = GraphWriter(graph._driver, graph._database)
+
+    def neighborhoods(self, entities: list[str], limit: int) -> list[NeighborhoodRow]:
+        queries = self._queries(entities)
+        response = self.graph.query(
+            BATCHED_ENTITY_NEIGHBORHOOD_QUERY,
+            {"queries": list(queries), "limit": limit},
+        )
+        return self._neighborhood_rows(queries, response)
+
+    async def aneighborhoods(
+        self, entities: list[str], limit: int
+    ) -> list[NeighborhoodRow]:
+        queries = self._queries(entities)
+        response = await self.client.query(
+            BATCHED_ENTITY_NEIGHBORHOOD_QUERY,
+            {"queries": list(queries), "limit": limit},
+        )
+        return self._neighborhood_rows(queries, response)
+
+    @staticmethod
+    def _queries(entities: list[str]) -> dict[str, list[str]]:
+        """Full-text query -> the names it was built from."""
+        # "Acme Corp" and "Acme Corp!" build the same query; both names get its rows.
+        queries: dict[str, list[str]] = defaultdict(list)
+        for entity in dict.fromkeys(entities):
+            queries[generate_full_text_query(entity)].append(entity)
+        return queries
+
+    @staticmethod
+    def _neighborhood_rows(
+        queries: dict[str, list[str]], response: list[dict]
+    ) -> list[NeighborhoodRow]:
+        return [
+            NeighborhoodRow(
+                source=el["source"],
+                type=el["type"],
+                target=el["target"],
+                score=el["score"],
+                entities=[name for query in el["queries"] for name in queries[query]],
+            )
+            for el in response
+        ]
+
+    def entity_neighborhoods(
+        self, ids: list[str], limit: int
+    ) -> dict[str, list[Triple]]:
+        response = self.graph.query(
+            ENTITY_NEIGHBORHOODS_QUERY, {"ids": ids, "limit": limit}
+        )
+        return {
+            el["id"]: [
+                Triple(**triple, score=rank_score(rank, len(el["triples"])))
+                for rank, triple in enumerate(el["triples"])
+            ]
+            for el in response
+        }
+
+    def entity_ids(self) -> list[str]:
+        return [el["id"] for el in self.graph.query(ENTITY_IDS_QUERY)]
+
+    def existing_hashes(self, hashes: list[str]) -> set[str]:
+        rows = self.graph.query(EXISTING_HASHES_QUERY, {"hashes": hashes})
+        return {row["hash"] for row in rows}
+
+    async def aexisting_hashes(self, hashes: list[str]) -> set[str]:
+        rows = await self.client.query(EXISTING_HASHES_QUERY, {"hashes": hashes})
+        return {row["hash"] for row in rows}
+
+    def write(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ):
+        self.writer.write(graph_documents, vectors)
+
+    async def awrite(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ) -> int:
+        retries = 0
+        for query, rows in self.writer.statements(graph_documents, vectors):
+            retries += await self.client.write(query, rows, self.writer.batch_size)
+        return retries
+
+    def save(self):
+        pass
+
+
+def _pack(strings: list[str]) -> np.ndarray:
+    # Saved as JSON: no separator round-trips ids that are empty or contain "\0".
+    return np.frombuffer(json.dumps(strings).encode(), dtype=np.uint8)
+
+
+def _unpack(packed: np.ndarray) -> list[str]:
+    return json.loads(packed.tobytes().decode())
+
+
+class MemoryGraphStore:
+    """
+    The knowledge graph held in the process, for small deployments and
+    offline benchmarks.
+
+    Entity ids and relationship types are interned to ints and the graph is
+    kept as outgoing and incoming adjacency lists. Names are matched like the
+    `word~2 AND ...` full-text queries: every word of the name has to be
+    within two edits of a word of the entity id, found through the same
+    symmetric delete index as the gazetteer's. `save` writes a compact
+    snapshot (interned strings and an int32 edge array) to one `.npz` file.
+    """
+
+    def __init__(self, path: Path | None = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ids: list[str] = []
+        self._id_index: dict[str, int] = {}
+        self._types: list[str] = []
+        self._type_index: dict[str, int] = {}
+        # entity -> [(type, neighbor)]
+        self._outgoing: list[list[tuple[int, int]]] = []
+        self._incoming: list[list[tuple[int, int]]] = []
+        self._edges: set[tuple[int, int, int]] = set()
+        self._document_hashes: set[str] = set()
+        # word -> entities whose id contains it
+        self._entities_by_word: dict[str, set[int]] = defaultdict(set)
+        # deletes() variant -> words it was derived from
+        self._words_by_delete: dict[str, set[str]] = defaultdict(set)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _entity(self, name: str) -> int:
+        entity = self._id_index.get(name)
+        if entity is None:
+            entity = len(self._ids)
+            self._ids.append(name)
+            self._id_index[name] = entity
+            self._outgoing.append([])
+            self._incoming.append([])
+            for word in tokenize(name):
+                if word not in self._entities_by_word:
+                    for variant in deletes(word):
+                        self._words_by_delete[variant].add(word)
+                self._entities_by_word[word].add(entity)
+        return entity
+
+    def _type(self, name: str) -> int:
+        if name not in self._type_index:
+            self._type_index[name] = len(self._types)
+            self._types.append(name)
+        return self._type_index[name]
+
+    def _add_edge(self, source: int, type_: int, target: int):
+        if (source, type_, target) in self._edges:
+            return
+        self._edges.add((source, type_, target))
+        self._outgoing[source].append((type_, target))
+        self._incoming[target].append((type_, source))
+
+    def _similar_words(self, word: str) -> dict[str, float]:
+        similar = {word: 1.0} if word in self._entities_by_word else {}
+        if len(word) < MIN_FUZZY_WORD_LENGTH:
+            return similar
+        for variant in deletes(word):
+            for candidate in self._words_by_delete.get(variant, ()):
+                if candidate not in similar and within_distance(word, candidate):
+                    similar[candidate] = 0.5
+        return similar
+
+    def _match(self, name: str) -> list[tuple[int, float]]:
+        words = tokenize(remove_lucene_chars(name))
+        if not words:
+            return []
+        scores: dict[int, float] = defaultdict(float)
+        candidates: set[int] | None = None
+        for word in words:
+            matched: dict[int, float] = {}
+            for similar, similarity in self._similar_words(word).items():
+                for entity in self._entities_by_word[similar]:
+                    matched[entity] = max(matched.get(entity, 0.0), similarity)
+            candidates = (
+                set(matched) if candidates is None else candidates & matched.keys()
+            )
+            for entity, similarity in matched.items():
+                scores[entity] += similarity
+        ranked = sorted(candidates, key=lambda entity: -scores[entity])
+        return [(entity, scores[entity]) for entity in ranked[:ENTITY_MATCH_LIMIT]]
+
+    def neighborhoods(self, entities: list[str], limit: int) -> list[NeighborhoodRow]:
+        # (source, type, target) -> [score, entity names]
+        triples: dict[tuple[int, int, int], list] = {}
+        with self._lock:
+            for name in dict.fromkeys(entities):
+                for node, score in self._match(name):
+                    keys = [
+                        (node, type_, target) for type_, target in self._outgoing[node]
+                    ] + [
+                        (source, type_, node) for type_, source in self._incoming[node]
+                    ]
+                    for key in keys:
+                        if key not in triples:
+                            triples[key] = [score, [name]]
+                            continue
+                        triples[key][0] = max(triples[key][0], score)
+                        if name not in triples[key][1]:
+                            triples[key][1].append(name)
+
+            ranked = sorted(triples.items(), key=lambda item: -item[1][0])[:limit]
+            return [
+                NeighborhoodRow(
+                    source=self._ids[source],
+                    type=self._types[type_],
+                    target=self._ids[target],
+                    score=score,
+                    entities=names,
+                )
+                for (source, type_, target), (score, names) in ranked
+            ]
+
+    def entity_neighborhoods(
+        self, ids: list[str], limit: int
+    ) -> dict[str, list[Triple]]:
+        neighborhoods = {}
+        with self._lock:
+            for name in ids:
+                node = self._id_index.get(name)
+                if node is None:
+                    continue
+                keys = [
+                    (node, type_, target) for type_, target in self._outgoing[node]
+                ] + [(source, type_, node) for type_, source in self._incoming[node]]
+                keys.sort(
+                    key=lambda key: (
+                        -self._degree(key[2] if key[0] == node else key[0]),
+                        self._types[key[1]],
+                        self._ids[key[0]],
+                        self._ids[key[2]],
+                    )
+                )
+                keys = keys[:limit]
+                neighborhoods[name] = [
+                    Triple(
+                        source=self._ids[source],
+                        type=self._types[type_],
+                        target=self._ids[target],
+                        score=rank_score(rank, len(keys)),
+                    )
+                    for rank, (source, type_, target) in enumerate(keys)
+                ]
+        return neighborhoods
+
+    def _degree(self, entity: int) -> int:
+        return len(self._outgoing[entity]) + len(self._incoming[entity])
+
+    def entity_ids(self) -> list[str]:
+        with self._lock:
+            return list(self._ids)
+
+    def existing_hashes(self, hashes: list[str]) -> set[str]:
+        with self._lock:
+            return self._document_hashes.intersection(hashes)
+
+    def write(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ):
+        # Vectors belong to the vector store, see RetrievalBackend.index_documents.
+        with self._lock:
+            for graph_document in graph_documents:
+                metadata = graph_document.source.metadata
+                self._document_hashes.add(metadata.get("content_hash", metadata["id"]))
+                for node in graph_document.nodes:
+                    self._entity(str(node.id))
+                for relationship in graph_document.relationships:
+                    self._add_edge(
+                        self._entity(str(relationship.source.id)),
+                        self._type(relationship_type(relationship.type)),
+                        self._entity(str(relationship.target.id)),
+                    )
+            self._dirty = True
+
+    # The scans take the store lock, which a write or save may hold, so they
+    # run on the retrieval pool rather than on the event loop.
+    async def aneighborhoods(
+        self, entities: list[str], limit: int
+    ) -> list[NeighborhoodRow]:
+        return await run_blocking(self.neighborhoods, entities, limit)
+
+    async def aexisting_hashes(self, hashes: list[str]) -> set[str]:
+        return await run_blocking(self.existing_hashes, hashes)
+
+    async def awrite(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ) -> int:
+        await run_blocking(self.write, graph_documents, vectors)
+        return 0
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            arrays = {
+                "ids": _pack(self._ids),
+                "types": _pack(self._types),
+                "edges": np.array(sorted(self._edges), dtype=np.int32).reshape(-1, 3),
+                "document_hashes": _pack(sorted(self._document_hashes)),
+            }
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        path = self.path.with_suffix(".npz")
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("wb") as file:
+            np.savez(file, **arrays)
+        os.replace(tmp_path, path)
+
+    def load(self):
+        if self.path is None or not self.path.with_suffix(".npz").exists():
+            return
+        with np.load(self.path.with_suffix(".npz")) as snapshot:
+            ids = _unpack(snapshot["ids"])
+            types = _unpack(snapshot["types"])
+            edges = snapshot["edges"]
+            document_hashes = _unpack(snapshot["document_hashes"])
+        with self._lock:
+            for name in ids:
+                self._entity(name)
+            for name in types:
+                self._type(name)
+            for source, type_, target in edges.tolist():
+                self._add_edge(source, type_, target)
+            self._document_hashes.update(document_hashes)
@@ -0,0 +1,167 @@
+import os
+from collections import defaultdict
+from typing import Any
+
+from langchain_community.graphs.graph_document import GraphDocument
+from neo4j import Driver, ManagedTransaction
+
+# Rows sent per UNWIND statement.
+GRAPH_WRITE_BATCH_SIZE = int(os.environ.get("GRAPH_WRITE_BATCH_SIZE", "1000"))
+
+ENTITY_LABEL = "__Entity__"
+
+# Created once when the backend connects. The MERGEs below look nodes up by
+# these keys, so without them every write scans the label.
+SCHEMA_QUERIES = [
+    "CREATE CONSTRAINT document_id IF NOT EXISTS "
+    "FOR (d:Document) REQUIRE d.id IS UNIQUE",
+    f"CREATE CONSTRAINT entity_id IF NOT EXISTS "
+    f"FOR (n:`{ENTITY_LABEL}`) REQUIRE n.id IS UNIQUE",
+    # Ingestion looks up already ingested chunks by their content hash.
+    "CREATE INDEX document_content_hash IF NOT EXISTS "
+    "FOR (d:Document) ON (d.content_hash)",
+]
+
+DOCUMENTS_QUERY = """
+UNWIND $rows AS row
+MERGE (d:Document {id: row.id})
+SET d.text = row.text
+SET d += row.metadata
+"""
+
+# Sets the vectors the same way Neo4jVector.from_existing_graph does, so the
+# vector index never has to look for un-embedded Document nodes.
+EMBEDDINGS_QUERY = """
+UNWIND $rows AS row
+MATCH (d:Document {id: row.id})
+CALL db.create.setVectorProperty(d, 'embedding', row.embedding)
+YIELD node
+RETURN count(*)
+"""
+
+MENTIONS_QUERY = f"""
+UNWIND $rows AS row
+MATCH (d:Document {{id: row.document}})
+MATCH (n:`{ENTITY_LABEL}` {{id: row.id}})
+MERGE (d)-[:MENTIONS]->(n)
+"""
+
+
+def escape_name(name: str) -> str:
+    """Quote a label or relationship type for use in Cypher."""
+    return "`" + name.replace("`", "") + "`"
+
+
+def nodes_query(label: str) -> str:
+    return f"""
+UNWIND $rows AS row
+MERGE (n:`{ENTITY_LABEL}` {{id: row.id}})
+SET n += row.properties
+SET n:{escape_name(label)}
+"""
+
+
+def relationships_query(relationship_type: str) -> str:
+    return f"""
+UNWIND $rows AS row
+MERGE (source:`{ENTITY_LABEL}` {{id: row.source}})
+MERGE (target:`{ENTITY_LABEL}` {{id: row.target}})
+MERGE (source)-[r:{escape_name(relationship_type)}]->(target)
+SET r += row.properties
+"""
+
+
+def relationship_type(name: str) -> str:
+    # The same normalization as add_graph_documents.
+    return name.replace(" ", "_").upper()
+
+
+class GraphWriter:
+    """
+    Writes batches of graph documents with one UNWIND statement per node
+    label and relationship type instead of two queries per document.
+
+    Labels and types cannot be query parameters, so rows are grouped by them
+    and each group is written in `batch_size` slices, each in its own managed
+    write transaction (retried by the driver on transient errors).
+    """
+
+    def __init__(
+        self,
+        driver: Driver,
+        database: str | None = None,
+        batch_size: int = GRAPH_WRITE_BATCH_SIZE,
+    ):
+        self.driver = driver
+        self.database = database
+        self.batch_size = batch_size
+
+    def ensure_schema(self):
+        with self.driver.session(database=self.database) as session:
+            for query in SCHEMA_QUERIES:
+                session.run(query).consume()
+
+    def _write(self, query: str, rows: list[dict[str, Any]]):
+        def work(tx: ManagedTransaction, batch: list[dict[str, Any]]):
+            tx.run(query, rows=batch).consume()
+
+        with self.driver.session(database=self.database) as session:
+            for start in range(0, len(rows), self.batch_size):
+                session.execute_write(work, rows[start : start + self.batch_size])
+
+    def statements(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ) -> list[tuple[str, list[dict[str, Any]]]]:
+        """The (query, rows) pairs that write the documents, in order."""
+        documents: dict[str, dict[str, Any]] = {}
+        nodes: dict[str, dict[str, dict[str, Any]]] = defaultdict(dict)
+        mentions: list[dict[str, str]] = []
+        relationships: dict[str, list[dict[str, Any]]] = defaultdict(list)
+
+        for graph_document in graph_documents:
+            source = graph_document.source
+            document_id = source.metadata["id"]
+            documents[document_id] = {
+                "id": document_id,
+                "text": source.page_content,
+                "metadata": source.metadata,
+            }
+            for node in graph_document.nodes:
+                nodes[node.type][node.id] = {
+                    "id": node.id,
+                    "properties": node.properties,
+                }
+                mentions.append({"document": document_id, "id": node.id})
+            for relationship in graph_document.relationships:
+                relationships[relationship_type(relationship.type)].append(
+                    {
+                        "source": relationship.source.id,
+                        "target": relationship.target.id,
+                        "properties": relationship.properties,
+                    }
+                )
+
+        statements = [(DOCUMENTS_QUERY, list(documents.values()))]
+        if vectors is not None:
+            embeddings = [
+                {"id": graph_document.source.metadata["id"], "embedding": vector}
+                for graph_document, vector in zip(graph_documents, vectors)
+            ]
+            statements.append((EMBEDDINGS_QUERY, embeddings))
+        for label, rows in nodes.items():
+            statements.append((nodes_query(label), list(rows.values())))
+        statements.append((MENTIONS_QUERY, mentions))
+        for name, rows in relationships.items():
+            statements.append((relationships_query(name), rows))
+        return statements
+
+    def write(
+        self,
+        graph_documents: list[GraphDocument],
+        vectors: list[list[float]] | None = None,
+    ):
+        """Merge the documents, their entities, mentions and relationships."""
+        for query, rows in self.statements(graph_documents, vectors):
+            self._write(query, rows)
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import warnings
+from functools import cache
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from reflex_study.chat_store import ChatStore, StoredQA, get_chat_store
+from reflex_study.langchain_api import Message
+from reflex_study.tokens import count_tokens
+
+# The latest turns are kept out of the running summary; older ones are folded
+# into it.
+HISTORY_KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", "4"))
+# Upper bound of prompt tokens spent on the summary and the replayed turns.
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "3000"))
+# Role/separator tokens the chat format adds to every message.
+TOKENS_PER_MESSAGE = 4
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            "You maintain a concise running summary of a conversation between a "
+            "user and an assistant. Keep the facts, names, questions and decisions "
+            "needed to continue the conversation.",
+        ),
+        (
+            "human",
+            "Current summary:\n{summary}\n\n"
+            "New lines of conversation:\n{lines}\n\n"
+            "Return the updated summary only.",
+        ),
+    ]
+)
+
+
+def turn_messages(qa: StoredQA) -> list[Message]:
+    return [
+        Message(role="user", content=qa.question),
+        Message(role="assistant", content=qa.answer),
+    ]
+
+
+class HistoryManager:
+    """
+    Builds the conversation history sent with each question.
+
+    Turns older than the last `keep_turns` are folded into a summary stored
+    with the chat, which is updated in the background after each answer
+    instead of being recomputed per question. Every turn the summary does not
+    cover yet is replayed verbatim within the token budget, so nothing is lost
+    before the first summary or after a failed update.
+    """
+
+    def __init__(
+        self,
+        store: ChatStore,
+        keep_turns: int = HISTORY_KEEP_TURNS,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+    ):
+        self.store = store
+        self.keep_turns = keep_turns
+        self.token_budget = token_budget
+
+    def build_messages(self, owner: str, chat_name: str, model: str) -> list[Message]:
+        summary, last_message_id = self.store.get_summary(owner, chat_name)
+        # Turns the summary does not cover yet, newest first.
+        turns = self.store.load_messages(
+            owner, chat_name, limit=None, after_id=last_message_id
+        )[::-1]
+
+        budget = self.token_budget
+        summary_message = None
+        if summary:
+            summary_message = Message(
+                role="system",
+                content=f"Summary of the earlier conversation:\n{summary}",
+            )
+            budget -= count_tokens(summary_message["content"], model)
+
+        replayed: list[Message] = []
+        for i, qa in enumerate(turns):
+            messages = turn_messages(qa)
+            tokens = sum(
+                count_tokens(message["content"], model) + TOKENS_PER_MESSAGE
+                for message in messages
+            )
+            # The latest turn is always kept so that follow-ups make sense.
+            if i > 0 and tokens > budget:
+                break
+            budget -= tokens
+            replayed = messages + replayed
+
+        return ([summary_message] if summary_message else []) + replayed
+
+    async def update_summary(self, owner: str, chat_name: str, llm: BaseChatModel):
+        """Fold the turns that fell out of the verbatim window into the summary."""
+        summary, last_message_id = await asyncio.to_thread(
+            self.store.get_summary, owner, chat_name
+        )
+        turns = await asyncio.to_thread(
+            self.store.load_messages,
+            owner,
+            chat_name,
+            None,
+            None,
+            last_message_id,
+        )
+        folded = turns[: -self.keep_turns] if self.keep_turns else turns
+        if not folded:
+            return
+
+        lines = "\n".join(
+            f"User: {qa.question}\nAssistant: {qa.answer}" for qa in folded
+        )
+        chain = SUMMARY_PROMPT | llm | StrOutputParser()
+        summary = await chain.ainvoke({"summary": summary or "(empty)", "lines": lines})
+        await asyncio.to_thread(
+            self.store.set_summary, owner, chat_name, summary, folded[-1].id
+        )
+
+
+# Keeps references to the running summarizations (one per chat at a time).
+_summary_tasks: dict[tuple[str, str], asyncio.Task] = {}
+
+
+def schedule_summary_update(
+    manager: HistoryManager, owner: str, chat_name: str, llm: BaseChatModel
+):
+    key = (owner, chat_name)
+    if key in _summary_tasks:
+        return
+    task = asyncio.create_task(manager.update_summary(owner, chat_name, llm))
+    _summary_tasks[key] = task
+
+    def done(task: asyncio.Task):
+        _summary_tasks.pop(key, None)
+        if not task.cancelled() and (e := task.exception()):
+            warnings.warn(f"Failed to update the summary of {chat_name}: {e}")
+
+    task.add_done_callback(done)
+
+
+@cache
+def get_history_manager() -> HistoryManager:
+    return HistoryManager(get_chat_store())
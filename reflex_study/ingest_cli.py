@@ -0,0 +1,200 @@
+"""
+Ingest large text corpora into the graph from the command line.
+
+    python -m reflex_study.ingest_cli docs/ notes.txt --concurrency 16
+
+Files are read as a stream of windows of about `--window-size` characters cut
+at line breaks, so memory use does not depend on the size of the corpus. Each
+window goes through the same IngestionPipeline as the documents page, with
+its own checkpoint, so an interrupted run can simply be started again. The
+next window starts while the last chunks of the previous one are extracted;
+both share the `--concurrency` extraction slots.
+
+The app must be stopped first: both write the same stores, so whichever
+starts second exits with an error.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import sys
+import time
+from pathlib import Path
+from collections import deque
+from typing import Iterator
+
+from reflex_study.config_state import MODEL_CHOICES, MODEL_KEY, get_config
+from reflex_study.ingestion import (
+    EXTRACTION_CONCURRENCY,
+    IngestionPipeline,
+    IngestionProgress,
+    ingestion_lock,
+)
+from reflex_study.llm import get_chat_model
+from reflex_study.retrieval import aclose_retrieval_backends
+
+# Characters read from a file before they are handed to the pipeline.
+DEFAULT_WINDOW_SIZE = 256 * 1024
+DEFAULT_BATCH_SIZE = 128
+# Windows in progress at once: enough to keep the extraction slots busy while
+# a window drains, while bounding the text held in memory.
+WINDOWS_IN_FLIGHT = 2
+
+
+def iter_files(paths: list[Path], pattern: str) -> Iterator[Path]:
+    for path in paths:
+        if path.is_dir():
+            yield from sorted(p for p in path.rglob(pattern) if p.is_file())
+        else:
+            yield path
+
+
+def iter_windows(path: Path, window_size: int) -> Iterator[str]:
+    """Yield the file's text in windows ending at a paragraph or line break."""
+    with path.open("r", encoding="utf-8", errors="replace") as file:
+        rest = ""
+        while block := file.read(window_size):
+            text = rest + block
+            cut = text.rfind("\n\n")
+            if cut < len(text) // 2:
+                cut = text.rfind("\n")
+            if cut <= 0:
+                cut = len(text)
+            window, rest = text[:cut], text[cut:]
+            if window.strip():
+                yield window
+        if rest.strip():
+            yield rest
+
+
+class ThroughputReport:
+    def __init__(self):
+        self.started = time.monotonic()
+        self.chunks = 0
+        self.written = 0
+        self.skipped = 0
+        self.nodes = 0
+        self.relationships = 0
+        self.extraction_retries = 0
+
+    def add(self, progress: IngestionProgress):
+        self.chunks += progress.total
+        self.written += progress.written + progress.resumed
+        self.skipped += progress.skipped
+        self.nodes += progress.metrics.nodes
+        self.relationships += progress.metrics.relationships
+        self.extraction_retries += progress.metrics.extraction_retries
+
+    def line(self) -> str:
+        elapsed = time.monotonic() - self.started
+        per_second = 1 / elapsed if elapsed else 0.0
+        return (
+            f"{self.chunks} chunks ({self.written} written, "
+            f"{self.skipped} duplicates) in {elapsed:.1f}s, "
+            f"{self.written * per_second:.2f} chunks/s, "
+            f"{self.nodes * per_second:.1f} nodes/s, "
+            f"{self.relationships * per_second:.1f} relationships/s, "
+            f"{self.extraction_retries} extraction retries"
+        )
+
+
+async def run_to_end(
+    pipeline: IngestionPipeline, text: str, extraction_slots: asyncio.Semaphore
+) -> IngestionProgress:
+    progress = None
+    async for progress in pipeline.run(text, extraction_slots):
+        pass
+    return progress
+
+
+async def ingest(
+    paths: list[Path],
+    pattern: str,
+    model: str,
+    concurrency: int,
+    batch_size: int,
+    window_size: int,
+):
+    llm = get_chat_model(model=model, temperature=None, seed=None, top_p=None)
+    pipeline = IngestionPipeline(
+        llm=llm, concurrency=concurrency, batch_size=batch_size
+    )
+    extraction_slots = asyncio.Semaphore(concurrency)
+    report = ThroughputReport()
+    running: deque[tuple[str, asyncio.Task]] = deque()
+
+    async def finish_oldest():
+        label, task = running.popleft()
+        report.add(await task)
+        print(f"{label}: {report.line()}", file=sys.stderr)
+
+    try:
+        for path in iter_files(paths, pattern):
+            for i, window in enumerate(iter_windows(path, window_size)):
+                if len(running) >= WINDOWS_IN_FLIGHT:
+                    await finish_oldest()
+                task = asyncio.create_task(
+                    run_to_end(pipeline, window, extraction_slots)
+                )
+                running.append((f"{path} [{i}]", task))
+        while running:
+            await finish_oldest()
+    finally:
+        for _, task in running:
+            task.cancel()
+        await asyncio.gather(*(task for _, task in running), return_exceptions=True)
+        # The async driver has to be closed on the loop that opened it.
+        await aclose_retrieval_backends()
+    print(report.line())
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", type=Path, help="files or directories")
+    parser.add_argument(
+        "--glob", default="*.txt", help="file pattern inside directories"
+    )
+    parser.add_argument(
+        "--model",
+        choices=MODEL_CHOICES,
+        default=get_config().get(MODEL_KEY, MODEL_CHOICES[0]),
+        help="extraction model",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=EXTRACTION_CONCURRENCY,
+        help="chunks extracted at the same time",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help="chunks written to the graph per transaction",
+    )
+    parser.add_argument(
+        "--window-size",
+        type=int,
+        default=DEFAULT_WINDOW_SIZE,
+        help="characters read from a file at a time",
+    )
+    args = parser.parse_args(argv)
+    with contextlib.ExitStack() as stack:
+        try:
+            stack.enter_context(ingestion_lock())
+        except RuntimeError as e:
+            parser.exit(1, f"{e}\n")
+        asyncio.run(
+            ingest(
+                args.paths,
+                args.glob,
+                args.model,
+                args.concurrency,
+                args.batch_size,
+                args.window_size,
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
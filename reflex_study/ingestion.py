@@ -0,0 +1,379 @@
+import asyncio
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from pathlib import Path
+from typing import AsyncIterator, Iterator
+
+from langchain_community.graphs.graph_document import GraphDocument
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_experimental.graph_transformers import LLMGraphTransformer
+from langchain_text_splitters import TokenTextSplitter
+
+from reflex_study.cache import bump_knowledge_generation
+from reflex_study.embedding_cache import CachedEmbedder, get_embedding_cache
+from reflex_study.ingestion_metrics import IngestionMetrics
+from reflex_study.retrieval import (
+    RetrievalBackend,
+    get_retrieval_backend,
+    run_blocking,
+)
+
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 125
+# Number of chunks sent to the LLM at the same time.
+EXTRACTION_CONCURRENCY = int(os.environ.get("EXTRACTION_CONCURRENCY", "8"))
+# Number of extracted chunks written to the graph per transaction.
+WRITE_BATCH_SIZE = int(os.environ.get("WRITE_BATCH_SIZE", "16"))
+CHECKPOINT_DIR = Path(os.getcwd()) / os.environ.get(
+    "INGESTION_CHECKPOINT_DIR", ".ingestion"
+)
+# Held by the one process allowed to ingest: the app or ingest_cli.
+INGESTION_LOCK_PATH = Path(os.getcwd()) / os.environ.get(
+    "INGESTION_LOCK_PATH", ".ingestion.lock"
+)
+# Extra attempts for a chunk whose extraction failed, with exponential backoff.
+EXTRACTION_RETRIES = int(os.environ.get("EXTRACTION_RETRIES", "2"))
+EXTRACTION_RETRY_DELAY = 1.0
+
+
+def embedding_text(document: Document) -> str:
+    # from_existing_graph embeds "\n<property>:<value>" of the text properties.
+    return "\ntext:" + document.page_content
+
+
+def changed_entities(graph_documents: list[GraphDocument]) -> set[str]:
+    """The entities whose neighborhood the graph documents extend."""
+    return {
+        str(node.id)
+        for graph_document in graph_documents
+        for relationship in graph_document.relationships
+        for node in (relationship.source, relationship.target)
+    }
+
+
+@contextlib.contextmanager
+def ingestion_lock(
+    shared: bool = False, path: Path = INGESTION_LOCK_PATH
+) -> Iterator[None]:
+    """
+    Keep the app and ingest_cli from writing the knowledge stores at the same
+    time: the in-process stores are saved whole, so one would lose the other's
+    writes. The app's worker processes hold the lock shared and ingest_cli
+    exclusively; whoever comes second fails at once instead of waiting.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as file:
+        try:
+            fcntl.flock(
+                file, (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | fcntl.LOCK_NB
+            )
+        except BlockingIOError:
+            raise RuntimeError(
+                f"{path} is held by another process: the app and ingest_cli "
+                "cannot ingest at the same time. Stop the other one first."
+            ) from None
+        yield
+
+
+def chunk_hash(text: str, model: str) -> str:
+    """Identifies a chunk's content for a given chunking and extraction model."""
+    normalized = re.sub(r"\s+", " ", text).strip()
+    key = f"{CHUNK_SIZE}:{CHUNK_OVERLAP}:{model}:{normalized}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+@dataclass
+class IngestionProgress:
+    total: int
+    extracted: int = 0
+    written: int = 0
+    # Chunks already written by an earlier, interrupted run.
+    resumed: int = 0
+    # Chunks whose content is already in the graph.
+    skipped: int = 0
+    metrics: IngestionMetrics = field(default_factory=IngestionMetrics, repr=False)
+
+    @property
+    def completed(self) -> int:
+        return self.written + self.resumed + self.skipped
+
+    @property
+    def done(self) -> bool:
+        return self.completed >= self.total
+
+
+class IngestionCheckpoint:
+    """
+    Append-only record of the chunks of one ingestion job.
+
+    Extracted graph documents are saved as soon as the LLM returns them and
+    written chunks are marked after the graph transaction, so a restarted job
+    neither calls the LLM nor writes to the graph again for finished chunks.
+    """
+
+    def __init__(self, directory: Path, job_id: str):
+        self.path = directory / f"{job_id}.jsonl"
+
+    def load(self) -> tuple[dict[int, GraphDocument], set[int]]:
+        extracted: dict[int, GraphDocument] = {}
+        written: set[int] = set()
+        if not self.path.exists():
+            return extracted, written
+        with self.path.open("r") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Skip the last line if the process died while writing it.
+                    continue
+                if "graph_document" in record:
+                    extracted[record["chunk"]] = GraphDocument.parse_obj(
+                        record["graph_document"]
+                    )
+                else:
+                    written.update(record["written"])
+        return extracted, written
+
+    def _append(self, record: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a") as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def record_extracted(self, chunk: int, graph_document: GraphDocument):
+        self._append(
+            {"chunk": chunk, "graph_document": json.loads(graph_document.json())}
+        )
+
+    def record_written(self, chunks: list[int]):
+        self._append({"written": chunks})
+
+    def complete(self):
+        self.path.unlink(missing_ok=True)
+
+
+class IngestionPipeline:
+    """
+    Splits a text, extracts graph documents with bounded concurrency and
+    writes them to the graph in micro-batches as the extractions finish.
+    """
+
+    def __init__(
+        self,
+        llm: BaseChatModel,
+        backend: RetrievalBackend | None = None,
+        concurrency: int = EXTRACTION_CONCURRENCY,
+        batch_size: int = WRITE_BATCH_SIZE,
+        checkpoint_dir: Path = CHECKPOINT_DIR,
+    ):
+        self.llm = llm
+        self.backend = backend or get_retrieval_backend()
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.checkpoint_dir = checkpoint_dir
+        self.llm_transformer = LLMGraphTransformer(llm=llm)
+
+    @cached_property
+    def text_splitter(self) -> TokenTextSplitter:
+        return TokenTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+
+    @property
+    def model(self) -> str:
+        return getattr(self.llm, "model_name", "")
+
+    def job_id(self, text: str) -> str:
+        key = f"{CHUNK_SIZE}:{CHUNK_OVERLAP}:{self.model}:{text}"
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def checkpoint(self, text: str) -> IngestionCheckpoint:
+        return IngestionCheckpoint(self.checkpoint_dir, self.job_id(text))
+
+    def split(self, text: str) -> list[Document]:
+        """Split the text into chunks identified by their content hash."""
+        documents = self.text_splitter.create_documents([text])
+        for document in documents:
+            content_hash = chunk_hash(document.page_content, self.model)
+            # The graph writer merges the Document node on `id` and copies
+            # the metadata onto it.
+            document.metadata["id"] = content_hash
+            document.metadata["content_hash"] = content_hash
+        return documents
+
+    @cached_property
+    def embedder(self) -> CachedEmbedder:
+        return CachedEmbedder(
+            self.backend.embeddings,
+            self.backend.config.embedding_model,
+            get_embedding_cache(self.backend.config.embedding_model),
+        )
+
+    def embed(self, documents: dict[int, Document]) -> dict[int, list[float]]:
+        vectors = self.embedder.embed(
+            [embedding_text(document) for document in documents.values()]
+        )
+        return dict(zip(documents, vectors))
+
+    async def run(
+        self, text: str, extraction_slots: asyncio.Semaphore | None = None
+    ) -> AsyncIterator[IngestionProgress]:
+        """
+        Ingest the text, yielding the progress after every chunk. Runs given
+        the same `extraction_slots` share its concurrency.
+        """
+        # Tokenizing and hashing a large upload takes a while; the default pool
+        # keeps it from occupying the retrieval threads that answer questions.
+        documents = await asyncio.to_thread(self.split, text)
+        checkpoint = await asyncio.to_thread(self.checkpoint, text)
+        extracted, written = await run_blocking(checkpoint.load)
+        # Chunks of this job written before an interruption are counted as
+        # resumed, not as duplicates.
+        hashes = [document.metadata["content_hash"] for document in documents]
+        # Connecting the first time inspects the schema, so it runs in a thread.
+        graph_store = await run_blocking(lambda: self.backend.graph_store)
+        existing = await graph_store.aexisting_hashes(
+            [hashes[chunk] for chunk in range(len(documents)) if chunk not in written]
+        )
+        skipped: set[int] = set()
+        seen: set[str] = set()
+        for chunk, content_hash in enumerate(hashes):
+            if chunk in written:
+                continue
+            if content_hash in existing or content_hash in seen:
+                skipped.add(chunk)
+            seen.add(content_hash)
+
+        progress = IngestionProgress(
+            total=len(documents), resumed=len(written), skipped=len(skipped)
+        )
+        yield progress
+
+        metrics = progress.metrics
+        semaphore = extraction_slots or asyncio.Semaphore(self.concurrency)
+
+        async def extract(chunk: int, document: Document):
+            if chunk in extracted:
+                return chunk, extracted[chunk]
+            async with semaphore:
+                metrics.waiting -= 1
+                metrics.extracting += 1
+                try:
+                    graph_document = await self.extract(document, metrics)
+                finally:
+                    metrics.extracting -= 1
+            await run_blocking(checkpoint.record_extracted, chunk, graph_document)
+            return chunk, graph_document
+
+        async def embed(documents: dict[int, Document]) -> dict[int, list[float]]:
+            started = time.perf_counter()
+            vectors = await run_blocking(self.embed, documents)
+            metrics.record_embedding(len(documents), time.perf_counter() - started)
+            return vectors
+
+        pending = {
+            chunk: document
+            for chunk, document in enumerate(documents)
+            if chunk not in written and chunk not in skipped
+        }
+        metrics.waiting = sum(1 for chunk in pending if chunk not in extracted)
+        # All pending chunks are embedded in large batches while the LLM
+        # extracts them; the writes pick the vectors up from here.
+        embedding_task = asyncio.ensure_future(embed(pending))
+        tasks = [
+            asyncio.create_task(extract(chunk, document))
+            for chunk, document in pending.items()
+        ]
+        batch: list[tuple[int, GraphDocument]] = []
+        written_documents: list[GraphDocument] = []
+        try:
+            for next_extraction in asyncio.as_completed(tasks):
+                batch.append(await next_extraction)
+                progress.extracted += 1
+                if len(batch) >= self.batch_size:
+                    await self.write(checkpoint, batch, await embedding_task, metrics)
+                    progress.written += len(batch)
+                    written_documents += [document for _, document in batch]
+                    batch = []
+                yield progress
+            if batch:
+                await self.write(checkpoint, batch, await embedding_task, metrics)
+                progress.written += len(batch)
+                written_documents += [document for _, document in batch]
+                yield progress
+        finally:
+            embedding_task.cancel()
+            for task in tasks:
+                task.cancel()
+            metrics.finish()
+
+        await run_blocking(checkpoint.complete)
+        if progress.written:
+            await run_blocking(self.backend.save)
+            generation = bump_knowledge_generation()
+            # Chunks written by an interrupted run changed the graph as well.
+            changed = changed_entities(
+                [extracted[chunk] for chunk in written if chunk in extracted]
+                + written_documents
+            )
+            await run_blocking(self.backend.refresh_neighborhoods, changed, generation)
+
+    async def extract(
+        self, document: Document, metrics: IngestionMetrics
+    ) -> GraphDocument:
+        """Extract the graph document of a chunk, retrying failed LLM calls."""
+        for attempt in range(EXTRACTION_RETRIES + 1):
+            started = time.perf_counter()
+            try:
+                graph_document = await self.llm_transformer.aprocess_response(
+                    document
+                )
+            except Exception:
+                if attempt == EXTRACTION_RETRIES:
+                    raise
+                await asyncio.sleep(EXTRACTION_RETRY_DELAY * 2**attempt)
+                continue
+            metrics.record_extraction(time.perf_counter() - started, attempt)
+            return graph_document
+
+    async def write(
+        self,
+        checkpoint: IngestionCheckpoint,
+        batch: list[tuple[int, GraphDocument]],
+        vectors: dict[int, list[float]],
+        metrics: IngestionMetrics,
+    ):
+        graph_documents = [graph_document for _, graph_document in batch]
+        batch_vectors = [vectors[chunk] for chunk, _ in batch]
+        started = time.perf_counter()
+        retries = await self.backend.graph_store.awrite(graph_documents, batch_vectors)
+        metrics.record_write(
+            len(batch),
+            sum(len(document.nodes) for document in graph_documents),
+            sum(len(document.relationships) for document in graph_documents),
+            time.perf_counter() - started,
+            retries,
+        )
+        await run_blocking(self.index_documents, graph_documents, batch_vectors)
+        await run_blocking(checkpoint.record_written, [chunk for chunk, _ in batch])
+
+    def index_documents(
+        self, graph_documents: list[GraphDocument], vectors: list[list[float]]
+    ):
+        """Make the written chunks and entities searchable in process."""
+        sources = [graph_document.source for graph_document in graph_documents]
+        self.backend.index_documents(
+            [source.metadata["id"] for source in sources],
+            [source.page_content for source in sources],
+            vectors,
+        )
+        self.backend.gazetteer.add(
+            node.id
+            for graph_document in graph_documents
+            for node in graph_document.nodes
+        )
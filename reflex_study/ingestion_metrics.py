@@ -0,0 +1,114 @@
+import threading
+import time
+import weakref
+from collections import Counter
+
+from reflex_study.tracing import HistogramSet, RollingHistogram
+
+# Latencies across every ingestion since the app started, in seconds.
+INGESTION_HISTOGRAMS = HistogramSet()
+_totals: Counter[str] = Counter()
+_totals_lock = threading.Lock()
+# The runs in progress, for the number of chunks they still have queued.
+_active: "weakref.WeakSet[IngestionMetrics]" = weakref.WeakSet()
+
+
+def _add_totals(**counts: float):
+    with _totals_lock:
+        _totals.update(counts)
+
+
+class IngestionMetrics:
+    """
+    Timings and counters of one ingestion run.
+
+    The pipeline records every extraction, embedding batch and graph write;
+    they also feed the process-wide totals and histograms served with the
+    ingestion queue's depth.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.finished: float | None = None
+        self.extraction = RollingHistogram()
+        self.extraction_retries = 0
+        self.chunks_written = 0
+        self.nodes = 0
+        self.relationships = 0
+        self.write_seconds = 0.0
+        self.write_retries = 0
+        self.embedded = 0
+        self.embedding_seconds = 0.0
+        # Chunks waiting for an extraction slot, and being extracted.
+        self.waiting = 0
+        self.extracting = 0
+        _active.add(self)
+
+    def record_extraction(self, seconds: float, retries: int):
+        self.extraction.add(seconds)
+        self.extraction_retries += retries
+        INGESTION_HISTOGRAMS.add("extraction_seconds", seconds)
+        _add_totals(chunks_extracted=1, extraction_retries=retries)
+
+    def record_embedding(self, texts: int, seconds: float):
+        self.embedded += texts
+        self.embedding_seconds += seconds
+        INGESTION_HISTOGRAMS.add("embedding_seconds", seconds)
+        _add_totals(chunks_embedded=texts, embedding_seconds=seconds)
+
+    def record_write(
+        self, chunks: int, nodes: int, relationships: int, seconds: float, retries: int
+    ):
+        self.chunks_written += chunks
+        self.nodes += nodes
+        self.relationships += relationships
+        self.write_seconds += seconds
+        self.write_retries += retries
+        INGESTION_HISTOGRAMS.add("write_batch_seconds", seconds)
+        _add_totals(
+            chunks_written=chunks,
+            nodes_written=nodes,
+            relationships_written=relationships,
+            write_seconds=seconds,
+            write_retries=retries,
+        )
+
+    def finish(self):
+        if self.finished is None:
+            self.finished = time.perf_counter()
+        _active.discard(self)
+
+    def summary(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        per_second = 1 / elapsed if elapsed > 0 else 0.0
+        return {
+            "elapsed_seconds": elapsed,
+            "chunks_written": self.chunks_written,
+            "chunks_per_second": self.chunks_written * per_second,
+            "extraction_seconds": self.extraction.snapshot(),
+            "extraction_retries": self.extraction_retries,
+            "nodes": self.nodes,
+            "relationships": self.relationships,
+            "nodes_per_second": self.nodes * per_second,
+            "relationships_per_second": self.relationships * per_second,
+            "write_seconds": self.write_seconds,
+            "write_retries": self.write_retries,
+            "embedded": self.embedded,
+            "embedding_seconds": self.embedding_seconds,
+            # Cancelled chunks never leave the queue; a finished run has none.
+            "waiting": 0 if self.finished else self.waiting,
+            "extracting": 0 if self.finished else self.extracting,
+        }
+
+
+def ingestion_totals() -> dict:
+    """Totals and latency percentiles across every ingestion run."""
+    with _totals_lock:
+        totals = dict(_totals)
+    runs = list(_active)
+    return {
+        "totals": totals,
+        "histograms": INGESTION_HISTOGRAMS.snapshot(),
+        "chunks_waiting": sum(metrics.waiting for metrics in runs),
+        "chunks_extracting": sum(metrics.extracting for metrics in runs),
+    }
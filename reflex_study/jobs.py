@@ -0,0 +1,305 @@
+import asyncio
+import contextlib
+import json
+import os
+import time
+import uuid
+import warnings
+from dataclasses import asdict, dataclass, field
+from functools import cache
+from pathlib import Path
+
+from fastapi import HTTPException
+
+from reflex_study.ingestion import IngestionPipeline, ingestion_lock
+from reflex_study.ingestion_metrics import IngestionMetrics, ingestion_totals
+from reflex_study.llm import get_chat_model
+
+JOBS_DIR = Path(os.getcwd()) / os.environ.get("INGESTION_JOBS_DIR", ".jobs")
+# Number of documents ingested at the same time across all sessions.
+INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS", "2"))
+# Finished jobs are forgotten, with their files, this long after they ended.
+JOB_RETENTION_SECONDS = float(os.environ.get("JOB_RETENTION_SECONDS", "604800"))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+# Fields of a job record that the status endpoint does not return.
+PRIVATE_FIELDS = ("owner", "checkpoint")
+
+
+@dataclass
+class IngestionJob:
+    """The on-disk record of one submitted document."""
+
+    id: str
+    owner: str
+    model: str
+    temperature: float | None = None
+    seed: int | None = None
+    top_p: float | None = None
+    status: str = QUEUED
+    total: int = 0
+    written: int = 0
+    error: str = ""
+    # Path of the pipeline's checkpoint, which a failed run leaves behind.
+    checkpoint: str = ""
+    # Throughput and timings of the last run, see IngestionMetrics.summary.
+    metrics: dict = field(default_factory=dict)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+
+class IngestionJobQueue:
+    """
+    Runs document ingestion in worker tasks outside the event handlers.
+
+    Each job is a JSON record plus the submitted text under `directory`, so
+    jobs that were queued or running when the app stopped are picked up again
+    on the next start (the ingestion checkpoints skip the finished chunks).
+    A failed job keeps its text so it can be retried; finished jobs are pruned
+    `retention` seconds after they ended.
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        workers: int = INGESTION_WORKERS,
+        retention: float = JOB_RETENTION_SECONDS,
+    ):
+        self.directory = directory
+        self.workers = workers
+        self.retention = retention
+        self._jobs: dict[str, IngestionJob] = {}
+        self._queue: asyncio.Queue[str] | None = None
+        self._worker_tasks: list[asyncio.Task] = []
+        # job id -> the task running it
+        self._running: dict[str, asyncio.Task] = {}
+        # Running jobs whose cancellation was requested.
+        self._cancelling: set[str] = set()
+        # job id -> the metrics of its run in progress
+        self._metrics: dict[str, IngestionMetrics] = {}
+
+    def _record_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.json"
+
+    def _text_path(self, job_id: str) -> Path:
+        return self.directory / f"{job_id}.txt"
+
+    def _save(self, job: IngestionJob):
+        job.updated_at = time.time()
+        path = self._record_path(job.id)
+        tmp_path = path.with_suffix(".tmp")
+        with tmp_path.open("w") as file:
+            json.dump(asdict(job), file)
+        os.replace(tmp_path, path)
+
+    async def _asave(self, job: IngestionJob):
+        await asyncio.to_thread(self._save, job)
+
+    def load(self):
+        """Read the job records, re-queueing the unfinished ones."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for path in sorted(
+            self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime
+        ):
+            with path.open("r") as file:
+                job = IngestionJob(**json.load(file))
+            self._jobs[job.id] = job
+            if not job.finished:
+                job.status = QUEUED
+                self._queue.put_nowait(job.id)
+        self.prune()
+
+    def prune(self):
+        """Delete the finished jobs older than the retention, with their files."""
+        expired = [
+            job
+            for job in self._jobs.values()
+            if job.finished and time.time() - job.updated_at > self.retention
+        ]
+        for job in expired:
+            del self._jobs[job.id]
+            self._text_path(job.id).unlink(missing_ok=True)
+            self._record_path(job.id).unlink(missing_ok=True)
+        # Another job of the same text may still resume from the checkpoint.
+        in_use = {job.checkpoint for job in self._jobs.values() if not job.finished}
+        for job in expired:
+            if job.checkpoint and job.checkpoint not in in_use:
+                Path(job.checkpoint).unlink(missing_ok=True)
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self.load()
+        self._worker_tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+
+    async def submit(
+        self,
+        owner: str,
+        text: str,
+        model: str,
+        temperature: float | None = None,
+        seed: int | None = None,
+        top_p: float | None = None,
+    ) -> IngestionJob:
+        job = IngestionJob(
+            id=uuid.uuid4().hex,
+            owner=owner,
+            model=model,
+            temperature=temperature,
+            seed=seed,
+            top_p=top_p,
+        )
+        await asyncio.to_thread(self.directory.mkdir, parents=True, exist_ok=True)
+        await asyncio.to_thread(self._text_path(job.id).write_text, text)
+        await self._asave(job)
+        self._jobs[job.id] = job
+        self._queue.put_nowait(job.id)
+        return job
+
+    def get(self, job_id: str) -> IngestionJob | None:
+        return self._jobs.get(job_id)
+
+    def metrics(self) -> dict:
+        """Queue depth and the live metrics of the running jobs."""
+        return {
+            "workers": self.workers,
+            "queued": sum(job.status == QUEUED for job in self._jobs.values()),
+            "running": len(self._running),
+            "jobs": {
+                job_id: metrics.summary() for job_id, metrics in self._metrics.items()
+            },
+        }
+
+    def list_jobs(self, owner: str) -> list[IngestionJob]:
+        return [job for job in self._jobs.values() if job.owner == owner]
+
+    async def cancel(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return
+        if job_id in self._running:
+            # The worker records the cancellation when the task unwinds.
+            self._cancelling.add(job_id)
+            self._running[job_id].cancel()
+        else:
+            job.status = CANCELLED
+            await self._asave(job)
+            await asyncio.to_thread(self._text_path(job_id).unlink, missing_ok=True)
+
+    async def retry(self, job_id: str):
+        """Queue a failed job again; its checkpoint skips the finished chunks."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status != FAILED:
+            return
+        job.status = QUEUED
+        job.error = ""
+        await self._asave(job)
+        self._queue.put_nowait(job_id)
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self._jobs[job_id]
+            if job.status != QUEUED:
+                continue
+            task = asyncio.create_task(self._run(job))
+            self._running[job_id] = task
+            try:
+                await task
+            except asyncio.CancelledError:
+                if job_id not in self._cancelling:
+                    # The worker itself is being stopped; the job stays on
+                    # disk and is resumed on the next start.
+                    raise
+                job.status = CANCELLED
+                await self._asave(job)
+            except Exception as e:
+                job.status = FAILED
+                job.error = str(e)
+                await self._asave(job)
+                warnings.warn(f"Ingestion job {job_id} failed: {e}")
+            finally:
+                self._running.pop(job_id, None)
+                self._cancelling.discard(job_id)
+                if (metrics := self._metrics.pop(job_id, None)) is not None:
+                    job.metrics = metrics.summary()
+                    await self._asave(job)
+                if job.status in (DONE, CANCELLED):
+                    await asyncio.to_thread(
+                        self._text_path(job_id).unlink, missing_ok=True
+                    )
+                if job.finished:
+                    await asyncio.to_thread(self.prune)
+
+    async def _run(self, job: IngestionJob):
+        job.status = RUNNING
+        await self._asave(job)
+        text = await asyncio.to_thread(self._text_path(job.id).read_text)
+        llm = get_chat_model(
+            model=job.model,
+            temperature=job.temperature,
+            seed=job.seed,
+            top_p=job.top_p,
+        )
+        pipeline = IngestionPipeline(llm=llm)
+        checkpoint = await asyncio.to_thread(pipeline.checkpoint, text)
+        job.checkpoint = str(checkpoint.path)
+        async for progress in pipeline.run(text):
+            self._metrics[job.id] = progress.metrics
+            written = progress.completed
+            if (progress.total, written) != (job.total, job.written):
+                job.total = progress.total
+                job.written = written
+                job.metrics = progress.metrics.summary()
+                await self._asave(job)
+        job.status = DONE
+        await self._asave(job)
+
+
+@cache
+def get_ingestion_queue() -> IngestionJobQueue:
+    return IngestionJobQueue(JOBS_DIR)
+
+
+@contextlib.asynccontextmanager
+async def ingestion_lifespan():
+    """Run the ingestion workers while the app is running."""
+    with ingestion_lock(shared=True):
+        queue = get_ingestion_queue()
+        queue.start()
+        try:
+            yield
+        finally:
+            await queue.stop()
+
+
+def ingestion_metrics() -> dict:
+    """Ingestion throughput across all jobs, and the queue's depth."""
+    return {**ingestion_totals(), "queue": get_ingestion_queue().metrics()}
+
+
+def ingestion_job_status(job_id: str) -> dict:
+    job = get_ingestion_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingestion job")
+    return {
+        name: value
+        for name, value in asdict(job).items()
+        if name not in PRIVATE_FIELDS
+    }
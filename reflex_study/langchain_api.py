@@ -1,3 +1,5 @@
+import asyncio
+import re
 from functools import cached_property
 from typing import TypedDict, AsyncIterable
 
@@ -7,26 +9,65 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import (
     RunnableSerializable,
 )
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from langchain_openai import ChatOpenAI
 from pydantic.v1 import BaseModel, Field
 from langchain_community.vectorstores.neo4j_vector import (
     remove_lucene_chars,
     Neo4jVector,
-    SearchType,
 )
 
+from reflex_study.cache import knowledge_generation, register_cache
+from reflex_study.context_builder import (
+    DEFAULT_CONTEXT_TOKEN_BUDGET,
+    Chunk,
+    ContextBuilder,
+    Triple,
+    format_triple,
+)
+from reflex_study.graph_store import NeighborhoodRow, generate_full_text_query
+from reflex_study.neighborhoods import MaterializedNeighborhoods
+from reflex_study.retrieval import (
+    RetrievalBackend,
+    get_retrieval_backend,
+    run_blocking,
+)
+from reflex_study.semantic_cache import get_semantic_cache, semantic_cache_scope
+from reflex_study.tracing import current_trace
+
 SYSTEM_ROMPT = """{system_content} Respond in markdown.
 
 context:
 {context}
 """
 
+STRUCTURED_RESULT_LIMIT = 1000
+
+# Process-wide caches. Every key includes the knowledge generation so nothing
+# cached before an ingestion is served after it.
+ENTITY_CACHE = register_cache("entities", maxsize=1024, ttl=600)
+NEIGHBORHOOD_CACHE = register_cache("neighborhoods", maxsize=4096, ttl=600)
+VECTOR_CACHE = register_cache("vector_hits", maxsize=1024, ttl=600)
+
+LLM_ENTITY_EXTRACTOR = "llm"
+GAZETTEER_ENTITY_EXTRACTOR = "gazetteer"
+ENTITY_EXTRACTOR_CHOICES = [LLM_ENTITY_EXTRACTOR, GAZETTEER_ENTITY_EXTRACTOR]
+
 
 class Message(TypedDict):
     role: str
     content: str
 
 
+def merge_triples(triples: list[Triple], limit: int) -> list[Triple]:
+    """Deduplicates triples keeping the best score, then ranks and caps them."""
+    merged: dict[tuple[str, str, str], Triple] = {}
+    for triple in triples:
+        key = (triple["source"], triple["type"], triple["target"])
+        if key not in merged or merged[key]["score"] < triple["score"]:
+            merged[key] = triple
+    return sorted(merged.values(), key=lambda triple: -triple["score"])[:limit]
+
+
 class Entities(BaseModel):
     names: list[str] = Field(
         ...,
@@ -37,8 +78,20 @@ class Entities(BaseModel):
 
 
 class LangChainAPI:
-    def __init__(self, llm: ChatOpenAI):
+    def __init__(
+        self,
+        llm: ChatOpenAI,
+        backend: RetrievalBackend | None = None,
+        batch_entities: bool = True,
+        entity_extractor: str = LLM_ENTITY_EXTRACTOR,
+        context_token_budget: int = DEFAULT_CONTEXT_TOKEN_BUDGET,
+    ):
         self.llm = llm
+        self.backend = backend or get_retrieval_backend()
+        # Query every entity's neighborhood in a single Cypher statement.
+        self.batch_entities = batch_entities
+        self.entity_extractor = entity_extractor
+        self.context_token_budget = context_token_budget
 
     @cached_property
     def retrieve_prompt(self) -> ChatPromptTemplate:
@@ -60,69 +113,283 @@ class LangChainAPI:
     def entity_chain(self) -> RunnableSerializable:
         return self.retrieve_prompt | self.llm.with_structured_output(Entities)
 
-    @cached_property
+    @property
     def graph(self) -> Neo4jGraph:
-        return Neo4jGraph()
+        return self.backend.graph
 
-    @cached_property
+    @property
     def vector_index(self) -> Neo4jVector:
-        return Neo4jVector.from_existing_graph(
-            OpenAIEmbeddings(),
-            search_type=SearchType.HYBRID,
-            node_label="Document",
-            text_node_properties=["text"],
-            embedding_node_property="embedding",
-        )
+        return self.backend.vector_index
 
     def structured_retriever(self, question: str) -> str:
         """
         Collects the neighborhood of entities mentioned
         in the question
         """
-        result = ""
-        entities = self.entity_chain.invoke({"question": question})
-        for entity in entities.names:
-            response = self.graph.query(
-                """CALL db.index.fulltext.queryNodes('entity', $query, {limit:20})
-                YIELD node,score
-                CALL {
-                  WITH node
-                  MATCH (node)-[r:!MENTIONS]->(neighbor)
-                  RETURN node.id + ' - ' + type(r) + ' -> ' + neighbor.id AS output
-                  UNION ALL
-                  WITH node
-                  MATCH (node)<-[r:!MENTIONS]-(neighbor)
-                  RETURN neighbor.id + ' - ' + type(r) + ' -> ' +  node.id AS output
-                }
-                RETURN output LIMIT 1000
-                """,
-                {"query": self.generate_full_text_query(entity)},
+        entities = self.extract_entities(question)
+        if self.batch_entities:
+            rows = self.query_neighborhoods(entities)
+            return "\n".join(format_triple(row) for row in rows)
+
+        lines = []
+        for entity in entities:
+            rows = self.query_neighborhoods([entity])
+            lines.extend(format_triple(row) for row in rows)
+        return "\n".join(lines)
+
+    async def astructured_retriever(self, question: str) -> str:
+        """
+        Async version of structured_retriever.
+        """
+        rows = await self.astructured_rows(question)
+        return "\n".join(format_triple(row) for row in rows)
+
+    async def astructured_rows(self, question: str) -> list[Triple]:
+        """
+        Collects the neighborhood triples of the entities in the question.
+        Without batching the neighborhood of every entity is queried concurrently.
+        """
+        entities = await self.aextract_entities(question)
+        if self.batch_entities:
+            return await self.aquery_neighborhoods(entities)
+
+        responses = await asyncio.gather(
+            *[self.aquery_neighborhoods([entity]) for entity in entities]
+        )
+        return merge_triples(
+            [row for response in responses for row in response],
+            STRUCTURED_RESULT_LIMIT,
+        )
+
+    def _entity_cache_key(self, question: str) -> tuple:
+        return (
+            knowledge_generation(),
+            self.entity_extractor,
+            getattr(self.llm, "model_name", None),
+            question,
+        )
+
+    @staticmethod
+    def _entity_names(entities: Entities) -> list[str]:
+        return [name for name in entities.names if remove_lucene_chars(name).strip()]
+
+    def extract_entities(self, question: str) -> list[str]:
+        """
+        Sync version of aextract_entities, sharing its cache.
+        """
+        key = self._entity_cache_key(question)
+        if (names := ENTITY_CACHE.get(key)) is not None:
+            return names
+
+        names = []
+        if self.entity_extractor == GAZETTEER_ENTITY_EXTRACTOR:
+            names = self.backend.gazetteer.extract(question)
+        if not names:
+            names = self._entity_names(
+                self.entity_chain.invoke({"question": question})
             )
-            result += "\n".join([el["output"] for el in response])
-        return result
+        ENTITY_CACHE.set(key, names)
+        return names
 
-    def generate_full_text_query(self, entity_name: str) -> str:
+    async def aextract_entities(self, question: str) -> list[str]:
+        """
+        Extracts the entity names mentioned in the question.
+        With the gazetteer extractor the LLM is only asked when the in-memory
+        matcher finds nothing.
+        """
+        key = self._entity_cache_key(question)
+        if (names := ENTITY_CACHE.get(key)) is not None:
+            return names
+
+        trace = current_trace()
+        names = []
+        if self.entity_extractor == GAZETTEER_ENTITY_EXTRACTOR:
+            with trace.stage("gazetteer"):
+                gazetteer = await run_blocking(lambda: self.backend.gazetteer)
+                names = await run_blocking(gazetteer.extract, question)
+
+        if not names:
+            with trace.stage("entity_chain"):
+                entities = await self.entity_chain.ainvoke({"question": question})
+            names = self._entity_names(entities)
+        trace.count("entities", len(names))
+        ENTITY_CACHE.set(key, names)
+        return names
+
+    def query_neighborhoods(
+        self, entities: list[str], limit: int = STRUCTURED_RESULT_LIMIT
+    ) -> list[Triple]:
+        """
+        Fetches the neighborhoods of all entities from the graph store in one
+        call, deduplicated and ranked by the best full-text score.
+        Entities whose neighborhood is materialized or cached are not
+        queried again.
         """
-        Generate a full-text search query for a given input string.
+        generation = knowledge_generation()
+        cached, names = self._cached_neighborhoods(
+            generation, entities, self.backend.neighborhoods
+        )
+        if not names:
+            return merge_triples(cached, limit)
+        response = self.backend.graph_store.neighborhoods(names, limit)
+        return self._merge_neighborhoods(generation, names, response, cached, limit)
 
-        This function constructs a query string suitable for a full-text search.
-        It processes the input string by splitting it into words and appending a
-        similarity threshold (~2 changed characters) to each word, then combines
-        them using the AND operator. Useful for mapping entities from user questions
-        to database values, and allows for some misspelings.
+    async def aquery_neighborhoods(
+        self, entities: list[str], limit: int = STRUCTURED_RESULT_LIMIT
+    ) -> list[Triple]:
+        """
+        Async version of query_neighborhoods.
         """
-        full_text_query = ""
-        words = [el for el in remove_lucene_chars(entity_name).split() if el]
-        for word in words[:-1]:
-            full_text_query += f" {word}~2 AND"
-        full_text_query += f" {words[-1]}~2"
-        return full_text_query.strip()
+        generation = knowledge_generation()
+        cached, names = self._cached_neighborhoods(
+            generation, entities, await self.backend.amaterialized_neighborhoods()
+        )
+        if not names:
+            return merge_triples(cached, limit)
+        graph_store = await run_blocking(lambda: self.backend.graph_store)
+        trace = current_trace()
+        with trace.stage("graph_query"):
+            response = await graph_store.aneighborhoods(names, limit)
+        trace.count("graph_rows", len(response))
+        return self._merge_neighborhoods(generation, names, response, cached, limit)
+
+    @staticmethod
+    def _cached_neighborhoods(
+        generation: int,
+        entities: list[str],
+        materialized: MaterializedNeighborhoods | None,
+    ) -> tuple[list[Triple], list[str]]:
+        """The already known triples, and the entity names left to query."""
+        cached: list[Triple] = []
+        names: list[str] = []
+        entities = list(dict.fromkeys(entities))
+        # Exact entity ids (e.g. from the gazetteer) are a single lookup when
+        # the neighborhoods are materialized.
+        found = materialized.lookup(entities) if materialized is not None else {}
+        for entity in entities:
+            if entity in found:
+                cached.extend(found[entity])
+                continue
+            if not remove_lucene_chars(entity).strip():
+                continue
+            rows = NEIGHBORHOOD_CACHE.get((generation, entity))
+            if rows is None:
+                names.append(entity)
+            else:
+                cached.extend(rows)
+        return cached, names
+
+    @staticmethod
+    def _merge_neighborhoods(
+        generation: int,
+        names: list[str],
+        response: list[NeighborhoodRow],
+        cached: list[Triple],
+        limit: int,
+    ) -> list[Triple]:
+        # Full-text scores are unbounded; scaled by each entity's best match
+        # they land in (0, 1] like the materialized rank scores they are
+        # merged with, and stay comparable across cached results.
+        best: dict[str, float] = {}
+        for el in response:
+            for entity in el["entities"]:
+                best[entity] = max(best.get(entity, 0.0), el["score"])
+        fetched = []
+        per_entity: dict[str, list[Triple]] = {entity: [] for entity in names}
+        for el in response:
+            scores = {
+                entity: el["score"] / best[entity] if best[entity] else 0.0
+                for entity in el["entities"]
+            }
+            for entity, score in scores.items():
+                per_entity[entity].append(
+                    Triple(
+                        source=el["source"],
+                        type=el["type"],
+                        target=el["target"],
+                        score=score,
+                    )
+                )
+            fetched.append(
+                Triple(
+                    source=el["source"],
+                    type=el["type"],
+                    target=el["target"],
+                    score=max(scores.values(), default=0.0),
+                )
+            )
+
+        # A truncated result does not hold every entity's full neighborhood.
+        if len(fetched) < limit:
+            for entity, rows in per_entity.items():
+                NEIGHBORHOOD_CACHE.set((generation, entity), rows)
+        return merge_triples(fetched + cached, limit)
+
+    def similarity_search(self, question: str) -> list[Chunk]:
+        """Hybrid vector search returning the hits with their scores."""
+        key = (knowledge_generation(), self.backend.config.embedding_model, question)
+        if (hits := VECTOR_CACHE.get(key)) is not None:
+            return hits
+        hits = [
+            Chunk(text=document.page_content, score=score)
+            for document, score in self.vector_index.similarity_search_with_score(
+                question
+            )
+        ]
+        VECTOR_CACHE.set(key, hits)
+        return hits
+
+    async def asimilarity_search(self, question: str) -> list[Chunk]:
+        """
+        Async version of similarity_search.
+        """
+        key = (knowledge_generation(), self.backend.config.embedding_model, question)
+        if (hits := VECTOR_CACHE.get(key)) is not None:
+            return hits
+        with current_trace().stage("similarity_search"):
+            results = await self.backend.asimilarity_search_with_score(question)
+        hits = [
+            Chunk(text=document.page_content, score=score)
+            for document, score in results
+        ]
+        VECTOR_CACHE.set(key, hits)
+        return hits
+
+    def generate_full_text_query(self, entity_name: str) -> str:
+        return generate_full_text_query(entity_name)
 
     def retriever(self, question: str) -> str:
         structured_data = self.structured_retriever(question)
         unstructured_data = [
-            el.page_content for el in self.vector_index.similarity_search(question)
+            chunk["text"] for chunk in self.similarity_search(question)
         ]
+        return self.format_context(structured_data, unstructured_data)
+
+    async def aretriever(self, question: str) -> str:
+        """
+        Runs the structured and the vector retrieval concurrently on the async
+        driver, so the latency is the slower of the two instead of the sum.
+        The results are ranked and trimmed to the context token budget.
+        """
+        trace = current_trace()
+        with trace.stage("retrieval"):
+            triples, chunks = await asyncio.gather(
+                self.astructured_rows(question),
+                self.asimilarity_search(question),
+            )
+        builder = ContextBuilder(
+            model=getattr(self.llm, "model_name", ""),
+            token_budget=self.context_token_budget,
+        )
+        with trace.stage("context_build"):
+            context = builder.build(triples, chunks)
+        trace.count("triples", len(triples))
+        trace.count("chunks", len(chunks))
+        trace.count("context_tokens", builder.tokens)
+        return context
+
+    @staticmethod
+    def format_context(structured_data: str, unstructured_data: list[str]) -> str:
         final_data = f"""Structured data:
         {structured_data}
         Unstructured data:
@@ -130,12 +397,49 @@ class LangChainAPI:
         """
         return final_data
 
+    def semantic_cache_scope(
+        self, system_content: str, messages: list[Message]
+    ) -> str:
+        model_kwargs = getattr(self.llm, "model_kwargs", {})
+        return semantic_cache_scope(
+            system_content=system_content,
+            model=getattr(self.llm, "model_name", None),
+            embedding_model=self.backend.config.embedding_model,
+            temperature=getattr(self.llm, "temperature", None),
+            seed=model_kwargs.get("seed"),
+            top_p=model_kwargs.get("top_p"),
+            history=messages,
+        )
+
     async def aquestion(
-        self, system_content: str, messages: list[Message], question: str
+        self,
+        system_content: str,
+        messages: list[Message],
+        question: str,
+        use_semantic_cache: bool = False,
     ) -> AsyncIterable[str]:
+        trace = current_trace()
+        if use_semantic_cache:
+            with trace.stage("semantic_cache"):
+                semantic_cache = await run_blocking(get_semantic_cache)
+                scope = self.semantic_cache_scope(system_content, messages)
+                embedding = await run_blocking(
+                    self.backend.embeddings.embed_query, question
+                )
+                answer = semantic_cache.lookup(scope, embedding)
+            if answer is not None:
+                trace.count("semantic_cache_hits", 1)
+                for chunk in re.findall(r"\s*\S+", answer):
+                    yield chunk
+                return
+
+        # Retrieval (and its entity extraction call) only runs on a cache miss.
+        context = await self.aretriever(question)
         system_prompt = SYSTEM_ROMPT.format(
-            system_content=system_content, context=self.retriever(question)
+            system_content=system_content, context=context
         )
+        trace.count("prompt_chars", len(system_prompt))
+        trace.count("history_messages", len(messages))
         prompt = ChatPromptTemplate.from_messages(
             [
                 ("system", system_prompt),
@@ -144,5 +448,12 @@ class LangChainAPI:
             ]
         )
         chain = prompt | self.llm | StrOutputParser()
+        chunks = []
         async for msg in chain.astream({}):
+            chunks.append(msg)
             yield msg
+
+        if use_semantic_cache:
+            await run_blocking(
+                semantic_cache.add, scope, embedding, question, "".join(chunks)
+            )
@@ -0,0 +1,24 @@
+from functools import lru_cache
+
+from langchain_core.language_models import BaseChatModel
+from langchain_openai import ChatOpenAI
+
+from reflex_study.fakes import FAKE_MODEL, FakeChatModel
+
+
+@lru_cache(maxsize=16)
+def get_chat_model(
+    model: str, temperature: float | None, seed: int | None, top_p: float | None
+) -> BaseChatModel:
+    """Reuse one client (and its HTTP connection pool) per model setting."""
+    if model == FAKE_MODEL:
+        # For the benchmarks and load tests; never calls OpenAI.
+        return FakeChatModel()
+    # ChatOpenAI rejects temperature=None, so leave it at the default instead.
+    kwargs = {} if temperature is None else {"temperature": temperature}
+    return ChatOpenAI(
+        model_name=model,
+        seed=seed,
+        top_p=top_p,
+        **kwargs,
+    )
@@ -0,0 +1,90 @@
+import os
+import threading
+from typing import Iterable
+
+from reflex_study.cache import knowledge_generation
+from reflex_study.context_builder import Triple
+from reflex_study.graph_store import GraphStore
+
+# Triples kept per entity, best connected neighbors first.
+MATERIALIZED_TRIPLES_PER_ENTITY = int(
+    os.environ.get("MATERIALIZED_TRIPLES_PER_ENTITY", "100")
+)
+# Entity ids per graph store call while building.
+MATERIALIZE_BATCH_SIZE = 1000
+
+
+class MaterializedNeighborhoods:
+    """
+    Precomputed, pre-ranked 1-hop neighborhoods keyed by exact entity id.
+
+    Every entry remembers the knowledge generation it was built at. Ingestion
+    reports the entities whose edges it changed together with the generation
+    that made the change visible, and an entry older than that is treated as
+    missing until `refresh` rebuilds it, so a lookup never serves triples
+    from before a finished ingestion.
+    """
+
+    def __init__(
+        self,
+        graph_store: GraphStore,
+        limit: int = MATERIALIZED_TRIPLES_PER_ENTITY,
+    ):
+        self.graph_store = graph_store
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # entity id -> (generation, triples)
+        self._entries: dict[str, tuple[int, list[Triple]]] = {}
+        # entity id -> generation of the last change to its edges
+        self._changed: dict[str, int] = {}
+
+    def build(self, ids: Iterable[str] | None = None):
+        """Materialize the given entities, or every entity in the graph."""
+        ids = list(self.graph_store.entity_ids() if ids is None else ids)
+        for start in range(0, len(ids), MATERIALIZE_BATCH_SIZE):
+            batch = ids[start : start + MATERIALIZE_BATCH_SIZE]
+            generation = knowledge_generation()
+            neighborhoods = self.graph_store.entity_neighborhoods(batch, self.limit)
+            with self._lock:
+                for entity in batch:
+                    self._entries[entity] = (generation, neighborhoods.get(entity, []))
+
+    def mark_changed(self, ids: Iterable[str], generation: int):
+        with self._lock:
+            for entity in ids:
+                self._changed[entity] = generation
+
+    def refresh(self):
+        """Rebuild the stale entries."""
+        with self._lock:
+            stale = [
+                entity
+                for entity, generation in self._changed.items()
+                if entity not in self._entries or self._entries[entity][0] < generation
+            ]
+        self.build(stale)
+
+    def lookup(self, ids: list[str]) -> dict[str, list[Triple]]:
+        """The triples of the ids with an up-to-date entry."""
+        found = {}
+        with self._lock:
+            for entity in ids:
+                entry = self._entries.get(entity)
+                if entry is None or entry[0] < self._changed.get(entity, 0):
+                    self.misses += 1
+                    continue
+                self.hits += 1
+                found[entity] = entry[1]
+        return found
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": None,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
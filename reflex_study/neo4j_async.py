@@ -0,0 +1,168 @@
+import asyncio
+import os
+from typing import Any
+
+from langchain_community.vectorstores.neo4j_vector import (
+    Neo4jVector,
+    SearchType,
+    remove_lucene_chars,
+)
+from langchain_core.documents import Document
+from neo4j import (
+    READ_ACCESS,
+    WRITE_ACCESS,
+    AsyncGraphDatabase,
+    AsyncManagedTransaction,
+    unit_of_work,
+)
+
+# Seconds a read (retrieval) or a write batch (ingestion) may take. The limit
+# is sent to the server as the transaction timeout and also enforced on the
+# client, which cancels the query when it is exceeded.
+NEO4J_QUERY_TIMEOUT = float(os.environ.get("NEO4J_QUERY_TIMEOUT", "10"))
+NEO4J_WRITE_TIMEOUT = float(os.environ.get("NEO4J_WRITE_TIMEOUT", "120"))
+# Connections shared by every session and ingestion job of the process.
+NEO4J_MAX_CONNECTIONS = int(os.environ.get("NEO4J_MAX_CONNECTIONS", "50"))
+
+# The node index searches of Neo4jVector. The hybrid search scales both
+# indexes' scores by their best hit and keeps each node's better score.
+VECTOR_SEARCH_QUERY = """CALL db.index.vector.queryNodes($index, $k, $embedding)
+YIELD node, score
+"""
+HYBRID_SEARCH_QUERY = """CALL {
+  CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node, score
+  WITH collect({node:node, score:score}) AS nodes, max(score) AS max
+  UNWIND nodes AS n
+  RETURN n.node AS node, (n.score / max) AS score
+  UNION
+  CALL db.index.fulltext.queryNodes($keyword_index, $query, {limit: $k})
+  YIELD node, score
+  WITH collect({node:node, score:score}) AS nodes, max(score) AS max
+  UNWIND nodes AS n
+  RETURN n.node AS node, (n.score / max) AS score
+}
+WITH node, max(score) AS score ORDER BY score DESC LIMIT $k
+"""
+
+
+class AsyncNeo4jClient:
+    """
+    Runs Cypher on the asyncio Neo4j driver so a slow query only suspends the
+    coroutine waiting for it instead of a thread or the event loop.
+
+    Sessions are opened per query and are cheap; the driver's connection pool
+    is what is shared. Cancelling the awaiting task (e.g. when the user stops
+    waiting for an answer) abandons the query and its connection.
+    """
+
+    def __init__(
+        self,
+        url: str | None,
+        username: str | None,
+        password: str | None,
+        database: str | None = None,
+        max_connections: int = NEO4J_MAX_CONNECTIONS,
+    ):
+        self.driver = AsyncGraphDatabase.driver(
+            url,
+            auth=(username, password),
+            max_connection_pool_size=max_connections,
+        )
+        self.database = database
+
+    async def query(
+        self,
+        cypher: str,
+        parameters: dict[str, Any] | None = None,
+        timeout: float = NEO4J_QUERY_TIMEOUT,
+    ) -> list[dict[str, Any]]:
+        @unit_of_work(timeout=timeout)
+        async def work(tx: AsyncManagedTransaction) -> list[dict[str, Any]]:
+            result = await tx.run(cypher, parameters or {})
+            return await result.data()
+
+        async with self.driver.session(
+            database=self.database, default_access_mode=READ_ACCESS
+        ) as session:
+            return await asyncio.wait_for(session.execute_read(work), timeout)
+
+    async def write(
+        self,
+        cypher: str,
+        rows: list[dict[str, Any]],
+        batch_size: int,
+        timeout: float = NEO4J_WRITE_TIMEOUT,
+    ) -> int:
+        """
+        Run an `UNWIND $rows` statement in one transaction per batch and
+        return how many transactions the driver retried.
+        """
+        attempts = 0
+
+        @unit_of_work(timeout=timeout)
+        async def work(tx: AsyncManagedTransaction, batch: list[dict[str, Any]]):
+            nonlocal attempts
+            attempts += 1
+            result = await tx.run(cypher, rows=batch)
+            await result.consume()
+
+        batches = 0
+        async with self.driver.session(
+            database=self.database, default_access_mode=WRITE_ACCESS
+        ) as session:
+            for start in range(0, len(rows), batch_size):
+                batches += 1
+                await asyncio.wait_for(
+                    session.execute_write(work, rows[start : start + batch_size]),
+                    timeout,
+                )
+        return attempts - batches
+
+    async def close(self):
+        await self.driver.close()
+
+
+async def asimilarity_search_with_score(
+    client: AsyncNeo4jClient, store: Neo4jVector, query: str, k: int = 4
+) -> list[tuple[Document, float]]:
+    """
+    Neo4jVector.similarity_search_with_score on the async driver, without the
+    thread hop: the same node index search, followed by the store's
+    retrieval_query or, without one, its default RETURN of the text, the
+    score and the remaining properties as metadata.
+    """
+    embedding = await store.embedding.aembed_query(query)
+    search_query = (
+        HYBRID_SEARCH_QUERY
+        if store.search_type == SearchType.HYBRID
+        else VECTOR_SEARCH_QUERY
+    )
+    retrieval_query = store.retrieval_query or (
+        f"RETURN node.`{store.text_node_property}` AS text, score, "
+        f"node {{.*, `{store.text_node_property}`: Null, "
+        f"`{store.embedding_node_property}`: Null, id: Null }} AS metadata"
+    )
+    results = await client.query(
+        search_query + retrieval_query,
+        {
+            "index": store.index_name,
+            "k": k,
+            "embedding": embedding,
+            "keyword_index": store.keyword_index_name,
+            "query": remove_lucene_chars(query),
+        },
+    )
+    return [
+        (
+            Document(
+                page_content=result["text"],
+                metadata={
+                    key: value
+                    for key, value in result["metadata"].items()
+                    if value is not None
+                },
+            ),
+            result["score"],
+        )
+        for result in results
+    ]
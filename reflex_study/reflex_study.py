@@ -1,8 +1,19 @@
 """The main Chat app."""
 
 import reflex as rx
+from reflex_study.cache import cache_stats
+from reflex_study.chat_store import chat_store_lifespan
+from reflex_study.jobs import (
+    ingestion_job_status,
+    ingestion_lifespan,
+    ingestion_metrics,
+)
 from reflex_study.pages import index
 from reflex_study.pages import documents
+from reflex_study.retrieval import retrieval_lifespan
+from reflex_study.semantic_cache import semantic_cache_lifespan
+from reflex_study.state import State
+from reflex_study.tracing import qa_metrics
 
 # Add state and page to the app.
 app = rx.App(
@@ -12,5 +23,23 @@ app = rx.App(
     ),
 )
 
-app.add_page(index.index)
-app.add_page(documents.index, route="/documents")
+app.add_page(index.index, on_load=State.load_chats)
+app.add_page(documents.index, route="/documents", on_load=State.poll_ingestion)
+
+# Share one retrieval backend across all sessions for the lifetime of the app.
+app.register_lifespan_task(retrieval_lifespan)
+app.register_lifespan_task(semantic_cache_lifespan)
+app.register_lifespan_task(chat_store_lifespan)
+app.register_lifespan_task(ingestion_lifespan)
+
+# Hit/miss counters of the retrieval caches.
+app.api.add_api_route("/cache/stats", cache_stats)
+
+# Per-stage latency percentiles of the answered questions (with QA_TRACING=1).
+app.api.add_api_route("/metrics/qa", qa_metrics)
+
+# Throughput, latencies and queue depth of the document ingestion.
+app.api.add_api_route("/metrics/ingestion", ingestion_metrics)
+
+# Status and progress of a queued document ingestion.
+app.api.add_api_route("/ingestion/jobs/{job_id}", ingestion_job_status)
@@ -0,0 +1,355 @@
+import asyncio
+import contextlib
+import os
+import threading
+import warnings
+from dataclasses import dataclass, field
+
+from langchain_community.graphs import Neo4jGraph
+from langchain_community.vectorstores.neo4j_vector import Neo4jVector, SearchType
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from reflex_study.cache import register_stats
+from reflex_study.executor import run_blocking
+from reflex_study.fakes import FAKE_EMBEDDING_MODEL, FakeEmbeddings
+from reflex_study.gazetteer import EntityGazetteer
+from reflex_study.graph_store import (
+    GRAPH_STORE_PATH,
+    MEMORY_GRAPH_BACKEND,
+    NEO4J_GRAPH_BACKEND,
+    GraphStore,
+    MemoryGraphStore,
+    Neo4jGraphStore,
+)
+from reflex_study.graph_writer import GraphWriter
+from reflex_study.neighborhoods import MaterializedNeighborhoods
+from reflex_study.neo4j_async import AsyncNeo4jClient, asimilarity_search_with_score
+from reflex_study.vector_store import (
+    NEO4J_VECTOR_BACKEND,
+    NUMPY_VECTOR_BACKEND,
+    DEFAULT_K,
+    VECTOR_STORE_PATH,
+    NumpyVectorStore,
+    VectorIndex,
+)
+
+DEFAULT_EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Fills an empty in-process vector store from the vectors already in Neo4j.
+DOCUMENT_EMBEDDINGS_QUERY = """MATCH (d:Document)
+WHERE d.embedding IS NOT NULL AND d.text IS NOT NULL
+RETURN d.id AS id, d.text AS text, d.embedding AS embedding
+"""
+
+@dataclass(frozen=True)
+class RetrievalConfig:
+    """Connection settings that identify one shared retrieval backend."""
+
+    url: str | None = None
+    username: str | None = None
+    password: str | None = field(default=None, repr=False)
+    database: str | None = None
+    embedding_model: str = DEFAULT_EMBEDDING_MODEL
+    # Where the hybrid vector search runs: Neo4j or an in-process NumPy store.
+    vector_backend: str = NEO4J_VECTOR_BACKEND
+    # Where the knowledge graph lives: Neo4j or an in-process snapshot.
+    graph_backend: str = NEO4J_GRAPH_BACKEND
+    # Serve the neighborhoods of exactly matched entities from memory.
+    materialize_neighborhoods: bool = False
+
+    def __post_init__(self):
+        if (
+            self.graph_backend == MEMORY_GRAPH_BACKEND
+            and self.vector_backend == NEO4J_VECTOR_BACKEND
+        ):
+            # Ingestion writes the chunk embeddings with the Neo4j graph only.
+            raise ValueError(
+                "The memory graph backend needs the numpy vector backend: "
+                "set VECTOR_BACKEND=numpy."
+            )
+
+    @classmethod
+    def from_env(cls) -> "RetrievalConfig":
+        return cls(
+            url=os.environ.get("NEO4J_URI"),
+            username=os.environ.get("NEO4J_USERNAME"),
+            password=os.environ.get("NEO4J_PASSWORD"),
+            database=os.environ.get("NEO4J_DATABASE"),
+            embedding_model=os.environ.get("EMBEDDING_MODEL", DEFAULT_EMBEDDING_MODEL),
+            vector_backend=os.environ.get("VECTOR_BACKEND", NEO4J_VECTOR_BACKEND),
+            graph_backend=os.environ.get("GRAPH_BACKEND", NEO4J_GRAPH_BACKEND),
+            materialize_neighborhoods=os.environ.get(
+                "MATERIALIZE_NEIGHBORHOODS", ""
+            ).lower()
+            in ("1", "true"),
+        )
+
+
+class RetrievalBackend:
+    """
+    Owns the graph and vector stores and the embeddings client for one config.
+
+    Building these is expensive (schema introspection, index checks, scanning
+    for un-embedded nodes), so a single instance is shared by every session
+    and question in the process.
+    """
+
+    def __init__(self, config: RetrievalConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._graph: Neo4jGraph | None = None
+        self._neo4j_client: AsyncNeo4jClient | None = None
+        self._graph_store: GraphStore | None = None
+        self._embeddings: Embeddings | None = None
+        self._vector_index: VectorIndex | None = None
+        self._gazetteer: EntityGazetteer | None = None
+        self._neighborhoods: MaterializedNeighborhoods | None = None
+
+    @property
+    def graph(self) -> Neo4jGraph:
+        if self._graph is None:
+            with self._lock:
+                if self._graph is None:
+                    graph = Neo4jGraph(
+                        url=self.config.url,
+                        username=self.config.username,
+                        password=self.config.password,
+                        database=self.config.database,
+                    )
+                    GraphWriter(graph._driver, graph._database).ensure_schema()
+                    self._graph = graph
+        return self._graph
+
+    @property
+    def neo4j_client(self) -> AsyncNeo4jClient:
+        """The async driver the question answering and ingestion queries use."""
+        if self._neo4j_client is None:
+            with self._lock:
+                if self._neo4j_client is None:
+                    self._neo4j_client = AsyncNeo4jClient(
+                        self.config.url,
+                        self.config.username,
+                        self.config.password,
+                        self.config.database,
+                    )
+        return self._neo4j_client
+
+    @property
+    def graph_store(self) -> GraphStore:
+        if self._graph_store is None:
+            if self.config.graph_backend == MEMORY_GRAPH_BACKEND:
+                with self._lock:
+                    if self._graph_store is None:
+                        store = MemoryGraphStore(GRAPH_STORE_PATH)
+                        store.load()
+                        self._graph_store = store
+            else:
+                graph, client = self.graph, self.neo4j_client
+                with self._lock:
+                    if self._graph_store is None:
+                        self._graph_store = Neo4jGraphStore(graph, client)
+        return self._graph_store
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    model = self.config.embedding_model
+                    self._embeddings = (
+                        FakeEmbeddings()
+                        if model == FAKE_EMBEDDING_MODEL
+                        else OpenAIEmbeddings(model=model)
+                    )
+        return self._embeddings
+
+    @property
+    def vector_index(self) -> VectorIndex:
+        if self.config.vector_backend == NUMPY_VECTOR_BACKEND:
+            return self._numpy_vector_index()
+        if self._vector_index is None:
+            embeddings, graph = self.embeddings, self.graph
+            with self._lock:
+                if self._vector_index is None:
+                    # Reuses the graph's driver, so both share one connection pool.
+                    self._vector_index = Neo4jVector.from_existing_graph(
+                        embeddings,
+                        url=self.config.url,
+                        username=self.config.username,
+                        password=self.config.password,
+                        database=self.config.database,
+                        graph=graph,
+                        search_type=SearchType.HYBRID,
+                        node_label="Document",
+                        text_node_properties=["text"],
+                        embedding_node_property="embedding",
+                    )
+        return self._vector_index
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = DEFAULT_K
+    ) -> list[tuple[Document, float]]:
+        """Hybrid search on the async driver, or in a thread for NumPy."""
+        if self._vector_index is None:
+            # The first call checks the indexes, so it runs in a thread.
+            await run_blocking(lambda: self.vector_index)
+        if isinstance(self._vector_index, Neo4jVector):
+            return await asimilarity_search_with_score(
+                self.neo4j_client, self._vector_index, query, k
+            )
+        return await run_blocking(
+            self._vector_index.similarity_search_with_score, query, k
+        )
+
+    def _numpy_vector_index(self) -> NumpyVectorStore:
+        if self._vector_index is None:
+            embeddings = self.embeddings
+            with self._lock:
+                if self._vector_index is None:
+                    store = NumpyVectorStore(
+                        embeddings, VECTOR_STORE_PATH, self.config.embedding_model
+                    )
+                    store.load()
+                    if not len(store) and (
+                        self.config.graph_backend == NEO4J_GRAPH_BACKEND
+                    ):
+                        self._import_embeddings(store)
+                    self._vector_index = store
+        return self._vector_index
+
+    def _import_embeddings(self, store: NumpyVectorStore):
+        try:
+            rows = self.graph.query(DOCUMENT_EMBEDDINGS_QUERY)
+        except Exception as e:
+            # Without Neo4j, start empty and let the next ingestions fill the store.
+            warnings.warn(f"Failed to import the document embeddings: {e}")
+            return
+        store.add(
+            [row["id"] for row in rows],
+            [row["text"] for row in rows],
+            [row["embedding"] for row in rows],
+        )
+
+    def index_documents(
+        self, ids: list[str], texts: list[str], vectors: list[list[float]]
+    ):
+        """Add newly written chunks to an in-process vector store."""
+        if self.config.vector_backend == NUMPY_VECTOR_BACKEND:
+            self._numpy_vector_index().add(ids, texts, vectors)
+
+    def save(self):
+        """Persist the in-process stores."""
+        if isinstance(self._vector_index, NumpyVectorStore):
+            self._vector_index.save()
+        if self._graph_store is not None:
+            self._graph_store.save()
+
+    @property
+    def gazetteer(self) -> EntityGazetteer:
+        if self._gazetteer is None:
+            graph_store = self.graph_store
+            with self._lock:
+                if self._gazetteer is None:
+                    gazetteer = EntityGazetteer()
+                    gazetteer.add(graph_store.entity_ids())
+                    self._gazetteer = gazetteer
+        return self._gazetteer
+
+    @property
+    def neighborhoods(self) -> MaterializedNeighborhoods | None:
+        """The materialized neighborhoods, or None when they are disabled."""
+        if not self.config.materialize_neighborhoods:
+            return None
+        if self._neighborhoods is None:
+            graph_store = self.graph_store
+            with self._lock:
+                if self._neighborhoods is None:
+                    neighborhoods = MaterializedNeighborhoods(graph_store)
+                    neighborhoods.build()
+                    register_stats("materialized_neighborhoods", neighborhoods.stats)
+                    self._neighborhoods = neighborhoods
+        return self._neighborhoods
+
+    async def amaterialized_neighborhoods(self) -> MaterializedNeighborhoods | None:
+        """`neighborhoods` for coroutines; the first build runs in a thread."""
+        if self._neighborhoods is None and self.config.materialize_neighborhoods:
+            await run_blocking(lambda: self.neighborhoods)
+        return self._neighborhoods
+
+    def refresh_neighborhoods(self, ids: set[str], generation: int):
+        """Rebuild the materialized neighborhoods an ingestion changed."""
+        if self._neighborhoods is not None:
+            self._neighborhoods.mark_changed(ids, generation)
+            self._neighborhoods.refresh()
+
+    def warm_up(self):
+        """Open the connections and the vector index ahead of the first question."""
+        self.graph_store
+        self.vector_index
+        self.gazetteer
+        self.neighborhoods
+
+    async def aclose(self):
+        if self._neo4j_client is not None:
+            await self._neo4j_client.close()
+            self._neo4j_client = None
+        await asyncio.to_thread(self.close)
+
+    def close(self):
+        self.save()
+        with self._lock:
+            if self._graph is not None:
+                self._graph._driver.close()
+            self._graph = None
+            self._graph_store = None
+            self._vector_index = None
+            self._embeddings = None
+            self._gazetteer = None
+            self._neighborhoods = None
+
+
+_backends: dict[RetrievalConfig, RetrievalBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_retrieval_backend(config: RetrievalConfig | None = None) -> RetrievalBackend:
+    if config is None:
+        config = RetrievalConfig.from_env()
+    with _backends_lock:
+        if config not in _backends:
+            _backends[config] = RetrievalBackend(config)
+        return _backends[config]
+
+
+def close_retrieval_backends():
+    with _backends_lock:
+        backends = list(_backends.values())
+        _backends.clear()
+    for backend in backends:
+        backend.close()
+
+
+async def aclose_retrieval_backends():
+    """Close the backends, including the async drivers bound to this loop."""
+    with _backends_lock:
+        backends = list(_backends.values())
+        _backends.clear()
+    for backend in backends:
+        await backend.aclose()
+
+
+@contextlib.asynccontextmanager
+async def retrieval_lifespan():
+    """Warm up the shared backend when the app starts and close it on shutdown."""
+    backend = get_retrieval_backend()
+    try:
+        await asyncio.to_thread(backend.warm_up)
+    except Exception as e:
+        # Start the app even if Neo4j is down; the first question reconnects.
+        warnings.warn(f"Failed to warm up retrieval backend: {e}")
+    try:
+        yield
+    finally:
+        await aclose_retrieval_backends()
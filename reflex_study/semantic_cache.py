@@ -0,0 +1,252 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import warnings
+from functools import cache
+from pathlib import Path
+
+import numpy as np
+
+from reflex_study.cache import (
+    knowledge_generation,
+    on_knowledge_generation_bump,
+    register_stats,
+)
+
+SEMANTIC_CACHE_PATH = Path(os.getcwd()) / os.environ.get(
+    "SEMANTIC_CACHE_PATH", ".semantic_cache"
+)
+SEMANTIC_CACHE_CAPACITY = int(os.environ.get("SEMANTIC_CACHE_CAPACITY", "2048"))
+SEMANTIC_CACHE_THRESHOLD = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+# Persist after this many new answers (and always on shutdown).
+SAVE_INTERVAL = 16
+
+
+class SemanticAnswerCache:
+    """
+    Previously generated answers indexed by the normalized question embedding.
+
+    Embeddings live in one preallocated float32 matrix so a lookup is a single
+    matrix-vector product. Answers only match within the same scope (system
+    content, models, sampling settings and conversation history) and knowledge
+    generation. When full, the least recently used row is overwritten. The
+    matrix has the width of one embedding model; answers embedded with another
+    width are dropped.
+    """
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        capacity: int = SEMANTIC_CACHE_CAPACITY,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+    ):
+        self.path = path
+        self.capacity = capacity
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._matrix: np.ndarray | None = None
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        # row -> {"scope", "generation", "question", "answer"}
+        self._rows: list[dict | None] = [None] * capacity
+        self._rows_by_scope: dict[str, list[int]] = {}
+        self._unsaved = 0
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _clear(self):
+        self._matrix = None
+        self._last_used[:] = 0
+        self._rows = [None] * self.capacity
+        self._rows_by_scope = {}
+
+    def _check_width(self, width: int):
+        """Drop every answer if the embeddings changed width (another model)."""
+        if self._matrix is None or self._matrix.shape[1] == width:
+            return
+        warnings.warn(
+            f"Dropping the semantic answer cache: its embeddings have "
+            f"{self._matrix.shape[1]} dimensions, the current model {width}."
+        )
+        self._clear()
+
+    def lookup(self, scope: str, embedding: list[float]) -> str | None:
+        generation = knowledge_generation()
+        with self._lock:
+            self._check_width(len(embedding))
+            rows = [
+                row
+                for row in self._rows_by_scope.get(scope, [])
+                if self._rows[row]["generation"] == generation
+            ]
+            if not rows or self._matrix is None:
+                self.misses += 1
+                return None
+            similarities = self._matrix[rows] @ self._normalize(embedding)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            row = rows[best]
+            self._last_used[row] = time.monotonic()
+            self.hits += 1
+            return self._rows[row]["answer"]
+
+    def add(self, scope: str, embedding: list[float], question: str, answer: str):
+        vector = self._normalize(embedding)
+        with self._lock:
+            self._check_width(len(vector))
+            if self._matrix is None:
+                self._matrix = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+            row = self._free_row()
+            self._matrix[row] = vector
+            self._last_used[row] = time.monotonic()
+            self._rows[row] = {
+                "scope": scope,
+                "generation": knowledge_generation(),
+                "question": question,
+                "answer": answer,
+            }
+            self._rows_by_scope.setdefault(scope, []).append(row)
+            self._unsaved += 1
+            should_save = self._unsaved >= SAVE_INTERVAL
+        if should_save:
+            self.save()
+
+    def _free_row(self) -> int:
+        for row, item in enumerate(self._rows):
+            if item is None:
+                return row
+        row = int(np.argmin(self._last_used))
+        self._drop(row)
+        return row
+
+    def _drop(self, row: int):
+        item = self._rows[row]
+        self._rows[row] = None
+        self._last_used[row] = 0
+        rows = self._rows_by_scope[item["scope"]]
+        rows.remove(row)
+        if not rows:
+            del self._rows_by_scope[item["scope"]]
+
+    def purge_stale(self, generation: int):
+        """Drop answers generated before the knowledge graph changed."""
+        with self._lock:
+            for row, item in enumerate(self._rows):
+                if item is not None and item["generation"] < generation:
+                    self._drop(row)
+        self.save()
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            used = [row for row, item in enumerate(self._rows) if item is not None]
+            metadata = [self._rows[row] for row in used]
+            matrix = (
+                self._matrix[used]
+                if self._matrix is not None
+                else np.zeros((0, 0), dtype=np.float32)
+            )
+            self._unsaved = 0
+
+        matrix_path = self.path.with_suffix(".npy")
+        metadata_path = self.path.with_suffix(".json")
+        tmp_matrix_path = matrix_path.with_suffix(".tmp.npy")
+        np.save(tmp_matrix_path, matrix)
+        with metadata_path.with_suffix(".tmp").open("w") as file:
+            json.dump(metadata, file, ensure_ascii=False)
+        os.replace(tmp_matrix_path, matrix_path)
+        os.replace(metadata_path.with_suffix(".tmp"), metadata_path)
+
+    def load(self):
+        if self.path is None:
+            return
+        matrix_path = self.path.with_suffix(".npy")
+        metadata_path = self.path.with_suffix(".json")
+        if not matrix_path.exists() or not metadata_path.exists():
+            return
+        matrix = np.load(matrix_path)
+        with metadata_path.open("r") as file:
+            metadata = json.load(file)
+        generation = knowledge_generation()
+        for vector, item in zip(matrix, metadata[: self.capacity]):
+            # Generations restart in every process; loaded answers get the current one.
+            item["generation"] = generation
+            with self._lock:
+                if self._matrix is None:
+                    self._matrix = np.zeros(
+                        (self.capacity, matrix.shape[1]), dtype=np.float32
+                    )
+                row = self._free_row()
+                self._matrix[row] = vector
+                self._last_used[row] = time.monotonic()
+                self._rows[row] = item
+                self._rows_by_scope.setdefault(item["scope"], []).append(row)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": sum(item is not None for item in self._rows),
+                "maxsize": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def semantic_cache_scope(
+    system_content: str,
+    model: str | None,
+    embedding_model: str,
+    temperature: float | None,
+    seed: int | None,
+    top_p: float | None,
+    history: list[dict],
+) -> str:
+    # A follow-up ("and his wife?") means something else in another
+    # conversation, so the replayed history (summary and turns) is part of
+    # the scope; first questions share the empty history.
+    history_hash = hashlib.sha256(
+        json.dumps(history, ensure_ascii=False).encode()
+    ).hexdigest()
+    return json.dumps(
+        [
+            system_content,
+            model,
+            embedding_model,
+            temperature,
+            seed,
+            top_p,
+            history_hash,
+        ],
+        ensure_ascii=False,
+    )
+
+
+@cache
+def get_semantic_cache() -> SemanticAnswerCache:
+    semantic_cache = SemanticAnswerCache(path=SEMANTIC_CACHE_PATH)
+    semantic_cache.load()
+    on_knowledge_generation_bump(semantic_cache.purge_stale)
+    register_stats("semantic_answers", semantic_cache.stats)
+    return semantic_cache
+
+
+@contextlib.asynccontextmanager
+async def semantic_cache_lifespan():
+    """Persist the answers on shutdown if the cache was used."""
+    try:
+        yield
+    finally:
+        if get_semantic_cache.cache_info().currsize:
+            await asyncio.to_thread(get_semantic_cache().save)
@@ -1,14 +1,18 @@
+import asyncio
 import os
+import uuid
 
 import reflex as rx
-from langchain_community.graphs import Neo4jGraph
-from langchain_experimental.graph_transformers import LLMGraphTransformer
-from langchain_openai import ChatOpenAI
-from langchain_text_splitters import TokenTextSplitter
 from openai import OpenAI
 
+from reflex_study.chat_store import HISTORY_PAGE_SIZE, get_chat_store
 from reflex_study.config_state import ConfigState
+from reflex_study.history import get_history_manager, schedule_summary_update
+from reflex_study.jobs import get_ingestion_queue
 from reflex_study.langchain_api import LangChainAPI
+from reflex_study.llm import get_chat_model
+from reflex_study.streaming import coalesce
+from reflex_study.tracing import start_trace
 
 # Checking if the API key is set properly
 if not os.getenv("OPENAI_API_KEY"):
@@ -22,58 +26,115 @@ class QA(rx.Base):
     answer: str
 
 
-DEFAULT_CHATS = {
-    "Intros": [],
-}
+DEFAULT_CHATS = ["Intros"]
+
+# How often the documents page polls the progress of its ingestion job.
+INGESTION_POLL_INTERVAL = 1.0
 
 
 class State(rx.State):
     """The app state."""
 
-    # A dict from the chat name to the list of questions and answers.
-    chats: dict[str, list[QA]] = DEFAULT_CHATS
+    # Identifies the chats of this browser in the chat store.
+    client_id: str = rx.LocalStorage(name="client_id")
+
+    # The list of chat names.
+    chat_titles: list[str] = list(DEFAULT_CHATS)
 
     # The current chat name.
     current_chat = "Intros"
 
+    # The loaded questions and answers of the current chat.
+    messages: list[QA] = []
+
+    # Whether the current chat has messages older than the loaded ones.
+    has_older_messages: bool = False
+
+    # The id of the oldest loaded message in the chat store.
+    _oldest_message_id: int | None = None
+
     # The current question.
     question: str
 
     # Whether we are processing the question.
     processing: bool = False
 
+    # The question being answered and its answer streamed so far. They are
+    # only added to the chat once the answer is complete.
+    streaming_question: str = ""
+    streaming_answer: str = ""
+
     # The name of the new chat.
     new_chat_name: str = ""
 
-    def create_chat(self):
+    # The ingestion job of the submitted documents, its status, the number of
+    # chunks and how many of them are already in the graph.
+    ingestion_job_id: str = ""
+    ingestion_status: str = ""
+    ingestion_total: int = 0
+    ingestion_written: int = 0
+
+    # Whether the submitted documents are still queued or being ingested.
+    ingesting: bool = False
+
+    async def load_chats(self):
+        """Load the chats of this browser from the chat store."""
+        if not self.client_id:
+            self.client_id = uuid.uuid4().hex
+        store = get_chat_store()
+        chat_titles = await asyncio.to_thread(store.list_chats, self.client_id)
+        if not chat_titles:
+            for chat_name in DEFAULT_CHATS:
+                await asyncio.to_thread(store.create_chat, self.client_id, chat_name)
+            chat_titles = await asyncio.to_thread(store.list_chats, self.client_id)
+        self.chat_titles = chat_titles
+        if self.current_chat in chat_titles:
+            await self.set_chat(self.current_chat)
+        else:
+            await self.set_chat(chat_titles[0])
+
+    async def create_chat(self):
         """Create a new chat."""
         # Add the new chat to the list of chats.
-        self.current_chat = self.new_chat_name
-        self.chats[self.new_chat_name] = []
+        store = get_chat_store()
+        await asyncio.to_thread(store.create_chat, self.client_id, self.new_chat_name)
+        self.chat_titles = await asyncio.to_thread(store.list_chats, self.client_id)
+        await self.set_chat(self.new_chat_name)
 
-    def delete_chat(self):
+    async def delete_chat(self):
         """Delete the current chat."""
-        del self.chats[self.current_chat]
-        if len(self.chats) == 0:
-            self.chats = DEFAULT_CHATS
-        self.current_chat = list(self.chats.keys())[0]
+        store = get_chat_store()
+        await asyncio.to_thread(store.delete_chat, self.client_id, self.current_chat)
+        # Creates the default chats again when the last one is deleted.
+        await self.load_chats()
 
-    def set_chat(self, chat_name: str):
-        """Set the name of the current chat.
+    async def set_chat(self, chat_name: str):
+        """Set the name of the current chat and load its latest messages.
 
         Args:
             chat_name: The name of the chat.
         """
         self.current_chat = chat_name
-
-    @rx.var
-    def chat_titles(self) -> list[str]:
-        """Get the list of chat titles.
-
-        Returns:
-            The list of chat names.
-        """
-        return list(self.chats.keys())
+        self.messages = []
+        self._oldest_message_id = None
+        await self.load_older_messages()
+
+    async def load_older_messages(self):
+        """Load the previous page of messages of the current chat."""
+        page = await asyncio.to_thread(
+            get_chat_store().load_messages,
+            self.client_id,
+            self.current_chat,
+            limit=HISTORY_PAGE_SIZE + 1,
+            before_id=self._oldest_message_id,
+        )
+        self.has_older_messages = len(page) > HISTORY_PAGE_SIZE
+        page = page[-HISTORY_PAGE_SIZE:]
+        if page:
+            self._oldest_message_id = page[0].id
+        self.messages = [
+            QA(question=qa.question, answer=qa.answer) for qa in page
+        ] + self.messages
 
     async def process_question(self, form_data: dict[str, str]):
         # Get the question from the form
@@ -95,81 +156,129 @@ class State(rx.State):
             form_data: A dict with the current question.
         """
 
-        # Add the question to the list of questions.
-        qa = QA(question=question, answer="")
-        self.chats[self.current_chat].append(qa)
-
-        # Clear the input and start the processing.
-        self.processing = True
-        yield
-
-        # Build the messages.
-        messages = []
-        for qa in self.chats[self.current_chat][:-1]:
-            messages.append({"role": "user", "content": qa.question})
-            messages.append({"role": "assistant", "content": qa.answer})
+        trace = start_trace()
+        try:
+            chat_name = self.current_chat
 
-        config_state = await self.get_state(ConfigState)
-        llm = await self.get_llm()
-        api = LangChainAPI(llm=llm)
-
-        answers = api.aquestion(
-            system_content=config_state.content,
-            messages=messages,
-            question=question,
-        )
+            # Show the question while the answer is streamed.
+            self.streaming_question = question
+            self.streaming_answer = ""
 
-        # Stream the results, yielding after every word.
-        async for answer_text in answers:
-            # Ensure answer_text is not None before concatenation
-            if answer_text is not None:
-                self.chats[self.current_chat][-1].answer += answer_text
-            else:
-                # Handle the case where answer_text is None, perhaps log it or assign a default value
-                # For example, assigning an empty string if answer_text is None
-                answer_text = ""
-                self.chats[self.current_chat][-1].answer += answer_text
-            self.chats = self.chats
+            # Clear the input and start the processing.
+            self.processing = True
             yield
 
-        # Toggle the processing flag.
-        self.processing = False
+            # Build the messages: a summary of older turns and the latest ones.
+            config_state = await self.get_state(ConfigState)
+            history = get_history_manager()
+            with trace.stage("history"):
+                messages = await asyncio.to_thread(
+                    history.build_messages,
+                    self.client_id,
+                    chat_name,
+                    config_state.model,
+                )
+
+            with trace.stage("get_llm"):
+                llm = await self.get_llm()
+            with trace.stage("api_init"):
+                api = LangChainAPI(
+                    llm=llm,
+                    entity_extractor=config_state.entity_extractor,
+                    context_token_budget=config_state.context_token_budget,
+                )
+
+            answers = api.aquestion(
+                system_content=config_state.content,
+                messages=messages,
+                question=question,
+                use_semantic_cache=config_state.semantic_cache,
+            )
+
+            async def traced_answers():
+                async for answer_text in answers:
+                    if answer_text:
+                        trace.mark("first_token")
+                        trace.count("answer_chunks", 1)
+                        yield answer_text
+
+            # Stream the results. Tokens are buffered and only `streaming_answer`
+            # is updated, so each delta carries a few tokens, not the chat.
+            async for answer_text in coalesce(traced_answers()):
+                self.streaming_answer += answer_text
+                yield
+
+            trace.mark("last_token")
+            answer = self.streaming_answer
+            trace.count("answer_chars", len(answer))
+            # The answer is written to the chat store once, when it is complete.
+            if chat_name in self.chat_titles:
+                await asyncio.to_thread(
+                    get_chat_store().append, self.client_id, chat_name, question, answer
+                )
+                schedule_summary_update(history, self.client_id, chat_name, llm)
+            if chat_name == self.current_chat:
+                self.messages.append(QA(question=question, answer=answer))
+            self.streaming_question = ""
+            self.streaming_answer = ""
+
+            # Toggle the processing flag.
+            self.processing = False
+        finally:
+            trace.finish()
 
     async def process_documents(self, form_data):
+        """Queue the documents for ingestion and follow the job's progress."""
         text: str = form_data["documents"]
         if text == "":
             return
-        self.processing = True
-        yield
-
-        await self.node4j_processing(text)
-
-        self.processing = False
-
-    async def node4j_processing(self, text: str):
-        text_splitter = TokenTextSplitter(chunk_size=512, chunk_overlap=125)
-        documents = text_splitter.create_documents([text])
-
-        llm = await self.get_llm()
-        llm_transformer = LLMGraphTransformer(llm=llm)
-        graph_documents = await llm_transformer.aconvert_to_graph_documents(
-            documents=documents
-        )
-        graph = Neo4jGraph()
-        graph.add_graph_documents(
-            graph_documents=graph_documents,
-            baseEntityLabel=True,
-            include_source=True,
+        config_state = await self.get_state(ConfigState)
+        job = await get_ingestion_queue().submit(
+            owner=self.client_id,
+            text=text,
+            model=config_state.model,
+            temperature=config_state.temperature,
+            seed=config_state.seed,
+            top_p=config_state.top_p,
         )
-        print(graph_documents)
-        print("完了")
+        self.ingestion_job_id = job.id
+        self.ingestion_status = job.status
+        self.ingestion_total = 0
+        self.ingestion_written = 0
+        self.ingesting = True
+        return State.poll_ingestion
+
+    async def cancel_ingestion(self):
+        await get_ingestion_queue().cancel(self.ingestion_job_id)
+
+    async def retry_ingestion(self):
+        await get_ingestion_queue().retry(self.ingestion_job_id)
+        self.ingesting = True
+        return State.poll_ingestion
+
+    @rx.background
+    async def poll_ingestion(self):
+        """Mirror the job's progress until it finishes, without holding the state."""
+        while True:
+            async with self:
+                job = get_ingestion_queue().get(self.ingestion_job_id)
+                if job is None:
+                    self.ingesting = False
+                    return
+                self.ingestion_status = job.status
+                self.ingestion_total = job.total
+                self.ingestion_written = job.written
+                self.ingesting = not job.finished
+                if job.finished:
+                    return
+            await asyncio.sleep(INGESTION_POLL_INTERVAL)
 
     async def get_llm(self):
         config_state: ConfigState = await self.get_state(ConfigState)
 
-        return ChatOpenAI(
+        return get_chat_model(
+            model=config_state.model,
             temperature=config_state.temperature,
-            model_name=config_state.model,
             seed=config_state.seed,
             top_p=config_state.top_p,
         )
@@ -0,0 +1,55 @@
+import asyncio
+import time
+from typing import AsyncIterable, AsyncIterator
+
+# Streamed tokens are sent to the client at most every STREAM_FLUSH_INTERVAL
+# seconds, or earlier once STREAM_FLUSH_CHARS characters are buffered.
+STREAM_FLUSH_INTERVAL = 0.05
+STREAM_FLUSH_CHARS = 64
+
+
+async def coalesce(
+    chunks: AsyncIterable[str],
+    interval: float = STREAM_FLUSH_INTERVAL,
+    max_chars: int = STREAM_FLUSH_CHARS,
+) -> AsyncIterator[str]:
+    """
+    Join the streamed chunks into fewer, larger ones. Buffered text is yielded
+    once `max_chars` are buffered or `interval` seconds after the last yield,
+    also while the stream is waiting for its next chunk.
+    """
+    iterator = aiter(chunks)
+    buffer: list[str] = []
+    buffered_chars = 0
+    last_flush = time.monotonic()
+    # The pending read outlives a timed out wait, so no chunk is lost.
+    next_chunk = asyncio.ensure_future(anext(iterator))
+    try:
+        while True:
+            timeout = None
+            if buffer:
+                timeout = max(0.0, last_flush + interval - time.monotonic())
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if done:
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    break
+                next_chunk = asyncio.ensure_future(anext(iterator))
+                if not chunk:
+                    continue
+                buffer.append(chunk)
+                buffered_chars += len(chunk)
+                if (
+                    buffered_chars < max_chars
+                    and time.monotonic() - last_flush < interval
+                ):
+                    continue
+            yield "".join(buffer)
+            buffer.clear()
+            buffered_chars = 0
+            last_flush = time.monotonic()
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        next_chunk.cancel()
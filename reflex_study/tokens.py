@@ -0,0 +1,24 @@
+import warnings
+from functools import lru_cache
+
+import tiktoken
+
+
+@lru_cache(maxsize=16)
+def get_encoding(model: str) -> tiktoken.Encoding | None:
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # tiktoken downloads the encodings on first use.
+        warnings.warn(f"Failed to load the tokenizer for {model}: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    if encoding := get_encoding(model):
+        return len(encoding.encode(text, disallowed_special=()))
+    # Roughly 4 characters per token for English text.
+    return len(text) // 4 + 1
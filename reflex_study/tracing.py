@@ -0,0 +1,190 @@
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Iterator
+
+# Tracing is off unless QA_TRACING is set; then every answered question
+# records its stage timings and logs one JSON line.
+TRACING_ENABLED = os.environ.get("QA_TRACING", "").lower() in ("1", "true")
+# Latest samples per stage the percentiles are computed over.
+TRACE_HISTOGRAM_WINDOW = int(os.environ.get("TRACE_HISTOGRAM_WINDOW", "1024"))
+
+logger = logging.getLogger(__name__)
+if TRACING_ENABLED and not logger.handlers:
+    # The app does not configure logging; the trace lines go to stderr as is.
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class RollingHistogram:
+    """Percentiles over the latest `window` samples."""
+
+    def __init__(self, window: int = TRACE_HISTOGRAM_WINDOW):
+        self.count = 0
+        self._lock = threading.Lock()
+        self._samples: deque[float] = deque(maxlen=window)
+
+    def add(self, value: float):
+        with self._lock:
+            self.count += 1
+            self._samples.append(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return {"count": count}
+
+        def percentile(p: float) -> float:
+            return samples[min(len(samples) - 1, int(p * len(samples)))]
+
+        return {
+            "count": count,
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": samples[-1],
+        }
+
+
+class HistogramSet:
+    """Histograms created on first use, keyed by stage or counter name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[str, RollingHistogram] = {}
+
+    def add(self, name: str, value: float):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, RollingHistogram())
+        histogram.add(value)
+
+    def snapshot(self) -> dict[str, dict]:
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+
+# Stage durations in seconds, and sizes (tokens, characters, rows).
+STAGE_HISTOGRAMS = HistogramSet()
+COUNT_HISTOGRAMS = HistogramSet()
+
+
+class QuestionTrace:
+    """
+    Timings and sizes of one answered question.
+
+    A stage entered several times (e.g. one neighborhood query per entity)
+    adds up. `mark` records the time since the question started, for points
+    like the first streamed token.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.counts: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = (
+                self.stages.get(name, 0.0) + time.perf_counter() - started
+            )
+
+    def mark(self, name: str):
+        if name not in self.stages:
+            self.stages[name] = time.perf_counter() - self.started
+
+    def count(self, name: str, value: float):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def finish(self):
+        _current.set(NULL_TRACE)
+        self.stages["total"] = time.perf_counter() - self.started
+        # OpenAI streams about one token per chunk.
+        streaming = self.stages.get("last_token", 0) - self.stages.get("first_token", 0)
+        if streaming > 0 and self.counts.get("answer_chunks"):
+            self.counts["tokens_per_second"] = self.counts["answer_chunks"] / streaming
+        for name, value in self.stages.items():
+            STAGE_HISTOGRAMS.add(name, value)
+        for name, value in self.counts.items():
+            COUNT_HISTOGRAMS.add(name, value)
+        logger.info(
+            json.dumps(
+                {
+                    "event": "qa_trace",
+                    "trace_id": self.id,
+                    "stages": {
+                        name: round(value, 6) for name, value in self.stages.items()
+                    },
+                    "counts": self.counts,
+                }
+            )
+        )
+
+
+class _NullTrace:
+    """Stands in for the trace when tracing is disabled; every call is a no-op."""
+
+    id = ""
+    _stage = contextlib.nullcontext()
+
+    def stage(self, name: str) -> contextlib.nullcontext:
+        return self._stage
+
+    def mark(self, name: str):
+        pass
+
+    def count(self, name: str, value: float):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+_current: contextvars.ContextVar[QuestionTrace | _NullTrace] = (
+    contextvars.ContextVar("qa_trace", default=NULL_TRACE)
+)
+
+
+def start_trace() -> QuestionTrace | _NullTrace:
+    """
+    Start tracing a question. Tasks created afterwards in the same context
+    (e.g. the concurrent retrievals) record into the same trace.
+    """
+    if not TRACING_ENABLED:
+        return NULL_TRACE
+    trace = QuestionTrace()
+    _current.set(trace)
+    return trace
+
+
+def current_trace() -> QuestionTrace | _NullTrace:
+    return _current.get()
+
+
+def qa_metrics() -> dict:
+    """Percentiles of the stage durations (seconds) and sizes per question."""
+    return {
+        "enabled": TRACING_ENABLED,
+        "stages": STAGE_HISTOGRAMS.snapshot(),
+        "counts": COUNT_HISTOGRAMS.snapshot(),
+    }
@@ -0,0 +1,268 @@
+import json
+import math
+import os
+import threading
+import warnings
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Protocol
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from reflex_study.gazetteer import tokenize
+
+NEO4J_VECTOR_BACKEND = "neo4j"
+NUMPY_VECTOR_BACKEND = "numpy"
+VECTOR_BACKEND_CHOICES = [NEO4J_VECTOR_BACKEND, NUMPY_VECTOR_BACKEND]
+
+VECTOR_STORE_PATH = Path(os.getcwd()) / os.environ.get(
+    "VECTOR_STORE_PATH", ".vector_store"
+)
+DEFAULT_K = 4
+INITIAL_CAPACITY = 1024
+
+
+class VectorIndex(Protocol):
+    """The part of Neo4jVector the retrieval relies on."""
+
+    def similarity_search_with_score(
+        self, query: str, k: int = DEFAULT_K
+    ) -> list[tuple[Document, float]]: ...
+
+
+class BM25Index:
+    """Okapi BM25 over the chunk texts, for the keyword half of hybrid search."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # token -> row -> term frequency
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._lengths: list[int] = []
+        self._total_length = 0
+
+    def add(self, row: int, text: str):
+        tokens = tokenize(text)
+        for token, count in Counter(tokens).items():
+            self._postings[token][row] = count
+        while len(self._lengths) <= row:
+            self._lengths.append(0)
+        self._lengths[row] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove(self, row: int, text: str):
+        """Forget the terms of the text added for the row."""
+        for token in set(tokenize(text)):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(row, None)
+                if not postings:
+                    del self._postings[token]
+        self._total_length -= self._lengths[row]
+        self._lengths[row] = 0
+
+    def search(self, query: str) -> dict[int, float]:
+        documents = len(self._lengths)
+        if not documents:
+            return {}
+        average_length = self._total_length / documents or 1.0
+        scores: dict[int, float] = defaultdict(float)
+        for token in set(tokenize(query)):
+            postings = self._postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(
+                1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5)
+            )
+            for row, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self._lengths[row] / average_length
+                scores[row] += (
+                    idf
+                    * frequency
+                    * (self.k1 + 1)
+                    / (frequency + self.k1 * length_norm)
+                )
+        return scores
+
+
+class NumpyVectorStore:
+    """
+    In-process hybrid search over the chunk embeddings.
+
+    Normalized embeddings are rows of one contiguous float32 matrix (memory
+    mapped when loaded from disk), so a search is a matrix product followed by
+    `argpartition`. Like Neo4jVector's hybrid search, vector and BM25 scores
+    are each scaled to [0, 1] and a chunk keeps the better of the two.
+
+    The snapshot records the embedding model; one saved with another model
+    is ignored on load, and vectors of another width than the stored ones
+    are rejected.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        path: Path | None = None,
+        model: str | None = None,
+    ):
+        self.embeddings = embeddings
+        self.path = path
+        self.model = model
+        self._lock = threading.Lock()
+        self._matrix: np.ndarray | None = None
+        self._size = 0
+        self._ids: list[str] = []
+        self._texts: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._keywords = BM25Index()
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _check_width(self, dimensions: int):
+        if self._size and self._matrix.shape[1] != dimensions:
+            raise ValueError(
+                f"Vectors of {dimensions} dimensions do not match the "
+                f"{self._matrix.shape[1]} of the vector store; it was built with "
+                f"another embedding model. Delete {self.path} to rebuild it."
+            )
+
+    def add(self, ids: list[str], texts: list[str], vectors: list[list[float]]):
+        """Add or replace chunks by id."""
+        if not ids:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+        with self._lock:
+            self._check_width(vectors.shape[1])
+            self._reserve(len(ids), vectors.shape[1])
+            for chunk_id, text, vector in zip(ids, texts, vectors):
+                row = self._rows.get(chunk_id)
+                if row is None:
+                    row = self._size
+                    self._size += 1
+                    self._rows[chunk_id] = row
+                    self._ids.append(chunk_id)
+                    self._texts.append(text)
+                    self._keywords.add(row, text)
+                else:
+                    self._keywords.remove(row, self._texts[row])
+                    self._keywords.add(row, text)
+                    self._texts[row] = text
+                self._matrix[row] = vector
+            self._dirty = True
+
+    def _reserve(self, rows: int, dimensions: int):
+        if (
+            self._matrix is not None
+            and self._matrix.flags.writeable
+            and self._matrix.shape[1] == dimensions
+            and self._size + rows <= len(self._matrix)
+        ):
+            return
+        capacity = max(INITIAL_CAPACITY, self._size + rows)
+        if self._matrix is not None and self._size:
+            capacity = max(capacity, 2 * len(self._matrix))
+        matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        if self._size:
+            matrix[: self._size] = self._matrix[: self._size]
+        self._matrix = matrix
+
+    def search_many(
+        self, vectors: np.ndarray, keyword_queries: list[str], k: int = DEFAULT_K
+    ) -> list[list[tuple[int, float]]]:
+        """Top-k rows for a batch of queries with one matrix product."""
+        with self._lock:
+            size = self._size
+            if not size:
+                return [[] for _ in keyword_queries]
+            self._check_width(vectors.shape[1])
+            matrix = self._matrix[:size]
+            # Same scale as Neo4j's cosine score.
+            similarities = (matrix @ vectors.T).T
+            similarities = (similarities + 1) / 2
+            keyword_scores = [self._keywords.search(query) for query in keyword_queries]
+
+        results = []
+        for vector_scores, keywords in zip(similarities, keyword_scores):
+            scores = vector_scores / max(float(vector_scores.max()), 1e-9)
+            if keywords:
+                best_keyword = max(keywords.values())
+                for row, score in keywords.items():
+                    scores[row] = max(scores[row], score / best_keyword)
+            top = min(k, size)
+            rows = np.argpartition(-scores, top - 1)[:top]
+            rows = rows[np.argsort(-scores[rows])]
+            results.append([(int(row), float(scores[row])) for row in rows])
+        return results
+
+    def similarity_search_with_score(
+        self, query: str, k: int = DEFAULT_K
+    ) -> list[tuple[Document, float]]:
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        [hits] = self.search_many(vector[None, :], [query], k)
+        results = []
+        for row, score in hits:
+            document = Document(
+                page_content=self._texts[row], metadata={"id": self._ids[row]}
+            )
+            results.append((document, score))
+        return results
+
+    def save(self):
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            matrix = np.array(self._matrix[: self._size])
+            metadata = {
+                "model": self.model,
+                "ids": list(self._ids),
+                "texts": list(self._texts),
+            }
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        matrix_path = self.path.with_suffix(".npy")
+        metadata_path = self.path.with_suffix(".json")
+        tmp_matrix_path = matrix_path.with_suffix(".tmp.npy")
+        np.save(tmp_matrix_path, matrix)
+        with metadata_path.with_suffix(".tmp").open("w") as file:
+            json.dump(metadata, file, ensure_ascii=False)
+        os.replace(tmp_matrix_path, matrix_path)
+        os.replace(metadata_path.with_suffix(".tmp"), metadata_path)
+
+    def load(self):
+        if self.path is None:
+            return
+        matrix_path = self.path.with_suffix(".npy")
+        metadata_path = self.path.with_suffix(".json")
+        if not matrix_path.exists() or not metadata_path.exists():
+            return
+        # Only read until something is added, so map the file instead of loading it.
+        matrix = np.load(matrix_path, mmap_mode="r")
+        with metadata_path.open("r") as file:
+            metadata = json.load(file)
+        saved_model = metadata.get("model")
+        if saved_model and self.model and saved_model != self.model:
+            warnings.warn(
+                f"Ignoring {matrix_path}: it was embedded with {saved_model}, "
+                f"not {self.model}. The vector store starts empty."
+            )
+            return
+        with self._lock:
+            self._matrix = matrix
+            self._size = len(metadata["ids"])
+            self._ids = metadata["ids"]
+            self._texts = metadata["texts"]
+            self._rows = {chunk_id: row for row, chunk_id in enumerate(self._ids)}
+            self._keywords = BM25Index()
+            for row, text in enumerate(self._texts):
+                self._keywords.add(row, text)
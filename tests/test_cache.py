@@ -0,0 +1,59 @@
+import pytest
+
+from reflex_study import cache
+from reflex_study.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_and_set(clock):
+    ttl_cache = TTLCache("test")
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.get("a", 0) == 0
+    ttl_cache.set("a", 1)
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.stats() == {"size": 1, "maxsize": 1024, "hits": 1, "misses": 2}
+
+
+def test_entries_expire(clock):
+    ttl_cache = TTLCache("test", ttl=10)
+    ttl_cache.set("a", 1)
+    clock[0] += 9.9
+    assert ttl_cache.get("a") == 1
+    clock[0] += 0.1
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.stats()["size"] == 0
+
+
+def test_set_renews_the_ttl(clock):
+    ttl_cache = TTLCache("test", ttl=10)
+    ttl_cache.set("a", 1)
+    clock[0] += 5
+    ttl_cache.set("a", 2)
+    clock[0] += 9
+    assert ttl_cache.get("a") == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    ttl_cache = TTLCache("test", maxsize=2)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used.
+    assert ttl_cache.get("a") == 1
+    ttl_cache.set("c", 3)
+    assert ttl_cache.get("b") is None
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.get("c") == 3
+
+
+def test_generation_bump_clears_registered_caches():
+    registered = cache.register_cache("test_generation_bump")
+    registered.set("a", 1)
+    generation = cache.knowledge_generation()
+    assert cache.bump_knowledge_generation() == generation + 1
+    assert registered.get("a") is None
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+import pytest
+
+from reflex_study import chat_store
+from reflex_study.chat_store import ChatStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    chats = ChatStore(tmp_path / "chats.sqlite3")
+    yield chats
+    chats.close()
+
+
+def fill(store: ChatStore, name: str, count: int) -> list[int]:
+    return [store.append("owner", name, f"q{i}", f"a{i}") for i in range(count)]
+
+
+def test_chats_are_listed_per_owner(store):
+    store.create_chat("owner", "first")
+    store.create_chat("owner", "second")
+    store.create_chat("other", "third")
+    assert store.list_chats("owner") == ["first", "second"]
+    store.delete_chat("owner", "first")
+    assert store.list_chats("owner") == ["second"]
+
+
+def test_append_creates_the_chat(store):
+    fill(store, "chat", 1)
+    assert store.list_chats("owner") == ["chat"]
+    assert [qa.question for qa in store.load_messages("owner", "chat")] == ["q0"]
+
+
+def test_messages_are_paged_from_the_latest(store):
+    ids = fill(store, "chat", 10)
+    page = store.load_messages("owner", "chat", limit=4)
+    assert [qa.question for qa in page] == ["q6", "q7", "q8", "q9"]
+    older = store.load_messages("owner", "chat", limit=4, before_id=page[0].id)
+    assert [qa.question for qa in older] == ["q2", "q3", "q4", "q5"]
+    oldest = store.load_messages("owner", "chat", limit=4, before_id=older[0].id)
+    assert [qa.question for qa in oldest] == ["q0", "q1"]
+    assert store.load_messages("owner", "chat", limit=4, before_id=ids[0]) == []
+    assert len(store.load_messages("owner", "chat", limit=None)) == 10
+
+
+def test_messages_after_an_id(store):
+    ids = fill(store, "chat", 5)
+    newer = store.load_messages("owner", "chat", limit=None, after_id=ids[1])
+    assert [qa.question for qa in newer] == ["q2", "q3", "q4"]
+
+
+def test_recreated_chat_starts_empty(store):
+    fill(store, "chat", 3)
+    store.set_summary("owner", "chat", "summary", 1)
+    store.create_chat("owner", "chat")
+    assert store.load_messages("owner", "chat") == []
+    assert store.get_summary("owner", "chat") == ("", None)
+
+
+def test_summary(store):
+    ids = fill(store, "chat", 2)
+    store.set_summary("owner", "chat", "first", ids[0])
+    store.set_summary("owner", "chat", "second", ids[1])
+    assert store.get_summary("owner", "chat") == ("second", ids[1])
+
+
+def count(store: ChatStore, table: str) -> int:
+    return store._fetchall(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+
+def test_compact_removes_only_deleted_chats(store, monkeypatch):
+    # Several batches, the last one partial.
+    monkeypatch.setattr(chat_store, "COMPACTION_BATCH_SIZE", 7)
+    fill(store, "deleted", 30)
+    store.set_summary("owner", "deleted", "summary", 1)
+    fill(store, "kept", 20)
+    store.set_summary("owner", "kept", "summary", 1)
+    store.delete_chat("owner", "deleted")
+    store.compact()
+    assert count(store, "chats") == 1
+    assert count(store, "messages") == 20
+    assert count(store, "summaries") == 1
+    assert len(store.load_messages("owner", "kept", limit=None)) == 20
+    # Compacting again is a no-op.
+    store.compact()
+    assert count(store, "messages") == 20
+
+
+def test_compaction_keeps_running_after_a_failure(monkeypatch, caplog):
+    calls = []
+
+    class Store:
+        def compact(self):
+            calls.append(None)
+            if len(calls) == 1:
+                raise OSError("disk I/O error")
+
+    monkeypatch.setattr(chat_store, "COMPACTION_INTERVAL", 0)
+    monkeypatch.setattr(chat_store, "get_chat_store", lambda: Store())
+
+    async def run():
+        task = asyncio.create_task(chat_store._compact_periodically())
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        task.cancel()
+
+    with caplog.at_level(logging.ERROR, logger=chat_store.__name__):
+        asyncio.run(run())
+    assert "disk I/O error" in caplog.text
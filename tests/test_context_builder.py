@@ -0,0 +1,105 @@
+import pytest
+
+from reflex_study import context_builder
+from reflex_study.context_builder import (
+    DOCUMENT_SEPARATOR,
+    STRUCTURED_HEADER,
+    UNSTRUCTURED_HEADER,
+    ContextBuilder,
+)
+
+
+@pytest.fixture(autouse=True)
+def count_words(monkeypatch):
+    # One token per word keeps the budgets readable and needs no tokenizer.
+    monkeypatch.setattr(
+        context_builder, "count_tokens", lambda text, model: len(text.split())
+    )
+
+
+def triple(source: str, target: str, score: float) -> dict:
+    return {"source": source, "type": "KNOWS", "target": target, "score": score}
+
+
+def chunk(text: str, score: float) -> dict:
+    return {"text": text, "score": score}
+
+
+HEADER_TOKENS = len((STRUCTURED_HEADER + UNSTRUCTURED_HEADER).split())
+# "a - KNOWS -> b" and a newline.
+TRIPLE_TOKENS = 6
+
+
+def test_rank_normalizes_triples_and_deduplicates():
+    builder = ContextBuilder("model")
+    ranked = builder.rank(
+        [triple("a", "b", 4.0), triple("a", "c", 2.0), triple("a", "b", 1.0)],
+        [chunk("some  text\n", 0.8), chunk("some text", 0.3)],
+    )
+    assert [(c.text, c.score) for c in ranked] == [
+        ("a - KNOWS -> b", 1.0),
+        ("some text", 0.8),
+        ("a - KNOWS -> c", 0.5),
+    ]
+
+
+def test_rank_interleaves_triples_and_chunks():
+    builder = ContextBuilder("model")
+    ranked = builder.rank(
+        [triple("a", str(i), 10.0 - i) for i in range(3)],
+        [chunk("first", 0.4), chunk("second", 0.2)],
+    )
+    assert [c.text for c in ranked] == [
+        "a - KNOWS -> 0",
+        "first",
+        "a - KNOWS -> 1",
+        "second",
+        "a - KNOWS -> 2",
+    ]
+
+
+def test_build_keeps_chunks_when_triples_exceed_the_budget():
+    builder = ContextBuilder("model", token_budget=100)
+    context = builder.build(
+        [triple("a", str(i), 1.0) for i in range(400)],
+        [chunk("best chunk", 0.3), chunk("other chunk", 0.2)],
+    )
+    assert context.count(DOCUMENT_SEPARATOR) == 2
+    assert "a - KNOWS -> 0" in context
+    assert builder.tokens <= builder.token_budget
+
+
+def test_build_fits_everything_within_the_budget():
+    builder = ContextBuilder("model", token_budget=100)
+    context = builder.build([triple("a", "b", 1.0)], [chunk("one two", 0.5)])
+    assert context == (
+        STRUCTURED_HEADER
+        + "a - KNOWS -> b"
+        + UNSTRUCTURED_HEADER
+        + DOCUMENT_SEPARATOR
+        + "one two"
+    )
+    # Every item is counted with the newline joining it to the next.
+    assert builder.tokens == len(context.split()) + 2
+
+
+def test_build_drops_the_lowest_ranked_items_over_budget():
+    # Room for the triple and the best chunk only.
+    builder = ContextBuilder("model", token_budget=HEADER_TOKENS + TRIPLE_TOKENS + 4)
+    context = builder.build(
+        [triple("a", "b", 1.0)], [chunk("best chunk", 0.9), chunk("worst one", 0.1)]
+    )
+    assert "best chunk" in context
+    assert "worst one" not in context
+    assert builder.tokens == builder.token_budget
+
+
+def test_build_skips_an_item_too_large_but_keeps_smaller_ones():
+    builder = ContextBuilder("model", token_budget=HEADER_TOKENS + TRIPLE_TOKENS - 1)
+    context = builder.build(
+        [triple("a", "b", 1.0)],
+        [chunk("a very long chunk that cannot fit", 0.9), chunk("small", 0.1)],
+    )
+    assert "a - KNOWS -> b" not in context
+    assert "long chunk" not in context
+    assert DOCUMENT_SEPARATOR + "small" in context
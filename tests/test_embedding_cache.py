@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from reflex_study import embedding_cache
+from reflex_study.embedding_cache import CachedEmbedder, EmbeddingCache, embedding_key
+
+
+class CountingEmbeddings(Embeddings):
+    """Two-dimensional vectors from the text length, requests recorded."""
+
+    def __init__(self):
+        self.requests: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.requests.append(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def test_get_and_add(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings")
+    assert cache.get_many(["a"]) == [None]
+    cache.add_many(["a", "b"], [[1.0, 2.0], [3.0, 4.0]])
+    a, missing, b = cache.get_many(["a", "c", "b"])
+    assert missing is None
+    assert a.tolist() == [1.0, 2.0]
+    assert b.tolist() == [3.0, 4.0]
+    assert cache.stats()["size"] == 2
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (2, 2)
+
+
+def test_existing_keys_are_not_added_again(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings")
+    cache.add_many(["a"], [[1.0, 2.0]])
+    cache.add_many(["a", "b"], [[9.0, 9.0], [3.0, 4.0]])
+    assert cache.stats()["size"] == 2
+    assert cache.get_many(["a"])[0].tolist() == [1.0, 2.0]
+
+
+def test_matrix_grows_and_reloads(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "INITIAL_CAPACITY", 2)
+    cache = EmbeddingCache(tmp_path / "embeddings")
+    for i in range(5):
+        cache.add_many([str(i)], [[float(i), 0.0]])
+    assert cache.stats()["maxsize"] == 8
+
+    loaded = EmbeddingCache(tmp_path / "embeddings")
+    loaded.load()
+    vectors = loaded.get_many([str(i) for i in range(5)])
+    assert [vector[0] for vector in vectors] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_unflushed_rows_are_ignored_on_load(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings")
+    cache.add_many(["a"], [[1.0, 2.0]])
+    # A vector written without its key, as after a crash mid-write.
+    matrix = np.load(tmp_path / "embeddings.npy", mmap_mode="r+")
+    matrix[1] = [5.0, 6.0]
+    matrix.flush()
+    loaded = EmbeddingCache(tmp_path / "embeddings")
+    loaded.load()
+    assert loaded.stats()["size"] == 1
+    assert loaded.get_many(["b"]) == [None]
+
+
+def test_a_new_width_starts_the_cache_over(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings")
+    cache.add_many(["a"], [[1.0, 2.0]])
+    with pytest.warns(UserWarning, match="2 dimensions, not 3"):
+        cache.add_many(["b"], [[1.0, 2.0, 3.0]])
+    loaded = EmbeddingCache(tmp_path / "embeddings")
+    loaded.load()
+    assert loaded.get_many(["a"]) == [None]
+    assert loaded.get_many(["b"])[0].tolist() == [1.0, 2.0, 3.0]
+
+
+def test_each_model_has_its_own_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "EMBEDDING_CACHE_PATH", tmp_path / "cache")
+    embedding_cache.get_embedding_cache.cache_clear()
+    try:
+        small = embedding_cache.get_embedding_cache("text-embedding-3-small")
+        small.add_many(["a"], [[1.0, 2.0]])
+        assert (tmp_path / "cache-text-embedding-3-small.npy").exists()
+        assert embedding_cache.get_embedding_cache("other/model") is not small
+        assert not (tmp_path / "cache-other_model.npy").exists()
+    finally:
+        embedding_cache.get_embedding_cache.cache_clear()
+
+
+def test_writers_sharing_the_files_never_reuse_a_row(tmp_path, monkeypatch):
+    # Stands in for the app and ingest_cli: each has its own view of the files.
+    monkeypatch.setattr(embedding_cache, "INITIAL_CAPACITY", 2)
+    app = EmbeddingCache(tmp_path / "embeddings")
+    cli = EmbeddingCache(tmp_path / "embeddings")
+    app.add_many(["a"], [[1.0, 1.0]])
+    cli.add_many(["b", "c"], [[2.0, 2.0], [3.0, 3.0]])
+    # The CLI grew the matrix; the app catches up before writing.
+    app.add_many(["d", "a"], [[4.0, 4.0], [9.0, 9.0]])
+    assert app.stats()["size"] == 4
+
+    loaded = EmbeddingCache(tmp_path / "embeddings")
+    loaded.load()
+    vectors = loaded.get_many(["a", "b", "c", "d"])
+    assert [vector[0] for vector in vectors] == [1.0, 2.0, 3.0, 4.0]
+
+
+def test_a_torn_key_is_overwritten_by_the_next_add(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings")
+    cache.add_many(["a"], [[1.0, 2.0]])
+    with (tmp_path / "embeddings.keys").open("a") as file:
+        file.write("tor")
+    other = EmbeddingCache(tmp_path / "embeddings")
+    other.load()
+    other.add_many(["b"], [[3.0, 4.0]])
+    assert (tmp_path / "embeddings.keys").read_text().splitlines()[1] == "b"
+
+
+def test_cached_embedder_only_embeds_missing_texts_in_batches(tmp_path):
+    embeddings = CountingEmbeddings()
+    cache = EmbeddingCache(tmp_path / "embeddings")
+    cache.add_many([embedding_key("model", "bb")], [[7.0, 7.0]])
+    embedder = CachedEmbedder(embeddings, "model", cache, batch_size=2)
+    vectors = embedder.embed(["a", "bb", "ccc", "dddd"])
+    assert vectors == [[1.0, 1.0], [7.0, 7.0], [3.0, 1.0], [4.0, 1.0]]
+    assert embeddings.requests == [["a", "ccc"], ["dddd"]]
+    assert embedder.embed(["ccc"]) == [[3.0, 1.0]]
+    assert len(embeddings.requests) == 2
+
+
+def test_keys_depend_on_the_model():
+    assert embedding_key("model", "text") != embedding_key("other", "text")
@@ -0,0 +1,45 @@
+import asyncio
+
+import numpy as np
+from pydantic.v1 import BaseModel
+
+from reflex_study.fakes import FakeChatModel, FakeEmbeddings, fake_entities
+
+
+class Entities(BaseModel):
+    names: list[str]
+
+
+def model() -> FakeChatModel:
+    return FakeChatModel(latency=0, tokens_per_second=1e9, answer_tokens=5)
+
+
+def test_entities_are_capitalized_runs_after_the_input_marker():
+    text = "Ignore Me. Extract from the following input: Who hired Acme Corp and Ada?"
+    assert fake_entities(text) == ["Acme Corp", "Ada"]
+
+
+def test_embeddings_are_deterministic_and_share_words():
+    embeddings = FakeEmbeddings(dimensions=64)
+    curie, curie_again, bohr = embeddings.embed_documents(
+        ["Marie Curie in Paris", "Marie Curie in Paris", "Niels Bohr"]
+    )
+    assert curie == curie_again
+    similar = np.dot(curie, embeddings.embed_query("Curie in Paris"))
+    assert similar > np.dot(curie, bohr)
+
+
+def test_chat_model_answers_the_structured_output():
+    structured = model().with_structured_output(Entities)
+    assert structured.invoke("Who is Ada Lovelace?") == Entities(
+        names=["Ada Lovelace"]
+    )
+
+
+def test_chat_model_streams_the_answer_tokens():
+    async def stream():
+        return [chunk.content async for chunk in model().astream("Who is Ada?")]
+
+    tokens = asyncio.run(stream())
+    assert len(tokens) == 5
+    assert "".join(tokens) == model().invoke("Who is Ada?").content
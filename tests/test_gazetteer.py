@@ -0,0 +1,86 @@
+import random
+
+from reflex_study.gazetteer import EntityGazetteer, deletes, tokenize, within_distance
+
+
+def gazetteer(*names: str) -> EntityGazetteer:
+    entities = EntityGazetteer()
+    entities.add(names)
+    return entities
+
+
+def test_tokenize():
+    assert tokenize("Who founded Acme-Corp?") == ["who", "founded", "acme", "corp"]
+
+
+def test_within_distance():
+    assert within_distance("neo4j", "neo4j")
+    assert within_distance("kitten", "sitten")
+    assert within_distance("kitten", "sittin")
+    assert not within_distance("kitten", "sitting")
+    assert not within_distance("a", "abcd")
+
+
+def test_deletes():
+    assert deletes("abc", 1) == {"abc", "bc", "ac", "ab"}
+    assert "a" in deletes("abc") and "" not in deletes("abc")
+
+
+def test_fuzzy_index_finds_every_word_within_the_distance():
+    # Short words over a small alphabet give many near misses.
+    rng = random.Random(0)
+    words = {
+        "".join(rng.choices("abcd", k=rng.randint(4, 7))) for _ in range(300)
+    }
+    entities = gazetteer(*words)
+    for _ in range(100):
+        token = "".join(rng.choices("abcd", k=rng.randint(4, 7)))
+        found = {key[0] for key in entities._fuzzy_candidates(token)}
+        assert found == {word for word in words if within_distance(token, word)}
+
+
+def test_extract_exact_mentions():
+    entities = gazetteer("Marie Curie", "Pierre Curie", "Sorbonne")
+    assert entities.extract("Did Marie Curie teach at the Sorbonne?") == [
+        "Marie Curie",
+        "Sorbonne",
+    ]
+
+
+def test_extract_overlapping_mentions():
+    entities = gazetteer("New York", "New York Times", "York")
+    assert sorted(entities.extract("He read the New York Times.")) == [
+        "New York",
+        "New York Times",
+        "York",
+    ]
+
+
+def test_extract_is_case_insensitive():
+    entities = gazetteer("Marie Curie")
+    assert entities.extract("what did marie curie discover") == ["Marie Curie"]
+
+
+def test_extract_fuzzy_mentions():
+    entities = gazetteer("Marie Curie", "Einstein")
+    assert entities.extract("Where was Einstien born?") == ["Einstein"]
+    assert entities.extract("Marie Curei's prizes") == ["Marie Curie"]
+
+
+def test_extract_does_not_fuzzy_match_short_words_or_stopwords():
+    entities = gazetteer("Bat", "Their")
+    assert entities.extract("The cat sat there") == []
+
+
+def test_extract_ambiguous_words_need_the_same_case():
+    entities = gazetteer("IS", "It")
+    assert entities.extract("What is it?") == []
+    assert entities.extract("Who leads IS?") == ["IS"]
+
+
+def test_add_rebuilds_the_automaton():
+    entities = gazetteer("Marie Curie")
+    assert entities.extract("Pierre Curie") == []
+    entities.add(["Pierre Curie", "Marie Curie"])
+    assert len(entities) == 2
+    assert entities.extract("Pierre Curie") == ["Pierre Curie"]
@@ -0,0 +1,173 @@
+import asyncio
+
+import pytest
+from langchain_community.graphs.graph_document import (
+    GraphDocument,
+    Node,
+    Relationship,
+)
+from langchain_core.documents import Document
+
+from reflex_study.graph_store import (
+    MemoryGraphStore,
+    Neo4jGraphStore,
+    _pack,
+    _unpack,
+)
+
+
+def graph_document(text: str, *relationships: tuple[str, str, str]) -> GraphDocument:
+    nodes = {
+        name: Node(id=name, type="Entity")
+        for triple in relationships
+        for name in triple[::2]
+    }
+    return GraphDocument(
+        nodes=list(nodes.values()),
+        relationships=[
+            Relationship(source=nodes[source], target=nodes[target], type=type_)
+            for source, type_, target in relationships
+        ],
+        source=Document(
+            page_content=text, metadata={"id": text, "content_hash": text}
+        ),
+    )
+
+
+def store(path=None) -> MemoryGraphStore:
+    graph = MemoryGraphStore(path)
+    graph.write(
+        [
+            graph_document(
+                "first",
+                ("Marie Curie", "won", "Nobel Prize"),
+                ("Marie Curie", "WORKED_AT", "Sorbonne"),
+            ),
+            graph_document("second", ("Pierre Curie", "MARRIED", "Marie Curie")),
+        ]
+    )
+    return graph
+
+
+def triples(rows) -> set[tuple[str, str, str]]:
+    return {(row["source"], row["type"], row["target"]) for row in rows}
+
+
+def test_neighborhoods_of_matching_entities():
+    graph = store()
+    assert triples(graph.neighborhoods(["Marie Curie"], 10)) == {
+        ("Marie Curie", "WON", "Nobel Prize"),
+        ("Marie Curie", "WORKED_AT", "Sorbonne"),
+        ("Pierre Curie", "MARRIED", "Marie Curie"),
+    }
+    # Like `word~2 AND ...`: every word has to match, within two edits.
+    assert triples(graph.neighborhoods(["Sorbone"], 10)) == {
+        ("Marie Curie", "WORKED_AT", "Sorbonne")
+    }
+    assert graph.neighborhoods(["Sorbonne University"], 10) == []
+
+
+def test_async_methods_match_the_sync_ones():
+    graph = store()
+
+    async def run():
+        await graph.awrite([graph_document("third", ("Ada", "KNOWS", "Sorbonne"))])
+        return (
+            await graph.aneighborhoods(["Sorbonne"], 10),
+            await graph.aexisting_hashes(["third", "fourth"]),
+        )
+
+    rows, hashes = asyncio.run(run())
+    assert rows == graph.neighborhoods(["Sorbonne"], 10)
+    assert len(rows) == 2
+    assert hashes == {"third"}
+
+
+def test_similar_words_are_every_word_within_two_edits():
+    graph = MemoryGraphStore()
+    words = ["curie", "curies", "cure", "carie", "marie", "curium", "cu"]
+    graph.write([graph_document("first", *[(word, "IS", "x") for word in words])])
+    assert graph._similar_words("curie") == {
+        "curie": 1.0,
+        "curies": 0.5,
+        "cure": 0.5,
+        "carie": 0.5,
+        "marie": 0.5,
+        "curium": 0.5,
+    }
+
+
+def test_neighborhoods_are_ranked_and_limited():
+    graph = store()
+    rows = graph.neighborhoods(["Curie"], 2)
+    assert len(rows) == 2
+    assert rows[0]["score"] >= rows[1]["score"]
+    [row] = graph.neighborhoods(["Nobel Prize"], 10)
+    assert row["entities"] == ["Nobel Prize"]
+
+
+def test_entity_ids_and_hashes():
+    graph = store()
+    assert sorted(graph.entity_ids()) == [
+        "Marie Curie",
+        "Nobel Prize",
+        "Pierre Curie",
+        "Sorbonne",
+    ]
+    assert graph.existing_hashes(["first", "third"]) == {"first"}
+
+
+def test_snapshot_round_trip(tmp_path):
+    graph = store(tmp_path / "graph")
+    graph.save()
+    loaded = MemoryGraphStore(tmp_path / "graph")
+    loaded.load()
+    assert loaded.entity_ids() == graph.entity_ids()
+    assert loaded.existing_hashes(["first", "second"]) == {"first", "second"}
+    assert loaded.neighborhoods(["Marie Curie"], 10) == graph.neighborhoods(
+        ["Marie Curie"], 10
+    )
+
+
+def test_snapshot_keeps_empty_and_unusual_ids(tmp_path):
+    graph = MemoryGraphStore(tmp_path / "graph")
+    graph.write([graph_document("first", ("", "KNOWS", "a\0b"), ("東京", "IN", ""))])
+    graph.save()
+    loaded = MemoryGraphStore(tmp_path / "graph")
+    loaded.load()
+    assert loaded.entity_ids() == graph.entity_ids() == ["", "a\0b", "東京"]
+
+
+@pytest.mark.parametrize(
+    "strings",
+    [[], [""], ["", ""], ["a\0b", "c"], ["東京", "Tokyo"], ["a", "", "b"]],
+)
+def test_pack_round_trip(strings):
+    assert _unpack(_pack(strings)) == strings
+
+
+def test_save_without_changes_keeps_the_snapshot(tmp_path):
+    graph = MemoryGraphStore(tmp_path / "graph")
+    graph.save()
+    assert not (tmp_path / "graph.npz").exists()
+    graph.write([graph_document("first", ("a", "KNOWS", "b"))])
+    graph.save()
+    modified = (tmp_path / "graph.npz").stat().st_mtime_ns
+    graph.save()
+    assert (tmp_path / "graph.npz").stat().st_mtime_ns == modified
+
+
+def test_names_sharing_a_full_text_query_all_get_its_rows():
+    queries = Neo4jGraphStore._queries(["Acme Corp", "Acme Corp!", "Ada"])
+    assert len(queries) == 2
+    response = [
+        {
+            "source": "Acme Corp",
+            "type": "EMPLOYS",
+            "target": "Ada",
+            "score": 1.0,
+            "queries": list(queries),
+        }
+    ]
+    [row] = Neo4jGraphStore._neighborhood_rows(queries, response)
+    assert row["entities"] == ["Acme Corp", "Acme Corp!", "Ada"]
@@ -0,0 +1,162 @@
+from langchain_community.graphs.graph_document import (
+    GraphDocument,
+    Node,
+    Relationship,
+)
+from langchain_core.documents import Document
+
+from reflex_study.graph_writer import (
+    DOCUMENTS_QUERY,
+    EMBEDDINGS_QUERY,
+    MENTIONS_QUERY,
+    SCHEMA_QUERIES,
+    GraphWriter,
+    escape_name,
+    nodes_query,
+    relationships_query,
+)
+
+
+class Transaction:
+    def __init__(self, statements: list):
+        self.statements = statements
+
+    def run(self, query: str, **parameters):
+        self.statements.append((query, parameters))
+        return self
+
+    def consume(self):
+        pass
+
+
+class Session:
+    def __init__(self, driver: "Driver"):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def run(self, query: str, **parameters):
+        return Transaction(self.driver.statements).run(query, **parameters)
+
+    def execute_write(self, work, *args):
+        statements = []
+        work(Transaction(statements), *args)
+        self.driver.transactions.append(statements)
+
+
+class Driver:
+    """Records the statements of every write transaction."""
+
+    def __init__(self):
+        self.databases: list[str | None] = []
+        self.statements: list = []
+        self.transactions: list[list] = []
+
+    def session(self, database=None):
+        self.databases.append(database)
+        return Session(self)
+
+
+def documents() -> list[GraphDocument]:
+    curie = Node(id="Marie Curie", type="Person")
+    pierre = Node(id="Pierre Curie", type="Person")
+    sorbonne = Node(id="Sorbonne", type="Organization")
+    return [
+        GraphDocument(
+            nodes=[curie, sorbonne],
+            relationships=[
+                Relationship(source=curie, target=sorbonne, type="works at")
+            ],
+            source=Document(page_content="first", metadata={"id": "d1"}),
+        ),
+        GraphDocument(
+            nodes=[curie, pierre],
+            relationships=[Relationship(source=pierre, target=curie, type="MARRIED")],
+            source=Document(page_content="second", metadata={"id": "d2"}),
+        ),
+    ]
+
+
+def written(driver: Driver) -> dict[str, list[dict]]:
+    """The rows of each query, over all transactions."""
+    rows: dict[str, list[dict]] = {}
+    for transaction in driver.transactions:
+        for query, parameters in transaction:
+            rows.setdefault(query, []).extend(parameters["rows"])
+    return rows
+
+
+def test_escape_name():
+    assert escape_name("WORKS_AT") == "`WORKS_AT`"
+    assert escape_name("a`b") == "`ab`"
+
+
+def test_ensure_schema():
+    driver = Driver()
+    GraphWriter(driver, "neo4j").ensure_schema()
+    assert [query for query, _ in driver.statements] == SCHEMA_QUERIES
+    assert driver.databases == ["neo4j"]
+
+
+def test_rows_are_grouped_by_label_and_type():
+    driver = Driver()
+    GraphWriter(driver).write(documents(), [[0.1], [0.2]])
+    rows = written(driver)
+    assert rows[DOCUMENTS_QUERY] == [
+        {"id": "d1", "text": "first", "metadata": {"id": "d1"}},
+        {"id": "d2", "text": "second", "metadata": {"id": "d2"}},
+    ]
+    assert rows[EMBEDDINGS_QUERY] == [
+        {"id": "d1", "embedding": [0.1]},
+        {"id": "d2", "embedding": [0.2]},
+    ]
+    assert rows[nodes_query("Person")] == [
+        {"id": "Marie Curie", "properties": {}},
+        {"id": "Pierre Curie", "properties": {}},
+    ]
+    assert rows[nodes_query("Organization")] == [{"id": "Sorbonne", "properties": {}}]
+    assert rows[MENTIONS_QUERY] == [
+        {"document": "d1", "id": "Marie Curie"},
+        {"document": "d1", "id": "Sorbonne"},
+        {"document": "d2", "id": "Marie Curie"},
+        {"document": "d2", "id": "Pierre Curie"},
+    ]
+    assert rows[relationships_query("WORKS_AT")] == [
+        {"source": "Marie Curie", "target": "Sorbonne", "properties": {}}
+    ]
+    assert rows[relationships_query("MARRIED")] == [
+        {"source": "Pierre Curie", "target": "Marie Curie", "properties": {}}
+    ]
+    # One statement per transaction, documents before the entities they mention.
+    queries = [query for [(query, _)] in driver.transactions]
+    assert queries.index(DOCUMENTS_QUERY) < queries.index(MENTIONS_QUERY)
+    assert queries.index(nodes_query("Person")) < queries.index(MENTIONS_QUERY)
+
+
+def test_labels_and_types_are_escaped():
+    assert "SET n:`Person`" in nodes_query("Person")
+    assert "[r:`WORKS_AT`]" in relationships_query("WORKS_AT")
+    # A backtick in a label cannot close the quoted name.
+    query = nodes_query("Drop` DETACH DELETE n //")
+    assert "SET n:`Drop DETACH DELETE n //`" in query
+
+
+def test_without_vectors_no_embeddings_are_written():
+    driver = Driver()
+    GraphWriter(driver).write(documents())
+    assert EMBEDDINGS_QUERY not in written(driver)
+
+
+def test_rows_are_written_in_slices():
+    driver = Driver()
+    GraphWriter(driver, batch_size=3).write(documents())
+    mentions = [
+        parameters["rows"]
+        for [(query, parameters)] in driver.transactions
+        if query == MENTIONS_QUERY
+    ]
+    assert [len(rows) for rows in mentions] == [3, 1]
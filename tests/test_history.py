@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from reflex_study import history
+from reflex_study.chat_store import ChatStore
+from reflex_study.history import HistoryManager
+
+
+@pytest.fixture(autouse=True)
+def count_words(monkeypatch):
+    # One token per word keeps the budgets readable and needs no tokenizer.
+    monkeypatch.setattr(
+        history, "count_tokens", lambda text, model: len(text.split())
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    chats = ChatStore(tmp_path / "chats.sqlite3")
+    yield chats
+    chats.close()
+
+
+def fill(store: ChatStore, count: int) -> list[int]:
+    return [store.append("owner", "chat", f"q{i}", f"a{i}") for i in range(count)]
+
+
+def contents(messages) -> list[str]:
+    return [message["content"] for message in messages]
+
+
+def test_turns_the_summary_does_not_cover_are_replayed(store):
+    # No summary yet: every turn is replayed, not only the latest keep_turns.
+    fill(store, 6)
+    manager = HistoryManager(store, keep_turns=2)
+    messages = manager.build_messages("owner", "chat", "model")
+    assert contents(messages) == [f"{kind}{i}" for i in range(6) for kind in "qa"]
+
+
+def test_the_latest_turns_are_replayed_within_the_budget(store):
+    fill(store, 6)
+    # Room for three turns of two one-word messages.
+    budget = 3 * 2 * (1 + history.TOKENS_PER_MESSAGE)
+    manager = HistoryManager(store, keep_turns=2, token_budget=budget)
+    messages = manager.build_messages("owner", "chat", "model")
+    assert contents(messages) == ["q3", "a3", "q4", "a4", "q5", "a5"]
+
+
+def test_summary_replaces_the_turns_it_covers(store):
+    ids = fill(store, 3)
+    store.set_summary("owner", "chat", "earlier", ids[1])
+    manager = HistoryManager(store, keep_turns=2)
+    messages = manager.build_messages("owner", "chat", "model")
+    assert messages[0]["role"] == "system"
+    assert messages[0]["content"].endswith("earlier")
+    assert contents(messages[1:]) == ["q2", "a2"]
+
+
+def test_a_stale_summary_is_replayed_with_every_newer_turn(store):
+    # The background summary fell behind, e.g. after a failed update.
+    ids = fill(store, 5)
+    store.set_summary("owner", "chat", "earlier", ids[0])
+    manager = HistoryManager(store, keep_turns=2)
+    messages = manager.build_messages("owner", "chat", "model")
+    assert messages[0]["content"].endswith("earlier")
+    replayed = [f"{kind}{i}" for i in range(1, 5) for kind in "qa"]
+    assert contents(messages[1:]) == replayed
+
+
+def test_latest_turn_is_kept_over_the_budget(store):
+    store.append("owner", "chat", "an old question", "an old answer")
+    store.append("owner", "chat", "a long question " * 10, "a long answer " * 10)
+    manager = HistoryManager(store, keep_turns=4, token_budget=10)
+    messages = manager.build_messages("owner", "chat", "model")
+    assert len(messages) == 2
+    assert messages[0]["content"].startswith("a long question")
+
+
+def test_update_summary_folds_the_older_turns(store):
+    ids = fill(store, 5)
+    manager = HistoryManager(store, keep_turns=2)
+    llm = FakeListChatModel(responses=["folded summary"])
+    asyncio.run(manager.update_summary("owner", "chat", llm))
+    assert store.get_summary("owner", "chat") == ("folded summary", ids[2])
+    messages = manager.build_messages("owner", "chat", "model")
+    assert messages[0]["content"].endswith("folded summary")
+    assert contents(messages[1:]) == ["q3", "a3", "q4", "a4"]
+
+
+def test_update_summary_without_older_turns(store):
+    fill(store, 2)
+    manager = HistoryManager(store, keep_turns=2)
+    llm = FakeListChatModel(responses=[])
+    asyncio.run(manager.update_summary("owner", "chat", llm))
+    assert store.get_summary("owner", "chat") == ("", None)
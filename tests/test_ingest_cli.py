@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from reflex_study import ingest_cli
+from reflex_study.ingestion import IngestionProgress, ingestion_lock
+
+
+def test_iter_windows_cut_at_paragraphs(tmp_path):
+    path = tmp_path / "corpus.txt"
+    path.write_text("one two\n\nthree four\n\nfive six")
+    windows = list(ingest_cli.iter_windows(path, 12))
+    assert "".join(windows).split() == path.read_text().split()
+    assert all(window.strip() for window in windows)
+    assert windows[0] == "one two"
+
+
+def test_the_app_shares_the_lock_and_the_cli_needs_it_alone(tmp_path):
+    path = tmp_path / "ingestion.lock"
+    with ingestion_lock(shared=True, path=path):
+        with ingestion_lock(shared=True, path=path):
+            with pytest.raises(RuntimeError, match="Stop the other one"):
+                with ingestion_lock(path=path):
+                    pass
+    with ingestion_lock(path=path):
+        with pytest.raises(RuntimeError):
+            with ingestion_lock(shared=True, path=path):
+                pass
+
+
+def test_the_cli_exits_while_the_app_is_running(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "ingestion.lock"
+    monkeypatch.setattr(
+        ingest_cli, "ingestion_lock", lambda: ingestion_lock(path=path)
+    )
+    with ingestion_lock(shared=True, path=path):
+        with pytest.raises(SystemExit) as exit_info:
+            ingest_cli.main([str(tmp_path)])
+    assert exit_info.value.code == 1
+    assert "Stop the other one" in capsys.readouterr().err
+
+
+class Pipeline:
+    """Each window waits until the next one started, so only overlap finishes."""
+
+    started: dict[str, asyncio.Event] = {}
+
+    def __init__(self, llm, concurrency, batch_size):
+        pass
+
+    async def run(self, text: str, extraction_slots: asyncio.Semaphore):
+        text = text.strip()
+        self.started.setdefault(text, asyncio.Event()).set()
+        following = chr(ord(text) + 1)
+        if following <= "c":
+            await self.started.setdefault(following, asyncio.Event()).wait()
+        yield IngestionProgress(total=1, written=1)
+
+
+def test_the_next_window_starts_before_the_previous_one_ends(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest_cli, "IngestionPipeline", Pipeline)
+    monkeypatch.setattr(ingest_cli, "get_chat_model", lambda **kwargs: None)
+    path = tmp_path / "corpus.txt"
+    path.write_text("a\n\nb\n\nc\n")
+
+    async def run():
+        await asyncio.wait_for(
+            ingest_cli.ingest([path], "*.txt", "model", 2, 1, window_size=2), 5
+        )
+
+    asyncio.run(run())
+    assert set(Pipeline.started) == {"a", "b", "c"}
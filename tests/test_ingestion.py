@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+from langchain_community.graphs.graph_document import GraphDocument, Node
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_text_splitters import CharacterTextSplitter
+
+from reflex_study import retrieval
+from reflex_study.embedding_cache import CachedEmbedder, EmbeddingCache
+from reflex_study.fakes import FAKE_EMBEDDING_MODEL
+from reflex_study.graph_store import MEMORY_GRAPH_BACKEND
+from reflex_study.ingestion import IngestionCheckpoint, IngestionPipeline, chunk_hash
+from reflex_study.retrieval import RetrievalBackend, RetrievalConfig
+from reflex_study.vector_store import NUMPY_VECTOR_BACKEND
+
+PARAGRAPHS = [
+    "Marie Curie worked with Pierre Curie in Paris.",
+    "Albert Einstein lectured in Berlin.",
+    "Niels Bohr founded an institute in Copenhagen.",
+    "Lise Meitner explained fission with Otto Frisch.",
+]
+TEXT = "\n\n".join(PARAGRAPHS)
+
+
+def graph_document(document: Document) -> GraphDocument:
+    name = " ".join(document.page_content.split()[:2])
+    return GraphDocument(
+        nodes=[Node(id=name, type="Person")], relationships=[], source=document
+    )
+
+
+class Transformer:
+    """Stands in for LLMGraphTransformer: one node per chunk, calls counted."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def aprocess_response(self, document: Document) -> GraphDocument:
+        self.calls += 1
+        return graph_document(document)
+
+
+class LengthEmbeddings(Embeddings):
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class Pipeline(IngestionPipeline):
+    """Splits the text into paragraphs and writes to the in-memory graph store."""
+
+    def __init__(self, checkpoint_dir, batch_size=1):
+        super().__init__(
+            FakeListChatModel(responses=[]),
+            backend=RetrievalBackend(
+                RetrievalConfig(
+                    embedding_model=FAKE_EMBEDDING_MODEL,
+                    vector_backend=NUMPY_VECTOR_BACKEND,
+                    graph_backend=MEMORY_GRAPH_BACKEND,
+                )
+            ),
+            batch_size=batch_size,
+            checkpoint_dir=checkpoint_dir,
+        )
+        self.llm_transformer = Transformer()
+        embedding_cache = EmbeddingCache(checkpoint_dir.parent / "embeddings")
+        self.embedder = CachedEmbedder(LengthEmbeddings(), "model", embedding_cache)
+        self.writes: list[list[str]] = []
+
+    @property
+    def text_splitter(self) -> CharacterTextSplitter:
+        # One chunk per paragraph, independent of the tokenizer.
+        return CharacterTextSplitter(separator="\n\n", chunk_size=1, chunk_overlap=0)
+
+    def index_documents(
+        self, graph_documents: list[GraphDocument], vectors: list[list[float]]
+    ):
+        for graph_document, vector in zip(graph_documents, vectors):
+            # The vector of "\ntext:" + the chunk, like from_existing_graph.
+            assert vector[0] == len(graph_document.source.page_content) + 6
+        self.writes.append(
+            [str(document.nodes[0].id) for document in graph_documents]
+        )
+        super().index_documents(graph_documents, vectors)
+
+
+def ingest(pipeline: Pipeline, text: str = TEXT) -> list[tuple[int, int, int]]:
+    async def run():
+        return [
+            (progress.resumed, progress.skipped, progress.written)
+            async for progress in pipeline.run(text)
+        ]
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def checkpoint_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(retrieval, "GRAPH_STORE_PATH", tmp_path / "graph_store")
+    monkeypatch.setattr(retrieval, "VECTOR_STORE_PATH", tmp_path / "vector_store")
+    return tmp_path / "checkpoints"
+
+
+def test_chunk_hash_ignores_whitespace_but_not_the_model():
+    assert chunk_hash("a  b\n", "model") == chunk_hash("a b", "model")
+    assert chunk_hash("a b", "model") != chunk_hash("a b", "other")
+
+
+def test_checkpoint_skips_a_torn_last_line(tmp_path):
+    checkpoint = IngestionCheckpoint(tmp_path, "job")
+    document = graph_document(Document(page_content="Marie Curie"))
+    checkpoint.record_extracted(0, document)
+    checkpoint.record_written([0])
+    checkpoint.record_extracted(1, document)
+    with checkpoint.path.open("a") as file:
+        file.write('{"chunk": 2, "graph_')
+    extracted, written = checkpoint.load()
+    assert extracted == {0: document, 1: document}
+    assert written == {0}
+    checkpoint.complete()
+    assert checkpoint.load() == ({}, set())
+
+
+def test_ingestion_writes_every_chunk_in_batches(checkpoint_dir):
+    pipeline = Pipeline(checkpoint_dir, batch_size=3)
+    progress = ingest(pipeline)
+    assert progress[0] == (0, 0, 0)
+    assert progress[-1] == (0, 0, len(PARAGRAPHS))
+    assert pipeline.llm_transformer.calls == len(PARAGRAPHS)
+    assert [len(batch) for batch in pipeline.writes] == [3, 1]
+    assert "Niels Bohr" in pipeline.backend.graph_store.entity_ids()
+    assert len(pipeline.backend.vector_index) == len(PARAGRAPHS)
+    assert not list(checkpoint_dir.iterdir())
+
+
+def test_ingestion_resumes_from_the_checkpoint(checkpoint_dir):
+    pipeline = Pipeline(checkpoint_dir)
+    # An interrupted run: the first chunk was extracted and written, the
+    # second only extracted.
+    documents = pipeline.split(TEXT)
+    checkpoint = IngestionCheckpoint(checkpoint_dir, pipeline.job_id(TEXT))
+    for chunk in range(2):
+        checkpoint.record_extracted(chunk, graph_document(documents[chunk]))
+    checkpoint.record_written([0])
+
+    progress = ingest(pipeline)
+    assert progress[0] == (1, 0, 0)
+    assert progress[-1] == (1, 0, len(PARAGRAPHS) - 1)
+    assert pipeline.llm_transformer.calls == len(PARAGRAPHS) - 2
+    written = sorted(name for batch in pipeline.writes for name in batch)
+    assert written == ["Albert Einstein", "Lise Meitner", "Niels Bohr"]
+    assert not checkpoint.path.exists()
+
+
+def test_ingestion_skips_chunks_already_in_the_graph(checkpoint_dir):
+    pipeline = Pipeline(checkpoint_dir)
+    # The same paragraph twice in one text is only extracted once.
+    progress = ingest(pipeline, "\n\n".join(PARAGRAPHS[:2] + PARAGRAPHS[:1]))
+    assert progress[-1] == (0, 1, 2)
+    assert pipeline.llm_transformer.calls == 2
+
+    progress = ingest(pipeline, "\n\n".join(PARAGRAPHS[1:]))
+    assert progress[0] == (0, 1, 0)
+    assert progress[-1] == (0, 1, len(PARAGRAPHS) - 2)
+    assert pipeline.llm_transformer.calls == len(PARAGRAPHS)
+
+
+def test_the_memory_graph_needs_the_numpy_vector_store():
+    with pytest.raises(ValueError, match="VECTOR_BACKEND=numpy"):
+        RetrievalConfig(graph_backend=MEMORY_GRAPH_BACKEND)
@@ -0,0 +1,32 @@
+from reflex_study.ingestion_metrics import IngestionMetrics, ingestion_totals
+
+
+def test_a_run_counts_its_writes_and_queue():
+    metrics = IngestionMetrics()
+    metrics.record_extraction(0.5, retries=1)
+    metrics.record_write(2, nodes=5, relationships=3, seconds=0.1, retries=0)
+    metrics.waiting = 4
+    summary = metrics.summary()
+    assert summary["chunks_written"] == 2
+    assert summary["nodes"] == 5
+    assert summary["extraction_retries"] == 1
+    assert summary["extraction_seconds"]["max"] == 0.5
+    assert summary["waiting"] == 4
+
+    metrics.finish()
+    assert metrics.summary()["waiting"] == 0
+
+
+def test_totals_add_up_across_runs_and_track_the_active_queue():
+    before = ingestion_totals()["totals"].get("chunks_written", 0)
+    first, second = IngestionMetrics(), IngestionMetrics()
+    first.record_write(1, nodes=1, relationships=0, seconds=0.1, retries=0)
+    second.record_write(2, nodes=1, relationships=0, seconds=0.1, retries=0)
+    first.waiting, second.waiting = 1, 2
+    totals = ingestion_totals()
+    assert totals["totals"]["chunks_written"] == before + 3
+    assert totals["chunks_waiting"] == 3
+
+    first.finish()
+    second.finish()
+    assert ingestion_totals()["chunks_waiting"] == 0
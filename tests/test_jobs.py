@@ -0,0 +1,223 @@
+import asyncio
+import json
+import time
+from dataclasses import asdict
+
+import pytest
+
+from reflex_study import jobs
+from reflex_study.ingestion import IngestionCheckpoint, IngestionProgress
+from reflex_study.jobs import (
+    CANCELLED,
+    DONE,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    IngestionJob,
+    IngestionJobQueue,
+    ingestion_job_status,
+)
+
+
+class Pipeline:
+    """Stands in for IngestionPipeline: one chunk per line of the text."""
+
+    checkpoint_dir = None
+
+    def __init__(self, llm):
+        pass
+
+    def checkpoint(self, text: str) -> IngestionCheckpoint:
+        return IngestionCheckpoint(self.checkpoint_dir, str(len(text)))
+
+    async def run(self, text: str):
+        lines = text.splitlines()
+        progress = IngestionProgress(total=len(lines))
+        yield progress
+        for line in lines:
+            if line == "fail":
+                raise RuntimeError("extraction failed")
+            if line == "block":
+                await asyncio.Event().wait()
+            progress.written += 1
+            yield progress
+
+
+@pytest.fixture(autouse=True)
+def pipeline(monkeypatch, tmp_path):
+    monkeypatch.setattr(Pipeline, "checkpoint_dir", tmp_path / "checkpoints")
+    monkeypatch.setattr(jobs, "IngestionPipeline", Pipeline)
+    monkeypatch.setattr(jobs, "get_chat_model", lambda **kwargs: None)
+
+
+async def wait_for(job: IngestionJob, *statuses: str):
+    for _ in range(500):
+        if job.status in statuses:
+            return
+        await asyncio.sleep(0.01)
+    raise TimeoutError(f"job is still {job.status}")
+
+
+def record(queue: IngestionJobQueue, job: IngestionJob) -> dict:
+    return json.loads(queue._record_path(job.id).read_text())
+
+
+def test_job_runs_to_completion(tmp_path):
+    async def run():
+        queue = IngestionJobQueue(tmp_path)
+        queue.start()
+        job = await queue.submit("owner", "one\ntwo\nthree", "model")
+        await wait_for(job, DONE)
+        await queue.stop()
+        return queue, job
+
+    queue, job = asyncio.run(run())
+    assert (job.total, job.written) == (3, 3)
+    assert record(queue, job)["status"] == DONE
+    assert not queue._text_path(job.id).exists()
+    assert queue.list_jobs("owner") == [job]
+    assert queue.list_jobs("other") == []
+
+
+def test_failed_job_records_the_error(tmp_path):
+    async def run():
+        queue = IngestionJobQueue(tmp_path)
+        queue.start()
+        job = await queue.submit("owner", "one\nfail", "model")
+        with pytest.warns(UserWarning, match="extraction failed"):
+            await wait_for(job, FAILED)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job.error == "extraction failed"
+    assert job.written == 1
+
+
+def test_retry_a_failed_job(tmp_path):
+    async def run():
+        queue = IngestionJobQueue(tmp_path)
+        queue.start()
+        job = await queue.submit("owner", "one\nfail", "model")
+        with pytest.warns(UserWarning, match="extraction failed"):
+            await wait_for(job, FAILED)
+        # The text stays for the retry.
+        queue._text_path(job.id).write_text("one\ntwo")
+        await queue.retry(job.id)
+        await wait_for(job, DONE)
+        await queue.stop()
+        return queue, job
+
+    queue, job = asyncio.run(run())
+    assert (job.total, job.written, job.error) == (2, 2, "")
+    assert not queue._text_path(job.id).exists()
+
+
+def test_status_leaves_out_the_owner(tmp_path, monkeypatch):
+    queue = IngestionJobQueue(tmp_path)
+    job = IngestionJob(id="job", owner="owner", model="model", checkpoint="path")
+    queue._jobs[job.id] = job
+    monkeypatch.setattr(jobs, "get_ingestion_queue", lambda: queue)
+
+    status = ingestion_job_status(job.id)
+    assert status["id"] == "job"
+    assert "owner" not in status
+    assert "checkpoint" not in status
+
+
+def test_finished_jobs_are_pruned_after_the_retention(tmp_path):
+    checkpoints = tmp_path / "checkpoints"
+    checkpoints.mkdir()
+    for name, status, age, checkpoint in [
+        ("old_failed", FAILED, 120, "old_failed"),
+        ("old_done", DONE, 120, "old_done"),
+        ("new_failed", FAILED, 0, "new_failed"),
+        ("queued", QUEUED, 120, "queued"),
+        ("same_text", FAILED, 120, "queued"),
+    ]:
+        checkpoint_path = checkpoints / f"{checkpoint}.jsonl"
+        checkpoint_path.write_text("")
+        job = IngestionJob(
+            id=name,
+            owner="owner",
+            model="model",
+            status=status,
+            checkpoint=str(checkpoint_path),
+            updated_at=time.time() - age,
+        )
+        (tmp_path / f"{name}.json").write_text(json.dumps(asdict(job)))
+        (tmp_path / f"{name}.txt").write_text("text")
+
+    async def run():
+        queue = IngestionJobQueue(tmp_path, workers=0, retention=60)
+        queue.start()
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(run())
+    kept = ["new_failed", "queued"]
+    assert sorted(queue._jobs) == kept
+    assert sorted(path.stem for path in tmp_path.glob("*.json")) == kept
+    assert sorted(path.stem for path in tmp_path.glob("*.txt")) == kept
+    # The queued job still resumes from the checkpoint it shares.
+    assert sorted(path.stem for path in checkpoints.iterdir()) == kept
+
+
+def test_cancel_a_queued_job(tmp_path):
+    async def run():
+        queue = IngestionJobQueue(tmp_path, workers=0)
+        queue.start()
+        job = await queue.submit("owner", "one", "model")
+        await queue.cancel(job.id)
+        return queue, job
+
+    queue, job = asyncio.run(run())
+    assert job.status == CANCELLED
+    assert record(queue, job)["status"] == CANCELLED
+    assert not queue._text_path(job.id).exists()
+
+
+def test_cancel_a_running_job(tmp_path):
+    async def run():
+        queue = IngestionJobQueue(tmp_path)
+        queue.start()
+        job = await queue.submit("owner", "one\nblock", "model")
+        await wait_for(job, RUNNING)
+        while job.written < 1:
+            await asyncio.sleep(0.01)
+        await queue.cancel(job.id)
+        await wait_for(job, CANCELLED)
+        # The worker keeps serving other jobs.
+        other = await queue.submit("owner", "two", "model")
+        await wait_for(other, DONE)
+        await queue.stop()
+        return queue, job
+
+    queue, job = asyncio.run(run())
+    assert record(queue, job)["status"] == CANCELLED
+    assert not queue._text_path(job.id).exists()
+
+
+def test_unfinished_jobs_resume_on_start(tmp_path):
+    async def interrupted():
+        queue = IngestionJobQueue(tmp_path)
+        queue.start()
+        job = await queue.submit("owner", "one\nblock", "model")
+        await wait_for(job, RUNNING)
+        # Stopping the app leaves the job and its text on disk.
+        await queue.stop()
+        return job
+
+    job = asyncio.run(interrupted())
+    (tmp_path / f"{job.id}.txt").write_text("one\ntwo")
+
+    async def restarted():
+        queue = IngestionJobQueue(tmp_path)
+        queue.start()
+        resumed = queue.get(job.id)
+        await wait_for(resumed, DONE)
+        await queue.stop()
+        return resumed
+
+    resumed = asyncio.run(restarted())
+    assert (resumed.total, resumed.written) == (2, 2)
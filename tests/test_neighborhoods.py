@@ -0,0 +1,117 @@
+from langchain_community.graphs.graph_document import (
+    GraphDocument,
+    Node,
+    Relationship,
+)
+from langchain_core.documents import Document
+
+from reflex_study.cache import bump_knowledge_generation
+from reflex_study.graph_store import MemoryGraphStore, NeighborhoodRow
+from reflex_study.langchain_api import NEIGHBORHOOD_CACHE, LangChainAPI
+from reflex_study.neighborhoods import MaterializedNeighborhoods
+
+
+def graph_document(text: str, *relationships: tuple[str, str, str]) -> GraphDocument:
+    nodes = {
+        name: Node(id=name, type="Entity")
+        for triple in relationships
+        for name in triple[::2]
+    }
+    return GraphDocument(
+        nodes=list(nodes.values()),
+        relationships=[
+            Relationship(source=nodes[source], target=nodes[target], type=type_)
+            for source, type_, target in relationships
+        ],
+        source=Document(page_content=text, metadata={"id": text}),
+    )
+
+
+def graph() -> MemoryGraphStore:
+    store = MemoryGraphStore()
+    store.write(
+        [
+            graph_document(
+                "first",
+                ("Marie Curie", "WON", "Nobel Prize"),
+                ("Marie Curie", "WORKED_AT", "Sorbonne"),
+                ("Pierre Curie", "WORKED_AT", "Sorbonne"),
+                ("Henri Becquerel", "WON", "Nobel Prize"),
+                ("Albert Einstein", "WON", "Nobel Prize"),
+            )
+        ]
+    )
+    return store
+
+
+def targets(triples) -> list[str]:
+    return [triple["target"] for triple in triples]
+
+
+def test_best_connected_neighbors_come_first():
+    neighborhoods = MaterializedNeighborhoods(graph(), limit=10)
+    neighborhoods.build()
+    [triples] = neighborhoods.lookup(["Marie Curie"]).values()
+    assert targets(triples) == ["Nobel Prize", "Sorbonne"]
+    scores = [triple["score"] for triple in triples]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0.5 < score <= 1.0 for score in scores)
+
+
+def test_entries_are_limited():
+    neighborhoods = MaterializedNeighborhoods(graph(), limit=2)
+    neighborhoods.build()
+    assert len(neighborhoods.lookup(["Nobel Prize"])["Nobel Prize"]) == 2
+
+
+def test_unknown_ids_miss():
+    neighborhoods = MaterializedNeighborhoods(graph())
+    neighborhoods.build(["Marie Curie"])
+    assert list(neighborhoods.lookup(["Marie Curie", "Sorbonne"])) == ["Marie Curie"]
+    assert neighborhoods.stats()["hits"] == 1
+    assert neighborhoods.stats()["misses"] == 1
+
+
+def test_changed_entities_miss_until_refreshed():
+    store = graph()
+    neighborhoods = MaterializedNeighborhoods(store)
+    neighborhoods.build()
+    store.write([graph_document("second", ("Marie Curie", "MARRIED", "Pierre Curie"))])
+    generation = bump_knowledge_generation()
+    neighborhoods.mark_changed(["Marie Curie", "Pierre Curie"], generation)
+    assert neighborhoods.lookup(["Marie Curie", "Sorbonne"]).keys() == {"Sorbonne"}
+
+    neighborhoods.refresh()
+    found = neighborhoods.lookup(["Marie Curie", "Pierre Curie"])
+    assert "Pierre Curie" in targets(found["Marie Curie"])
+    assert "Marie Curie" in [triple["source"] for triple in found["Pierre Curie"]]
+
+
+def row(source: str, target: str, score: float, *entities: str) -> NeighborhoodRow:
+    return NeighborhoodRow(
+        source=source, type="KNOWS", target=target, score=score, entities=[*entities]
+    )
+
+
+def test_full_text_scores_are_merged_on_the_materialized_scale():
+    generation = bump_knowledge_generation()
+    materialized = [
+        {"source": "Ada", "type": "KNOWS", "target": "Babbage", "score": 1.0},
+        {"source": "Ada", "type": "KNOWS", "target": "Byron", "score": 0.75},
+    ]
+    # Lucene scores of another entity, far above 1.
+    response = [
+        row("Curie", "Bohr", 12.0, "Curie"),
+        row("Curie", "Einstein", 6.0, "Curie"),
+    ]
+    merged = LangChainAPI._merge_neighborhoods(
+        generation, ["Curie"], response, materialized, limit=10
+    )
+    assert sorted((-triple["score"], triple["target"]) for triple in merged) == [
+        (-1.0, "Babbage"),
+        (-1.0, "Bohr"),
+        (-0.75, "Byron"),
+        (-0.5, "Einstein"),
+    ]
+    cached = NEIGHBORHOOD_CACHE.get((generation, "Curie"))
+    assert [triple["score"] for triple in cached] == [1.0, 0.5]
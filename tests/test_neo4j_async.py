@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+from langchain_community.vectorstores.neo4j_vector import SearchType
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+
+from reflex_study.neo4j_async import asimilarity_search_with_score
+
+
+class Client:
+    """Records the queries and answers them with canned rows."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.queries = []
+
+    async def query(self, cypher, parameters=None, timeout=None):
+        self.queries.append((cypher, parameters))
+        return self.rows
+
+
+def vector_store(retrieval_query=""):
+    return SimpleNamespace(
+        retrieval_query=retrieval_query,
+        embedding=FakeEmbeddings(size=3),
+        search_type=SearchType.HYBRID,
+        index_name="vector",
+        keyword_index_name="keyword",
+        text_node_property="text",
+        embedding_node_property="embedding",
+    )
+
+
+def test_similarity_search_sends_the_index_parameters():
+    client = Client([])
+    asyncio.run(
+        asimilarity_search_with_score(client, vector_store(), "Who is Curie?", k=2)
+    )
+    [(_, parameters)] = client.queries
+    assert parameters["index"] == "vector"
+    assert parameters["keyword_index"] == "keyword"
+    assert parameters["k"] == 2
+    assert len(parameters["embedding"]) == 3
+    # Lucene operators would break the keyword search.
+    assert "?" not in parameters["query"]
+
+
+def test_similarity_search_drops_empty_metadata():
+    client = Client(
+        [
+            {
+                "text": "Marie Curie",
+                "score": 0.9,
+                "metadata": {"source": "a.txt", "text": None, "id": None},
+            }
+        ]
+    )
+    results = asyncio.run(
+        asimilarity_search_with_score(client, vector_store(), "Curie")
+    )
+    document = Document(page_content="Marie Curie", metadata={"source": "a.txt"})
+    assert results == [(document, 0.9)]
+
+
+def test_similarity_search_uses_the_retrieval_query():
+    client = Client([])
+    retrieval_query = "RETURN node.summary AS text, score, {} AS metadata"
+    store = vector_store(retrieval_query)
+    asyncio.run(asimilarity_search_with_score(client, store, "Curie"))
+    [(cypher, _)] = client.queries
+    assert cypher.startswith("CALL {")
+    assert cypher.endswith(retrieval_query)
+    assert "node.`text` AS text" not in cypher
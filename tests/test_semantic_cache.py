@@ -0,0 +1,93 @@
+import pytest
+
+from reflex_study.cache import bump_knowledge_generation
+from reflex_study.semantic_cache import SemanticAnswerCache, semantic_cache_scope
+
+def scope(system="system", model="model", embedding="embedding", history=()):
+    return semantic_cache_scope(
+        system, model, embedding, None, None, None, list(history)
+    )
+
+
+SCOPE = scope()
+
+
+def test_similar_questions_hit():
+    cache = SemanticAnswerCache(capacity=4, threshold=0.9)
+    cache.add(SCOPE, [1.0, 0.0, 0.0], "question", "answer")
+    assert cache.lookup(SCOPE, [2.0, 0.1, 0.0]) == "answer"
+    assert cache.lookup(SCOPE, [1.0, 1.0, 0.0]) is None
+    assert cache.stats() == {"size": 1, "maxsize": 4, "hits": 1, "misses": 1}
+
+
+def test_answers_are_scoped():
+    cache = SemanticAnswerCache(capacity=4)
+    cache.add(SCOPE, [1.0, 0.0], "question", "answer")
+    for other in (
+        scope(system="other system"),
+        scope(model="other model"),
+        semantic_cache_scope("system", "model", "embedding", 0.5, None, None, []),
+        scope(embedding="other embedding"),
+    ):
+        assert cache.lookup(other, [1.0, 0.0]) is None
+
+
+def test_follow_ups_only_hit_within_the_same_history():
+    cache = SemanticAnswerCache(capacity=4)
+    curie = [
+        {"role": "user", "content": "Who was Marie Curie?"},
+        {"role": "assistant", "content": "A physicist."},
+    ]
+    bohr = [
+        {"role": "user", "content": "Who was Niels Bohr?"},
+        {"role": "assistant", "content": "A physicist."},
+    ]
+    cache.add(scope(history=curie), [1.0, 0.0], "Who was her husband?", "Pierre")
+    assert cache.lookup(scope(history=curie), [1.0, 0.0]) == "Pierre"
+    assert cache.lookup(scope(history=bohr), [1.0, 0.0]) is None
+    # A first question in a new chat does not get the follow-up's answer.
+    assert cache.lookup(scope(), [1.0, 0.0]) is None
+
+
+def test_best_match_wins():
+    cache = SemanticAnswerCache(capacity=4, threshold=0.5)
+    cache.add(SCOPE, [1.0, 0.0], "first", "first answer")
+    cache.add(SCOPE, [0.8, 0.6], "second", "second answer")
+    assert cache.lookup(SCOPE, [0.7, 0.7]) == "second answer"
+
+
+def test_least_recently_used_answer_is_evicted():
+    cache = SemanticAnswerCache(capacity=2)
+    cache.add(SCOPE, [1.0, 0.0, 0.0], "a", "answer a")
+    cache.add(SCOPE, [0.0, 1.0, 0.0], "b", "answer b")
+    assert cache.lookup(SCOPE, [1.0, 0.0, 0.0]) == "answer a"
+    cache.add(SCOPE, [0.0, 0.0, 1.0], "c", "answer c")
+    assert cache.lookup(SCOPE, [0.0, 1.0, 0.0]) is None
+    assert cache.lookup(SCOPE, [1.0, 0.0, 0.0]) == "answer a"
+    assert cache.lookup(SCOPE, [0.0, 0.0, 1.0]) == "answer c"
+
+
+def test_answers_expire_with_the_knowledge_generation():
+    cache = SemanticAnswerCache(capacity=4)
+    cache.add(SCOPE, [1.0, 0.0], "question", "answer")
+    cache.purge_stale(bump_knowledge_generation())
+    assert cache.lookup(SCOPE, [1.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_a_new_embedding_width_drops_the_answers():
+    cache = SemanticAnswerCache(capacity=4)
+    cache.add(SCOPE, [1.0, 0.0], "question", "answer")
+    with pytest.warns(UserWarning, match="2 dimensions"):
+        assert cache.lookup(SCOPE, [1.0, 0.0, 0.0]) is None
+    cache.add(SCOPE, [1.0, 0.0, 0.0], "question", "answer")
+    assert cache.lookup(SCOPE, [1.0, 0.0, 0.0]) == "answer"
+
+
+def test_save_and_load(tmp_path):
+    cache = SemanticAnswerCache(tmp_path / "answers", capacity=4)
+    cache.add(SCOPE, [1.0, 0.0], "question", "answer")
+    cache.save()
+    loaded = SemanticAnswerCache(tmp_path / "answers", capacity=4)
+    loaded.load()
+    assert loaded.lookup(SCOPE, [1.0, 0.0]) == "answer"
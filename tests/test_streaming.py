@@ -0,0 +1,63 @@
+import asyncio
+
+from reflex_study.streaming import coalesce
+
+
+async def stream(*items):
+    """Yields the strings, and sleeps for the floats in between."""
+    for item in items:
+        if isinstance(item, float):
+            await asyncio.sleep(item)
+        else:
+            yield item
+
+
+async def collect(chunks) -> list[str]:
+    return [chunk async for chunk in chunks]
+
+
+def test_chunks_are_joined_until_max_chars():
+    chunks = asyncio.run(
+        collect(coalesce(stream("ab", "cd", "", "ef", "g"), interval=60, max_chars=4))
+    )
+    assert chunks == ["abcd", "efg"]
+
+
+def test_buffer_is_flushed_while_the_stream_idles():
+    async def run():
+        received = []
+
+        async def consume():
+            async for chunk in coalesce(
+                stream("a", "b", 0.5, "c"), interval=0.05, max_chars=100
+            ):
+                received.append(chunk)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.25)
+        # The stream is still waiting for "c", yet "ab" has been sent.
+        assert "".join(received) == "ab"
+        await task
+        return received
+
+    assert "".join(asyncio.run(run())) == "abc"
+
+
+def test_stopping_early_cancels_the_pending_read():
+    cancelled = asyncio.Event()
+
+    async def endless():
+        yield "a"
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    async def run():
+        chunks = coalesce(endless(), interval=0.01, max_chars=100)
+        assert await anext(chunks) == "a"
+        await chunks.aclose()
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+    asyncio.run(run())
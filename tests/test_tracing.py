@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from reflex_study import tracing
+from reflex_study.tracing import (
+    NULL_TRACE,
+    HistogramSet,
+    RollingHistogram,
+    current_trace,
+    start_trace,
+)
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", True)
+    monkeypatch.setattr(tracing, "STAGE_HISTOGRAMS", HistogramSet())
+    monkeypatch.setattr(tracing, "COUNT_HISTOGRAMS", HistogramSet())
+
+
+def test_histogram_percentiles_cover_the_latest_window():
+    histogram = RollingHistogram(window=100)
+    for value in range(200):
+        histogram.add(float(value))
+    assert histogram.snapshot() == {
+        "count": 200,
+        "p50": 150.0,
+        "p95": 195.0,
+        "p99": 199.0,
+        "max": 199.0,
+    }
+    assert RollingHistogram().snapshot() == {"count": 0}
+
+
+def test_tracing_disabled_returns_the_null_trace(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    trace = start_trace()
+    assert trace is NULL_TRACE
+    with trace.stage("retrieval"):
+        trace.count("chunks", 3)
+    trace.finish()
+    assert current_trace() is NULL_TRACE
+
+
+def test_tasks_record_into_the_question_trace(enabled):
+    async def retrieve(name: str):
+        with current_trace().stage(name):
+            await asyncio.sleep(0)
+        current_trace().count("rows", 2)
+
+    async def answer():
+        trace = start_trace()
+        await asyncio.gather(retrieve("structured"), retrieve("structured"))
+        trace.finish()
+        return trace
+
+    trace = asyncio.run(answer())
+    assert set(trace.stages) == {"structured", "total"}
+    assert trace.counts == {"rows": 4}
+    metrics = tracing.qa_metrics()
+    assert metrics["stages"]["total"]["count"] == 1
+    assert metrics["counts"]["rows"]["max"] == 4
+
+
+def test_tokens_per_second_come_from_the_streamed_chunks(enabled):
+    trace = start_trace()
+    trace.stages.update(first_token=1.0, last_token=3.0)
+    trace.count("answer_chunks", 10)
+    trace.finish()
+    assert trace.counts["tokens_per_second"] == 5.0
+    assert current_trace() is NULL_TRACE
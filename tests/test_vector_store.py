@@ -0,0 +1,145 @@
+import re
+import zlib
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from reflex_study.vector_store import BM25Index, NumpyVectorStore
+
+
+class WordEmbeddings(Embeddings):
+    """Hashed bag of words: texts sharing words are similar."""
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = [0.0] * 64
+        for word in re.findall(r"\w+", text.lower()):
+            vector[zlib.crc32(word.encode()) % 64] += 1.0
+        return vector
+
+
+def test_bm25_ranks_by_term_frequency_and_rarity():
+    index = BM25Index()
+    index.add(0, "graph graph data")
+    index.add(1, "graph data store")
+    index.add(2, "graph")
+    index.add(3, "relational tables store")
+    scores = index.search("graph")
+    assert set(scores) == {0, 1, 2}
+    # More occurrences rank higher, and so does a shorter chunk.
+    assert scores[0] > scores[1]
+    assert scores[2] > scores[1]
+    # "tables" is rarer than "data", so it weighs more.
+    scores = index.search("data tables")
+    assert scores[3] > scores[1] > 0
+
+
+def test_bm25_without_documents_or_matches():
+    index = BM25Index()
+    assert index.search("graph") == {}
+    index.add(0, "graph")
+    assert index.search("tables") == {}
+
+
+def store(texts: list[str], path=None, model=None) -> NumpyVectorStore:
+    embeddings = WordEmbeddings()
+    vector_store = NumpyVectorStore(embeddings, path, model)
+    vector_store.add(
+        [f"chunk-{i}" for i in range(len(texts))],
+        texts,
+        embeddings.embed_documents(texts),
+    )
+    return vector_store
+
+
+TEXTS = [
+    "Marie Curie discovered polonium and radium",
+    "Albert Einstein developed the theory of relativity",
+    "The Eiffel Tower is in Paris",
+]
+
+
+def test_similarity_search_ranks_the_closest_chunk_first():
+    vector_store = store(TEXTS)
+    results = vector_store.similarity_search_with_score("Who discovered radium?", k=2)
+    assert [document.metadata["id"] for document, _ in results][0] == "chunk-0"
+    assert len(results) == 2
+    assert results[0][1] == 1.0
+    assert results[0][1] >= results[1][1]
+
+
+def test_a_keyword_match_scores_like_the_closest_vector():
+    vector_store = store(TEXTS)
+    vector = np.asarray(vector_store.embeddings.embed_query(TEXTS[0]))
+    vectors = np.stack([vector, vector]).astype(np.float32)
+    without, with_keyword = vector_store.search_many(vectors, ["", "Eiffel"], k=3)
+    assert without[0] == (0, 1.0)
+    assert dict(without)[2] < 1.0
+    assert dict(with_keyword)[0] == dict(with_keyword)[2] == 1.0
+
+
+def test_search_returns_at_most_the_stored_chunks():
+    vector_store = store(TEXTS[:1])
+    assert len(vector_store.similarity_search_with_score("radium", k=4)) == 1
+    assert NumpyVectorStore(WordEmbeddings()).similarity_search_with_score("x") == []
+
+
+def test_add_replaces_chunks_by_id():
+    vector_store = store(TEXTS)
+    embeddings = vector_store.embeddings
+    text = "Gustave Eiffel built the tower"
+    vector_store.add(["chunk-2"], [text], embeddings.embed_documents([text]))
+    assert len(vector_store) == 3
+    [(document, _)] = vector_store.similarity_search_with_score(text, k=1)
+    assert document.page_content == text
+    # The keywords of the replaced text no longer match.
+    assert vector_store._keywords.search("Paris") == {}
+    assert set(vector_store._keywords.search("tower")) == {2}
+
+
+def test_bm25_remove_forgets_the_text():
+    index = BM25Index()
+    index.add(0, "graph data")
+    index.add(1, "relational tables")
+    index.remove(0, "graph data")
+    index.add(0, "graph tables")
+    assert index.search("data") == {}
+    assert set(index.search("tables")) == {0, 1}
+
+
+def test_vectors_of_another_width_are_rejected():
+    vector_store = store(TEXTS)
+    with pytest.raises(ValueError, match="64 of the vector store"):
+        vector_store.add(["chunk-3"], ["text"], [[1.0, 0.0]])
+    with pytest.raises(ValueError, match="2 dimensions"):
+        vector_store.search_many(np.ones((1, 2), dtype=np.float32), [""])
+
+
+def test_a_snapshot_of_another_model_is_ignored(tmp_path):
+    store(TEXTS, tmp_path / "vectors", "small").save()
+    loaded = NumpyVectorStore(WordEmbeddings(), tmp_path / "vectors", "large")
+    with pytest.warns(UserWarning, match="embedded with small"):
+        loaded.load()
+    assert len(loaded) == 0
+    loaded.add(["chunk-0"], ["text"], [[1.0, 0.0]])
+    assert len(loaded) == 1
+
+
+def test_save_and_load(tmp_path):
+    vector_store = store(TEXTS, tmp_path / "vectors")
+    vector_store.save()
+    loaded = NumpyVectorStore(WordEmbeddings(), tmp_path / "vectors")
+    loaded.load()
+    assert len(loaded) == 3
+    query = "theory of relativity"
+    assert loaded.similarity_search_with_score(
+        query
+    ) == vector_store.similarity_search_with_score(query)
+    # The loaded matrix is read-only until more chunks are added.
+    text = "Isaac Newton described gravity"
+    loaded.add(["chunk-3"], [text], loaded.embeddings.embed_documents([text]))
+    [(document, _)] = loaded.similarity_search_with_score("gravity", k=1)
+    assert document.metadata["id"] == "chunk-3"